@@ -0,0 +1,126 @@
+"""
+Pre-warmed pool activation.
+
+Most registrations for a pool arrive in the first seconds after its activation date, and every
+one of them resolves the same state: the groups and penalties of the registering user, and the
+number of potential members of every pool. `prepare_pool_activation` runs
+POOL_ACTIVATION_PREWARM_SECONDS before a pool opens. It bumps the waiting list, warms the group
+closure of every user able to join the event, and stores the allocation state of the event in
+the cache, where `Event.register` and the registration engine pick it up.
+
+The state expires POOL_ACTIVATION_STATE_TIMEOUT seconds after the activation. Changes to
+penalties invalidate every state by bumping a version stored in the cache. The potential member
+counts are only used to pick the most exclusive pool and are kept until the state expires.
+"""
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from lego.apps.users.models import Penalty
+
+ALLOCATION_STATE_CACHE_KEY = 'event_allocation_state_'
+VERSION_CACHE_KEY = 'event_allocation_state_version'
+ACTIVATION_SCHEDULED_CACHE_KEY = 'pool_activation_scheduled_'
+
+
+def _version():
+    return cache.get_or_set(VERSION_CACHE_KEY, uuid4().hex, timeout=None)
+
+
+def _state_key(version, event_id):
+    return f'{ALLOCATION_STATE_CACHE_KEY}{version}_{event_id}'
+
+
+def store_allocation_state(event_id, potential_members, user_ids, penalties, timeout):
+    """
+    Cache the allocation state of an event.
+
+    :param potential_members: The number of potential members, keyed by pool id.
+    :param user_ids: The users the penalties are resolved for.
+    :param penalties: The penalty weights of the users, users without penalties can be left out.
+    """
+    if not settings.POOL_ACTIVATION_PREWARM:
+        return
+    penalties = {user_id: weight for user_id, weight in penalties.items() if weight}
+    state = {
+        'potential_members': potential_members,
+        'user_ids': set(user_ids),
+        'penalties': penalties,
+    }
+    cache.set(_state_key(_version(), event_id), state, timeout=timeout)
+
+
+def get_allocation_state(event_id):
+    if not settings.POOL_ACTIVATION_PREWARM:
+        return None
+    return cache.get(_state_key(_version(), event_id))
+
+
+def get_potential_members(event_id, pool_ids):
+    """
+    The prepared number of potential members for the pools, None unless every pool is prepared.
+    """
+    state = get_allocation_state(event_id)
+    if state is None:
+        return None
+    potential_members = state['potential_members']
+    if not set(pool_ids) <= set(potential_members.keys()):
+        return None
+    return {pool_id: potential_members[pool_id] for pool_id in pool_ids}
+
+
+def get_penalties(event_id, user_ids):
+    """
+    Penalty weights for a set of users. Users covered by the prepared state of the event are
+    served from the cache, the remaining users are resolved with a single query.
+
+    :return: A dict mapping every user id to the sum of the valid penalty weights.
+    """
+    user_ids = set(user_ids)
+    result = {}
+    state = get_allocation_state(event_id)
+    if state is not None:
+        result = {
+            user_id: state['penalties'].get(user_id, 0)
+            for user_id in user_ids & state['user_ids']
+        }
+
+    missing = user_ids - set(result.keys())
+    if missing:
+        result.update(Penalty.objects.penalties_for_users(missing))
+    return result
+
+
+def mark_scheduled(pool_id, activation_date, timeout):
+    """
+    Returns True the first time it is called for a pool and activation date, used to queue the
+    preparation of every activation once.
+    """
+    return cache.add(
+        f'{ACTIVATION_SCHEDULED_CACHE_KEY}{pool_id}_{activation_date.isoformat()}', True,
+        timeout=timeout
+    )
+
+
+def invalidate_all():
+    """
+    Invalidate the allocation state of every event.
+    """
+    if not settings.POOL_ACTIVATION_PREWARM:
+        return
+
+    def bump():
+        cache.set(VERSION_CACHE_KEY, uuid4().hex, timeout=None)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+@receiver(post_save, sender=Penalty)
+@receiver(post_delete, sender=Penalty)
+def penalty_changed_callback(**kwargs):
+    invalidate_all()
@@ -7,6 +7,7 @@ class EventsConfig(AppConfig):
     name = 'lego.apps.events'
 
     def ready(self):
+        from lego.apps.events.activation import penalty_changed_callback  # noqa
         if not settings.TESTING:
             from lego.apps.events.models import Event
             from lego.apps.events.signals import event_save_callback
@@ -40,6 +40,8 @@ STATUSES = (
     (SUCCESS_UNREGISTER, SUCCESS_UNREGISTER),
     (FAILURE_UNREGISTER, FAILURE_UNREGISTER)
 )
+# Registrations without a pool in these states are on the waiting list.
+WAITING_STATUSES = [SUCCESS_REGISTER, FAILURE_UNREGISTER]
 
 PAYMENT_PENDING = 'pending'
 PAYMENT_SUCCESS = 'succeeded'
@@ -54,6 +56,10 @@ SOCKET_REGISTRATION_FAILURE = 'Event.SOCKET_REGISTRATION.FAILURE'
 SOCKET_UNREGISTRATION_SUCCESS = 'Event.SOCKET_UNREGISTRATION.SUCCESS'
 SOCKET_UNREGISTRATION_FAILURE = 'Event.SOCKET_UNREGISTRATION.FAILURE'
 
+SOCKET_OCCUPANCY = 'Event.SOCKET_OCCUPANCY'
+SOCKET_SUBSCRIBE = 'Event.SOCKET_SUBSCRIBE'
+SOCKET_UNSUBSCRIBE = 'Event.SOCKET_UNSUBSCRIBE'
+
 DAYS_BETWEEN_NOTIFY = 1
 
 # Event registration closes a certain amount of hours before the start time
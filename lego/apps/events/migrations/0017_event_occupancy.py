@@ -0,0 +1,58 @@
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations
+from django.db.models import Count
+
+
+def store_occupancy(apps, schema_editor):
+    """
+    Store the occupancy snapshot of existing events, same format as Event.compute_occupancy.
+    """
+    Event = apps.get_model('events', 'Event')
+    Pool = apps.get_model('events', 'Pool')
+    Registration = apps.get_model('events', 'Registration')
+
+    registered = dict(
+        Registration.objects.exclude(pool=None).order_by().values('pool_id')
+        .annotate(count=Count('id')).values_list('pool_id', 'count')
+    )
+    waiting = dict(
+        Registration.objects.filter(
+            pool=None, unregistration_date=None,
+            status__in=['SUCCESS_REGISTER', 'FAILURE_UNREGISTER']
+        ).order_by().values('event_id').annotate(count=Count('id'))
+        .values_list('event_id', 'count')
+    )
+    pools = {}
+    for pool in Pool.objects.order_by('id'):
+        pools.setdefault(pool.event_id, []).append(
+            {
+                'id': pool.id,
+                'capacity': pool.capacity,
+                'activation_date': pool.activation_date.isoformat(),
+                'registered': registered.get(pool.id, 0),
+            }
+        )
+
+    for event_id in Event.objects.values_list('id', flat=True):
+        Event.objects.filter(id=event_id).update(
+            occupancy={
+                'pools': pools.get(event_id, []),
+                'waiting': waiting.get(event_id, 0),
+            }
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0016_auto_20180223_1614'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='occupancy',
+            field=django.contrib.postgres.fields.jsonb.JSONField(default=dict),
+        ),
+        migrations.RunPython(store_occupancy, migrations.RunPython.noop),
+    ]
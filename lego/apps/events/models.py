@@ -1,14 +1,16 @@
 from datetime import timedelta
 
 from django.conf import settings
+from django.contrib.postgres.fields import JSONField
 from django.core.exceptions import ValidationError
 from django.db import models, transaction
 from django.db.models import Count, Sum
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
 from lego.apps.companies.models import Company
 from lego.apps.content.models import Content
-from lego.apps.events import constants
+from lego.apps.events import activation, constants
 from lego.apps.events.exceptions import (
     EventHasClosed, EventNotReady, NoSuchPool, NoSuchRegistration, RegistrationExists,
     RegistrationsExistInPool
@@ -17,9 +19,61 @@ from lego.apps.events.permissions import EventPermissionHandler, RegistrationPer
 from lego.apps.feed.registry import get_handler
 from lego.apps.files.models import FileField
 from lego.apps.permissions.models import ObjectPermissionsModel
+from lego.apps.users.group_closure import get_group_ids_for_users, prefetch_group_ids
 from lego.apps.users.models import AbakusGroup, Penalty, User
 from lego.utils.models import BasisModel
 
+# Registrations on the waiting list are counted under this key in the occupancy moves.
+WAITING_LIST = 'waiting'
+# Registration fields deciding where the registration is counted in the occupancy snapshot.
+OCCUPANCY_FIELDS = {'pool', 'pool_id', 'status', 'unregistration_date'}
+OCCUPANCY_ATTNAMES = {'pool_id', 'status', 'unregistration_date'}
+
+
+def occupancy_slot(pool_id, unregistration_date, status):
+    """
+    Where a registration is counted in the occupancy snapshot: the id of its pool, WAITING_LIST,
+    or None when it isn't counted.
+    """
+    if pool_id is not None:
+        return pool_id
+    if unregistration_date is None and status in constants.WAITING_STATUSES:
+        return WAITING_LIST
+    return None
+
+
+def change_occupancy(occupancy, moves=(), pools=(), removed_pool_ids=()):
+    """
+    Apply changes to an occupancy snapshot without counting registrations.
+
+    :return: The new snapshot, or None if the snapshot is missing or lacks a pool being moved to
+        or from.
+    """
+    if not occupancy:
+        return None
+    snapshot = {pool['id']: dict(pool) for pool in occupancy['pools']}
+    waiting = occupancy['waiting']
+
+    for pool_id in removed_pool_ids:
+        snapshot.pop(pool_id, None)
+    for pool in pools:
+        entry = snapshot.setdefault(pool.id, {'id': pool.id, 'registered': 0})
+        entry['capacity'] = pool.capacity
+        entry['activation_date'] = pool.activation_date.isoformat()
+
+    for source, target in moves:
+        for slot, delta in [(source, -1), (target, 1)]:
+            if slot is None:
+                continue
+            if slot == WAITING_LIST:
+                waiting += delta
+            elif slot in snapshot:
+                snapshot[slot]['registered'] += delta
+            else:
+                return None
+
+    return {'pools': [snapshot[pool_id] for pool_id in sorted(snapshot)], 'waiting': waiting}
+
 
 class Event(Content, BasisModel, ObjectPermissionsModel):
     """
@@ -63,6 +117,9 @@ class Event(Content, BasisModel, ObjectPermissionsModel):
 
     is_ready = models.BooleanField(default=True)
 
+    # Registered and waiting counts, see update_occupancy.
+    occupancy = JSONField(default=dict)
+
     class Meta:
         permission_handler = EventPermissionHandler()
 
@@ -74,12 +131,18 @@ class Event(Content, BasisModel, ObjectPermissionsModel):
         By re-setting the pool counters on save, we can ensure that counters are updated if an
         event that has been merged gets un-merged. We want to avoid having to increment counters
         when registering after merge_time for performance reasons
+
+        The event row is locked before the pools, the same order as the registration paths. The
+        occupancy snapshot is read from the locked row, so a stale instance doesn't overwrite it.
         """
         with transaction.atomic():
+            if self.pk:
+                self.occupancy = Event.objects.select_for_update()\
+                    .values_list('occupancy', flat=True).get(pk=self.pk)
             for pool in self.pools.select_for_update().all():
                 pool.counter = pool.registrations.count()
                 pool.save(update_fields=['counter'])
-            return super().save(*args, **kwargs)
+            super().save(*args, **kwargs)
 
     def admin_register(self, user, admin_registration_reason, pool=None, feedback=''):
         """
@@ -99,6 +162,7 @@ class Event(Content, BasisModel, ObjectPermissionsModel):
                 raise RegistrationExists()
 
             if pool:
+                registration.lock_event()
                 locked_pool = Pool.objects.select_for_update().get(pk=pool.id)
                 locked_pool.increment()
 
@@ -135,7 +199,7 @@ class Event(Content, BasisModel, ObjectPermissionsModel):
             return False
 
         for group in pool.permission_groups.all():
-            if group in user.all_groups:
+            if group.id in user.all_group_ids:
                 return True
         return False
 
@@ -147,7 +211,7 @@ class Event(Content, BasisModel, ObjectPermissionsModel):
                 return None
         reg_time = min(pool.activation_date for pool in pools)
         if self.heed_penalties:
-            if not penalties:
+            if penalties is None:
                 penalties = user.number_of_penalties()
             if penalties == 2:
                 return reg_time + timedelta(hours=12)
@@ -162,7 +226,7 @@ class Event(Content, BasisModel, ObjectPermissionsModel):
             is_admitted = self.is_admitted(user)
         if is_admitted:
             return []
-        queryset = all_pools.filter(permission_groups__in=user.all_groups)
+        queryset = all_pools.filter(permission_groups__in=user.all_group_ids)
         if future:
             return queryset
         return queryset.filter(activation_date__lte=timezone.now())
@@ -194,10 +258,12 @@ class Event(Content, BasisModel, ObjectPermissionsModel):
         :param registration: The registration that gets evaluated
         :return: The registration (in the chosen pool)
         """
+        # The occupancy is updated through the registration, keep it on this instance.
+        registration.event = self
         user = registration.user
         penalties = 0
         if self.heed_penalties:
-            penalties = user.number_of_penalties()
+            penalties = activation.get_penalties(self.id, [user.id])[user.id]
         current_time = timezone.now()
         if self.start_time - timedelta(hours=constants.REGISTRATION_CLOSE_TIME) < current_time:
             raise EventHasClosed()
@@ -238,7 +304,9 @@ class Event(Content, BasisModel, ObjectPermissionsModel):
             return registration.add_to_pool(open_pools[0])
 
         # Returns a list of the pool(s) with the least amount of potential members
-        exclusive_pools = self.find_most_exclusive_pools(open_pools)
+        open_pool_ids = [pool.id for pool in open_pools]
+        potential_members = activation.get_potential_members(self.id, open_pool_ids)
+        exclusive_pools = self.find_most_exclusive_pools(open_pools, potential_members)
 
         if len(exclusive_pools) == 1:
             chosen_pool = exclusive_pools[0]
@@ -257,6 +325,7 @@ class Event(Content, BasisModel, ObjectPermissionsModel):
             raise EventHasClosed()
 
         # Locks unregister so that no user can register before bump is executed.
+        registration.event = self
         pool_id = registration.pool_id
         registration.unregister(
             is_merged=self.is_merged, admin_unregistration_reason=admin_unregistration_reason
@@ -274,6 +343,7 @@ class Event(Content, BasisModel, ObjectPermissionsModel):
                 locked_event = Event.objects.select_for_update().get(pk=self.id)
                 locked_pool = locked_event.pools.get(id=pool_id)
                 locked_event.check_for_bump_or_rebalance(locked_pool)
+                self.occupancy = locked_event.occupancy
 
     def check_for_bump_or_rebalance(self, open_pool):
         """
@@ -286,16 +356,15 @@ class Event(Content, BasisModel, ObjectPermissionsModel):
 
         NOTE: Remember to lock the event using select_for_update!
 
+        The moves are planned in memory by `BumpPlanner`, which loads the waiting list, groups
+        and penalties in bulk.
+
         :param open_pool: The pool where the unregistration happened.
         """
-        if not self.is_full:
-            if self.is_merged:
-                self.bump()
-            elif not open_pool.is_full:
-                for registration in self.waiting_registrations:
-                    if open_pool in self.get_possible_pools(registration.user):
-                        return self.bump(to_pool=open_pool)
-                self.try_to_rebalance(open_pool=open_pool)
+        from lego.apps.events.registration_engine import BumpPlanner
+        with transaction.atomic():
+            planner = BumpPlanner(self)
+            planner.apply(planner.plan(open_pool))
 
     def bump(self, to_pool=None):
         """
@@ -326,18 +395,14 @@ class Event(Content, BasisModel, ObjectPermissionsModel):
         Used when bumping users from waiting list to a pool that is about to be activated,
         using an async task. This is done to make sure these existing registrations are given
         the spot ahead of users that register at activation time.
+        The bumps are planned in memory by `BumpPlanner`, and written in one transaction.
         :param opening_pool: The pool about to be activated.
         :return:
         """
-        for reg in self.waiting_registrations:
-            if opening_pool.is_full:
-                break
-            if self.heed_penalties and reg.user.number_of_penalties() >= 3:
-                continue
-            if self.can_register(reg.user, opening_pool, future=True):
-                reg.pool = opening_pool
-                reg.save()
-                get_handler(Registration).handle_bump(reg)
+        from lego.apps.events.registration_engine import BumpPlanner
+        with transaction.atomic():
+            planner = BumpPlanner(self)
+            planner.apply(planner.plan_early_bump(opening_pool))
         self.check_for_bump_or_rebalance(opening_pool)
 
     def bump_on_pool_creation_or_expansion(self):
@@ -352,10 +417,12 @@ class Event(Content, BasisModel, ObjectPermissionsModel):
         """
         open_pools = [pool for pool in self.pools.all() if not pool.is_full]
         for pool in open_pools:
-            for reg in self.waiting_registrations:
+            waiting_registrations = list(self.waiting_registrations.select_related('user'))
+            penalties = self.get_waiting_penalties(waiting_registrations)
+            for reg in waiting_registrations:
                 if pool.is_full:
                     break
-                if self.heed_penalties and reg.user.number_of_penalties() >= 3:
+                if penalties[reg.user_id] >= 3:
                     continue
                 if self.can_register(reg.user, pool, future=True):
                     reg.pool = pool
@@ -394,14 +461,14 @@ class Event(Content, BasisModel, ObjectPermissionsModel):
         :param to_pool: A pool with one open slot.
         :return: Boolean, whether or not `bump()` has been called.
         """
-        to_pool_permissions = to_pool.permission_groups.all()
+        to_pool_permissions = set(to_pool.permission_groups.values_list('id', flat=True))
         bumped = False
-        for old_registration in self.registrations.filter(pool=from_pool):
-            moveable = False
-            user_groups = old_registration.user.all_groups
-            for group in to_pool_permissions:
-                if group in user_groups:
-                    moveable = True
+        registrations = list(self.registrations.filter(pool=from_pool))
+        user_groups = get_group_ids_for_users(
+            registration.user_id for registration in registrations
+        )
+        for old_registration in registrations:
+            moveable = not to_pool_permissions.isdisjoint(user_groups[old_registration.user_id])
             if moveable:
                 old_registration.pool = to_pool
                 old_registration.save()
@@ -434,14 +501,16 @@ class Event(Content, BasisModel, ObjectPermissionsModel):
         """
 
         if to_pool:
-            for registration in self.waiting_registrations:
+            waiting_registrations = list(self.waiting_registrations.select_related('user'))
+            prefetch_group_ids([registration.user for registration in waiting_registrations])
+            penalties = self.get_waiting_penalties(waiting_registrations)
+            for registration in waiting_registrations:
                 if self.heed_penalties:
-                    penalties = registration.user.number_of_penalties()
                     earliest_reg = self.get_earliest_registration_time(
                         registration.user,
-                        [to_pool], penalties
+                        [to_pool], penalties[registration.user_id]
                     )
-                    if penalties < 3 and earliest_reg < timezone.now():
+                    if penalties[registration.user_id] < 3 and earliest_reg < timezone.now():
                         if self.can_register(registration.user, to_pool):
                             return registration
                 elif self.can_register(registration.user, to_pool):
@@ -449,21 +518,33 @@ class Event(Content, BasisModel, ObjectPermissionsModel):
             return None
 
         if self.heed_penalties:
-            for registration in self.waiting_registrations:
-                penalties = registration.user.number_of_penalties()
+            waiting_registrations = list(self.waiting_registrations.select_related('user'))
+            prefetch_group_ids([registration.user for registration in waiting_registrations])
+            penalties = self.get_waiting_penalties(waiting_registrations)
+            for registration in waiting_registrations:
                 earliest_reg = self.get_earliest_registration_time(
-                    registration.user, None, penalties
+                    registration.user, None, penalties[registration.user_id]
                 )
-                if penalties < 3 and earliest_reg < timezone.now():
+                if penalties[registration.user_id] < 3 and earliest_reg < timezone.now():
                     return registration
             return None
 
         return self.waiting_registrations.first()
 
+    def get_waiting_penalties(self, waiting_registrations):
+        """
+        Return the penalty weight of every user in a list of waiting registrations, using a
+        single query. Every weight is 0 when the event doesn't heed penalties.
+        """
+        user_ids = [registration.user_id for registration in waiting_registrations]
+        if not self.heed_penalties:
+            return {user_id: 0 for user_id in user_ids}
+        return Penalty.objects.penalties_for_users(user_ids)
+
     @staticmethod
     def has_pool_permission(user, pool):
         for group in pool.permission_groups.all():
-            if group in user.all_groups:
+            if group.id in user.all_group_ids:
                 return True
         return False
 
@@ -479,12 +560,15 @@ class Event(Content, BasisModel, ObjectPermissionsModel):
         return full_pools, open_pools
 
     @staticmethod
-    def find_most_exclusive_pools(pools):
+    def find_most_exclusive_pools(pools, potential_members=None):
         lowest = float('inf')
         equal = []
         for pool in pools:
-            groups = pool.permission_groups.all()
-            users = sum(g.number_of_users for g in groups)
+            if potential_members:
+                users = potential_members[pool.id]
+            else:
+                groups = pool.permission_groups.all()
+                users = sum(g.number_of_users for g in groups)
             if users == lowest:
                 equal.append(pool)
             elif users < lowest:
@@ -516,11 +600,70 @@ class Event(Content, BasisModel, ObjectPermissionsModel):
             return None
 
         if self.is_merged:
-            return all_pools.annotate(Count('registrations'))\
-                .aggregate(spots_left=Sum('capacity') - Sum('registrations__count'))['spots_left']
+            occupancy = self.get_occupancy()['pools']
+            return sum(pool['capacity'] - pool['registered'] for pool in occupancy)
 
         return sum([pool.spots_left() for pool in pools])
 
+    def compute_occupancy(self):
+        """
+        Count the registrations in every pool and on the waiting list. The pool capacities and
+        activation dates are included, so the capacity can be computed without the pools.
+        """
+        registered = dict(
+            self.registrations.exclude(pool=None).order_by().values('pool_id')
+            .annotate(count=Count('id')).values_list('pool_id', 'count')
+        )
+        pools = [
+            {
+                'id': pool.id,
+                'capacity': pool.capacity,
+                'activation_date': pool.activation_date.isoformat(),
+                'registered': registered.get(pool.id, 0),
+            } for pool in Pool.objects.filter(event=self)
+        ]
+        return {'pools': pools, 'waiting': self.waiting_registrations.count()}
+
+    def update_occupancy(self, moves=(), pools=(), removed_pool_ids=()):
+        """
+        Change the occupancy snapshot stored on the event row. Called by the paths changing
+        registrations and pools, in the same transaction as the change.
+
+        :param moves: (from, to) pairs for the registrations that changed place. Each side is a
+            pool id, WAITING_LIST or None when the registration isn't counted.
+        :param pools: Pools that were created or had their capacity or activation date changed.
+        :param removed_pool_ids: Ids of deleted pools.
+
+        The counts are adjusted with the event row locked, so concurrent updates are serialized.
+        The snapshot is only recounted if it is missing or lacks a pool being changed. The new
+        counts are broadcast to the sockets following the event when the transaction commits.
+        """
+        from lego.apps.events.tasks import schedule_event_broadcast
+        with transaction.atomic():
+            stored = Event.objects.select_for_update().values_list('occupancy', flat=True)\
+                .get(pk=self.pk)
+            occupancy = change_occupancy(stored, moves, pools, removed_pool_ids)
+            if occupancy is None:
+                occupancy = self.compute_occupancy()
+            self.occupancy = occupancy
+            if occupancy == stored:
+                return
+            Event.objects.filter(pk=self.pk).update(occupancy=occupancy)
+            transaction.on_commit(lambda: schedule_event_broadcast(self.pk))
+
+    def get_occupancy(self):
+        """
+        The occupancy snapshot, computed if the event hasn't stored one yet.
+        """
+        return self.occupancy or self.compute_occupancy()
+
+    def get_active_pools_occupancy(self):
+        now = timezone.now()
+        return [
+            pool for pool in self.get_occupancy()['pools']
+            if parse_datetime(pool['activation_date']) <= now
+        ]
+
     @property
     def is_merged(self):
         if self.merge_time is None:
@@ -529,12 +672,15 @@ class Event(Content, BasisModel, ObjectPermissionsModel):
 
     def get_is_full(self, queryset=None):
         if queryset is None:
-            queryset = self.pools.filter(activation_date__lte=timezone.now())
-        query = queryset.annotate(Count('registrations')).aggregate(
-            active_capacity=Sum('capacity'), registrations_count=Sum('registrations__count')
-        )
-        active_capacity = query['active_capacity'] or 0
-        registrations_count = query['registrations_count'] or 0
+            pools = self.get_active_pools_occupancy()
+            active_capacity = sum(pool['capacity'] for pool in pools)
+            registrations_count = sum(pool['registered'] for pool in pools)
+        else:
+            query = queryset.annotate(Count('registrations')).aggregate(
+                active_capacity=Sum('capacity'), registrations_count=Sum('registrations__count')
+            )
+            active_capacity = query['active_capacity'] or 0
+            registrations_count = query['registrations_count'] or 0
         if active_capacity == 0:
             return False
         return active_capacity <= registrations_count
@@ -546,9 +692,7 @@ class Event(Content, BasisModel, ObjectPermissionsModel):
     @property
     def active_capacity(self):
         """ Calculation capacity of pools that are active. """
-        aggregate = self.pools.all().filter(activation_date__lte=timezone.now())\
-            .aggregate(Sum('capacity'))
-        return aggregate['capacity__sum'] or 0
+        return sum(pool['capacity'] for pool in self.get_active_pools_occupancy())
 
     @property
     def total_capacity(self):
@@ -557,8 +701,8 @@ class Event(Content, BasisModel, ObjectPermissionsModel):
 
     @property
     def registration_count(self):
-        """ Prefetch friendly counting of registrations for an event. """
-        return sum([pool.registrations.all().count() for pool in self.pools.all()])
+        """ Registrations in the pools, read from the occupancy snapshot. """
+        return sum(pool['registered'] for pool in self.get_occupancy()['pools'])
 
     @property
     def number_of_registrations(self):
@@ -583,13 +727,12 @@ class Event(Content, BasisModel, ObjectPermissionsModel):
     @property
     def waiting_registrations(self):
         return self.registrations.filter(
-            pool=None, unregistration_date=None,
-            status__in=[constants.SUCCESS_REGISTER, constants.FAILURE_UNREGISTER]
+            pool=None, unregistration_date=None, status__in=constants.WAITING_STATUSES
         )
 
     @property
     def waiting_registration_count(self):
-        return self.waiting_registrations.count()
+        return self.get_occupancy()['waiting']
 
     @property
     def is_abakom_only(self):
@@ -635,20 +778,39 @@ class Pool(BasisModel):
     class Meta:
         ordering = ['id']
 
+    def save(self, *args, **kwargs):
+        """
+        Counter updates are made with the event locked already. Other changes lock the event
+        before the pool row is written, the same order as the registration paths.
+        """
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and not set(update_fields) - {'counter'}:
+            return super().save(*args, **kwargs)
+        with transaction.atomic():
+            self.lock_event()
+            super().save(*args, **kwargs)
+            self.event.update_occupancy(pools=[self])
+
     def delete(self, *args, **kwargs):
-        if not self.registrations.exists():
-            super().delete(*args, **kwargs)
-        else:
+        if self.registrations.exists():
             raise RegistrationsExistInPool('Registrations exist in Pool')
+        pool_id = self.id
+        with transaction.atomic():
+            self.lock_event()
+            super().delete(*args, **kwargs)
+            self.event.update_occupancy(removed_pool_ids=[pool_id])
+
+    def lock_event(self):
+        Event.objects.select_for_update().values_list('id', flat=True).get(pk=self.event_id)
 
     @property
     def is_full(self):
         if self.capacity == 0:
             return False
-        return self.registrations.count() >= self.capacity
+        return self.registration_count >= self.capacity
 
     def spots_left(self):
-        return self.capacity - self.registrations.count()
+        return self.capacity - self.registration_count
 
     @property
     def is_activated(self):
@@ -656,6 +818,10 @@ class Pool(BasisModel):
 
     @property
     def registration_count(self):
+        """ Read from the occupancy snapshot of the event. """
+        for pool in self.event.get_occupancy()['pools']:
+            if pool['id'] == self.id:
+                return pool['registered']
         return self.registrations.count()
 
     def increment(self):
@@ -707,9 +873,78 @@ class Registration(BasisModel):
     def __str__(self):
         return str({"user": self.user, "pool": self.pool})
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        registration = super().from_db(db, field_names, values)
+        if OCCUPANCY_ATTNAMES.issubset(field_names):
+            registration.remember_occupancy_slot()
+        return registration
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        if fields is None or OCCUPANCY_ATTNAMES.issubset(fields):
+            self.remember_occupancy_slot()
+
     def save(self, *args, **kwargs):
+        """
+        Moving the registration between the pools and the waiting list updates the occupancy
+        snapshot of the event in the same transaction, with the event locked before the write.
+        Saves keeping the registration in place, like the payment updates, don't lock the event.
+        """
         self.validate()
-        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and not OCCUPANCY_FIELDS.intersection(update_fields):
+            return super().save(*args, **kwargs)
+
+        target = occupancy_slot(self.pool_id, self.unregistration_date, self.status)
+        source = self.loaded_occupancy_slot()
+        if source == target:
+            super().save(*args, **kwargs)
+        else:
+            with transaction.atomic():
+                self.lock_event()
+                super().save(*args, **kwargs)
+                self.event.update_occupancy(moves=[(source, target)])
+        self.remember_occupancy_slot()
+
+    def delete(self, *args, **kwargs):
+        source = self.loaded_occupancy_slot()
+        if source is None:
+            return super().delete(*args, **kwargs)
+
+        with transaction.atomic():
+            self.lock_event()
+            result = super().delete(*args, **kwargs)
+            self.event.update_occupancy(moves=[(source, None)])
+        return result
+
+    def remember_occupancy_slot(self):
+        """
+        Store where the registration is counted, later saves compare against it to find out if
+        the occupancy snapshot has to change.
+        """
+        self._occupancy_slot = occupancy_slot(self.pool_id, self.unregistration_date, self.status)
+
+    def loaded_occupancy_slot(self):
+        """
+        Where the registration was counted when it was loaded or last saved. Looked up from the
+        stored row if the instance wasn't loaded with the occupancy fields.
+        """
+        if self.pk is None:
+            return None
+        if hasattr(self, '_occupancy_slot'):
+            return self._occupancy_slot
+        return self.previous_occupancy_slot()
+
+    def previous_occupancy_slot(self):
+        """
+        Where the stored version of the registration is counted in the occupancy snapshot.
+        """
+        if self.pk is None:
+            return None
+        previous = Registration.objects.filter(pk=self.pk)\
+            .values_list('pool_id', 'unregistration_date', 'status').first()
+        return occupancy_slot(*previous) if previous else None
 
     @property
     def is_admitted(self):
@@ -755,9 +990,17 @@ class Registration(BasisModel):
             for penalty in self.user.penalties.filter(source_event=self.event):
                 penalty.delete()
 
+    def lock_event(self):
+        """
+        Lock the event row. Registration changes update the occupancy snapshot on the event row,
+        the event is locked before the pools so every path takes the locks in the same order.
+        """
+        Event.objects.select_for_update().values_list('id', flat=True).get(pk=self.event_id)
+
     def add_to_pool(self, pool):
         allowed = False
         with transaction.atomic():
+            self.lock_event()
             locked_pool = Pool.objects.select_for_update().get(pk=pool.id)
             if locked_pool.capacity == 0 or locked_pool.counter < locked_pool.capacity:
                 locked_pool.increment()
@@ -783,6 +1026,7 @@ class Registration(BasisModel):
         # We do not care about the counter if the event is merged or pool is None
         if self.pool and not is_merged:
             with transaction.atomic():
+                self.lock_event()
                 locked_pool = Pool.objects.select_for_update().get(pk=self.pool.id)
                 locked_pool.decrement()
         return self.set_values(
@@ -0,0 +1,518 @@
+from datetime import timedelta
+
+from django.db import models, transaction
+from django.db.models import Case, Count, F, Value, When
+from django.utils import timezone
+
+from lego.apps.events import activation, constants
+from lego.apps.events.exceptions import EventHasClosed, EventNotReady
+from lego.apps.events.models import Pool, Registration, occupancy_slot
+from lego.apps.feed.registry import get_handler
+from lego.apps.users.group_closure import get_group_ids_for_users
+from lego.apps.users.models import AbakusGroup, Membership
+
+
+class PoolState:
+    """
+    In-memory representation of a pool. Holds everything the engine needs to allocate a
+    registration without touching the database.
+    """
+
+    __slots__ = ('id', 'capacity', 'counter', 'registered', 'activation_date', 'group_ids')
+
+    def __init__(self, id, capacity, counter, registered, activation_date, group_ids):
+        self.id = id
+        self.capacity = capacity
+        self.counter = counter
+        self.registered = registered
+        self.activation_date = activation_date
+        self.group_ids = group_ids
+
+    @property
+    def is_full(self):
+        if self.capacity == 0:
+            return False
+        return self.registered >= self.capacity
+
+    def is_activated(self, time):
+        return self.activation_date <= time
+
+    def has_room(self):
+        """
+        Mirrors the counter check done by `Registration.add_to_pool`.
+        """
+        return self.capacity == 0 or self.counter < self.capacity
+
+
+class RegistrationEngine:
+    """
+    Allocates pending registrations for a single event in memory.
+
+    The engine loads the pools, capacities, allowed groups and counters of the event once, and
+    decides which pool each registration should join without querying the database per
+    registration. Decisions are queued and written back in one batched transaction by `flush()`.
+
+    The allocation rules are the same as `Event.register`. Use the engine inside a transaction,
+    the pools of the event are locked with select_for_update while the state is loaded.
+
+    > with transaction.atomic():
+    >     engine = RegistrationEngine(event)
+    >     for registration in registrations:
+    >         engine.register(registration)
+    >     engine.flush()
+    """
+
+    def __init__(self, event):
+        self.event = event
+        self.pools = []
+        self.user_groups = {}
+        self.user_penalties = {}
+        self.admitted_users = set()
+        self.decisions = []
+        self.counter_increments = {}
+        self._pool_members = None
+        self._potential_members = None
+        self.loaded = False
+
+    def load(self):
+        """
+        Load the allocation state of the event. One query per kind of data, regardless of the
+        amount of pools.
+        """
+        pool_rows = Pool.objects.select_for_update().filter(event=self.event).order_by('id')\
+            .values('id', 'capacity', 'counter', 'activation_date')
+        pool_rows = list(pool_rows)
+
+        registered = dict(
+            Registration.objects.filter(pool__event=self.event).values('pool_id')
+            .annotate(count=Count('id')).values_list('pool_id', 'count')
+        )
+
+        group_ids = {}
+        through = Pool.permission_groups.through
+        for pool_id, group_id in through.objects.filter(pool__event=self.event)\
+                .values_list('pool_id', 'abakusgroup_id'):
+            group_ids.setdefault(pool_id, set()).add(group_id)
+
+        self.pools = [
+            PoolState(
+                id=row['id'], capacity=row['capacity'], counter=row['counter'],
+                registered=registered.get(row['id'], 0), activation_date=row['activation_date'],
+                group_ids=frozenset(group_ids.get(row['id'], set()))
+            ) for row in pool_rows
+        ]
+        self.admitted_users = set(
+            self.event.registrations.exclude(pool=None).values_list('user_id', flat=True)
+        )
+        self.loaded = True
+        return self
+
+    def load_users(self, user_ids):
+        """
+        Resolve group memberships and penalties for a set of users in bulk.
+        """
+        user_ids = set(user_ids) - set(self.user_groups.keys())
+        if not user_ids:
+            return
+
+        self.user_groups.update(get_group_ids_for_users(user_ids))
+
+        if self.event.heed_penalties:
+            self.user_penalties.update(activation.get_penalties(self.event.id, user_ids))
+
+    def pool_members(self):
+        """
+        Ids of the users able to join each pool, resolved for all pools using a single membership
+        query. Maps the pool id to a dict with the member ids of each permission group.
+        """
+        if self._pool_members is None:
+            root_ids = set().union(*[p.group_ids for p in self.pools])
+            roots = AbakusGroup.objects.filter(id__in=root_ids)
+            descendants = {
+                root.id: set(root.get_descendants(True).values_list('id', flat=True))
+                for root in roots
+            }
+
+            members = {}
+            memberships = Membership.objects.filter(
+                deleted=False, is_active=True, abakus_group__in=set().union(*descendants.values())
+            ).values_list('abakus_group_id', 'user_id')
+            for group_id, user_id in memberships:
+                members.setdefault(group_id, set()).add(user_id)
+
+            group_members = {
+                root_id: set().union(*[members.get(group_id, set()) for group_id in group_ids])
+                for root_id, group_ids in descendants.items()
+            }
+            self._pool_members = {}
+            for p in self.pools:
+                self._pool_members[p.id] = {
+                    group_id: group_members.get(group_id, set())
+                    for group_id in p.group_ids
+                }
+        return self._pool_members
+
+    def potential_members(self, pool):
+        """
+        Number of users able to join a pool. Equal to summing `AbakusGroup.number_of_users` over
+        the permission groups, but computed for all pools using a single membership query.
+        Uses the counts prepared before the activation of a pool when they are cached.
+        """
+        if self._potential_members is None:
+            pool_ids = [p.id for p in self.pools]
+            self._potential_members = activation.get_potential_members(self.event.id, pool_ids)
+        if self._potential_members is None:
+            self._potential_members = self.count_potential_members()
+        return self._potential_members[pool.id]
+
+    def count_potential_members(self):
+        return {
+            pool_id: sum(len(users) for users in groups.values())
+            for pool_id, groups in self.pool_members().items()
+        }
+
+    @property
+    def is_full(self):
+        """
+        Same semantics as `Event.is_full`, only active pools are counted.
+        """
+        now = timezone.now()
+        active = [pool for pool in self.pools if pool.is_activated(now)]
+        active_capacity = sum(pool.capacity for pool in active)
+        if active_capacity == 0:
+            return False
+        return active_capacity <= sum(pool.registered for pool in active)
+
+    def get_possible_pools(self, user_id, is_admitted=False, time=None):
+        if is_admitted or user_id in self.admitted_users:
+            return []
+        time = time or timezone.now()
+        groups = self.user_groups.get(user_id, set())
+        return [
+            pool for pool in self.pools
+            if pool.is_activated(time) and not pool.group_ids.isdisjoint(groups)
+        ]
+
+    def get_earliest_registration_time(self, pools, penalties):
+        reg_time = min(pool.activation_date for pool in pools)
+        if self.event.heed_penalties:
+            if penalties == 2:
+                return reg_time + timedelta(hours=12)
+            elif penalties == 1:
+                return reg_time + timedelta(hours=3)
+        return reg_time
+
+    def select_pool(self, registration):
+        """
+        Decide which pool a registration should join. Returns a PoolState, or None when the
+        registration belongs on the waiting list. Raises the same exceptions as `Event.register`.
+        """
+        if not self.loaded:
+            self.load()
+        user_id = registration.user_id
+        self.load_users([user_id])
+
+        penalties = self.user_penalties.get(user_id, 0) if self.event.heed_penalties else 0
+        current_time = timezone.now()
+        closes = self.event.start_time - timedelta(hours=constants.REGISTRATION_CLOSE_TIME)
+        if closes < current_time:
+            raise EventHasClosed()
+
+        possible_pools = self.get_possible_pools(
+            user_id, is_admitted=registration.pool_id is not None, time=current_time
+        )
+        if not self.event.is_ready:
+            raise EventNotReady()
+        if not possible_pools:
+            raise ValueError('No available pools')
+        if self.get_earliest_registration_time(possible_pools, penalties) > current_time:
+            raise ValueError('Not open yet')
+
+        if penalties >= 3:
+            return None
+
+        if len(self.pools) == 1:
+            return self._counted(possible_pools[0])
+
+        if self.event.is_merged:
+            if not self.is_full:
+                return possible_pools[0]
+            return None
+
+        open_pools = [pool for pool in possible_pools if not pool.is_full]
+        if not open_pools:
+            return None
+
+        if len(open_pools) == 1:
+            return self._counted(open_pools[0])
+
+        lowest = min(self.potential_members(pool) for pool in open_pools)
+        exclusive_pools = [pool for pool in open_pools if self.potential_members(pool) == lowest]
+        capacities = [pool.capacity for pool in exclusive_pools]
+        return self._counted(exclusive_pools[capacities.index(max(capacities))])
+
+    def _counted(self, pool):
+        """
+        Pools joined through `add_to_pool` are guarded by the pool counter.
+        """
+        if pool.has_room():
+            pool.counter += 1
+            self.counter_increments[pool.id] = self.counter_increments.get(pool.id, 0) + 1
+            return pool
+        return None
+
+    def register(self, registration, registration_date=None):
+        """
+        Allocate a registration in memory and queue the result for `flush()`.
+        The registration instance is updated to reflect the decision.
+
+        :param registration_date: Keep this registration date instead of the current time. Used
+        by the batch worker to preserve the time the registration was requested.
+        """
+        pool = self.select_pool(registration)
+        if pool:
+            pool.registered += 1
+            self.admitted_users.add(registration.user_id)
+
+        if Registration.pool.field.is_cached(registration):
+            Registration.pool.field.delete_cached_value(registration)
+        registration.pool_id = pool.id if pool else None
+        registration.registration_date = registration_date or timezone.now()
+        registration.unregistration_date = None
+        registration.status = constants.SUCCESS_REGISTER
+        self.decisions.append(registration)
+        return registration
+
+    def flush(self):
+        """
+        Write all queued decisions back using one UPDATE for the registrations and one UPDATE
+        per pool for the counters.
+        """
+        if not self.decisions:
+            return []
+
+        decisions, self.decisions = self.decisions, []
+        increments, self.counter_increments = self.counter_increments, {}
+
+        with transaction.atomic():
+            previous = Registration.objects.filter(id__in=[r.id for r in decisions])\
+                .values_list('id', 'pool_id', 'unregistration_date', 'status')
+            sources = {row[0]: occupancy_slot(*row[1:]) for row in previous}
+            Registration.objects.filter(id__in=[r.id for r in decisions]).update(
+                pool_id=Case(
+                    *[When(id=r.id, then=Value(r.pool_id)) for r in decisions],
+                    output_field=models.IntegerField()
+                ),
+                registration_date=Case(
+                    *[When(id=r.id, then=Value(r.registration_date)) for r in decisions],
+                    output_field=models.DateTimeField()
+                ),
+                unregistration_date=None,
+                status=constants.SUCCESS_REGISTER,
+                updated_at=timezone.now(),
+            )
+            for pool_id, increment in increments.items():
+                Pool.objects.filter(id=pool_id).update(counter=F('counter') + increment)
+            moves = [
+                (sources.get(r.id), occupancy_slot(r.pool_id, r.unregistration_date, r.status))
+                for r in decisions
+            ]
+            self.event.update_occupancy(moves=moves)
+            for registration in decisions:
+                registration.remember_occupancy_slot()
+
+        return decisions
+
+
+class BumpPlanner(RegistrationEngine):
+    """
+    Plans the moves made when a spot opens in an event, without querying the database per
+    waiting registration.
+
+    The waiting list is loaded once together with the group ids and penalty weights of the
+    waiting users. The planner picks the first waiting registration able to join the open pool.
+    If nobody is, it looks for a registration in a pool the waiting users can join that is able
+    to move to the open pool, so the first eligible waiting registration can take its spot.
+    The rules are the same as the ones used by `Event.pop_from_waiting_list`.
+
+    `apply()` writes the planned moves and the pool counters in one transaction. Use the planner
+    with the event locked using select_for_update.
+
+    > planner = BumpPlanner(event)
+    > planner.apply(planner.plan(open_pool))
+    """
+
+    def __init__(self, event):
+        super().__init__(event)
+        self.waiting_registrations = []
+        self._pool_registrations = None
+
+    def load(self):
+        super().load()
+        self.waiting_registrations = list(self.event.waiting_registrations.select_related('user'))
+        self.load_users(registration.user_id for registration in self.waiting_registrations)
+        return self
+
+    def get_pool(self, pool_id):
+        return next(pool for pool in self.pools if pool.id == pool_id)
+
+    def pool_registrations(self, pool):
+        """
+        Registrations in a pool in registration order. The registrations of every pool and the
+        group ids of the registered users are loaded on first use.
+        """
+        if self._pool_registrations is None:
+            registrations = list(self.event.registrations.exclude(pool=None))
+            self.user_groups.update(
+                get_group_ids_for_users(
+                    registration.user_id for registration in registrations
+                    if registration.user_id not in self.user_groups
+                )
+            )
+            self._pool_registrations = {}
+            for registration in registrations:
+                self._pool_registrations.setdefault(registration.pool_id, []).append(registration)
+        return self._pool_registrations.get(pool.id, [])
+
+    def penalties(self, user_id):
+        if not self.event.heed_penalties:
+            return 0
+        return self.user_penalties.get(user_id, 0)
+
+    def can_bump(self, registration, pool, time):
+        """
+        Whether a waiting registration can be bumped to a pool, mirrors
+        `Event.pop_from_waiting_list(to_pool)`.
+        """
+        if pool not in self.get_possible_pools(registration.user_id, time=time):
+            return False
+        if self.event.heed_penalties:
+            penalties = self.penalties(registration.user_id)
+            return penalties < 3 and self.get_earliest_registration_time([pool], penalties) < time
+        return True
+
+    def can_bump_merged(self, registration, time):
+        """
+        Whether a waiting registration can be bumped after the merge, mirrors
+        `Event.pop_from_waiting_list()`.
+        """
+        if not self.get_possible_pools(registration.user_id, time=time):
+            return False
+        if self.event.heed_penalties:
+            groups = self.user_groups.get(registration.user_id, set())
+            pools = [pool for pool in self.pools if not pool.group_ids.isdisjoint(groups)]
+            penalties = self.penalties(registration.user_id)
+            return penalties < 3 and self.get_earliest_registration_time(pools, penalties) < time
+        return True
+
+    def first_waiting(self, pool, time):
+        return next(
+            (
+                registration for registration in self.waiting_registrations
+                if self.can_bump(registration, pool, time)
+            ), None
+        )
+
+    def plan_rebalance(self, open_pool, time):
+        """
+        Find a registration able to move to `open_pool` from a pool the waiting users can join,
+        and the waiting registration that takes its spot.
+        """
+        tried = set()
+        for waiting in self.waiting_registrations:
+            for full_pool in self.get_possible_pools(waiting.user_id, time=time):
+                if full_pool.id in tried:
+                    continue
+                tried.add(full_pool.id)
+
+                bumped = self.first_waiting(full_pool, time)
+                if not bumped:
+                    continue
+                for registration in self.pool_registrations(full_pool):
+                    groups = self.user_groups.get(registration.user_id, set())
+                    if not open_pool.group_ids.isdisjoint(groups):
+                        return [(registration, open_pool), (bumped, full_pool)]
+        return []
+
+    def plan(self, open_pool):
+        """
+        Plan the moves after a spot opened in `open_pool`.
+
+        :return: A list of (registration, PoolState) tuples, in the order they should be applied.
+        Waiting registrations in the list are bumped, the other registrations are rebalanced.
+        """
+        if not self.loaded:
+            self.load()
+        time = timezone.now()
+        open_pool = self.get_pool(open_pool.id)
+
+        if self.is_full:
+            return []
+
+        if self.event.is_merged:
+            for registration in self.waiting_registrations:
+                if self.can_bump_merged(registration, time):
+                    pools = self.get_possible_pools(registration.user_id, time=time)
+                    return [(registration, pools[0])]
+            return []
+
+        if open_pool.is_full:
+            return []
+
+        bumped = self.first_waiting(open_pool, time)
+        if bumped:
+            return [(bumped, open_pool)]
+        return self.plan_rebalance(open_pool, time)
+
+    def plan_early_bump(self, opening_pool):
+        """
+        Plan the bumps to a pool that is about to be activated, mirrors `Event.early_bump`.
+        Waiting registrations able to join the pool are bumped in order until it is full.
+        """
+        if not self.loaded:
+            self.load()
+        opening_pool = self.get_pool(opening_pool.id)
+
+        moves = []
+        for registration in self.waiting_registrations:
+            if opening_pool.capacity and \
+                    opening_pool.registered + len(moves) >= opening_pool.capacity:
+                break
+            if self.penalties(registration.user_id) >= 3:
+                continue
+            if registration.user_id in self.admitted_users:
+                continue
+            groups = self.user_groups.get(registration.user_id, set())
+            if not opening_pool.group_ids.isdisjoint(groups):
+                moves.append((registration, opening_pool))
+        return moves
+
+    def apply(self, moves):
+        """
+        Write the planned moves and update the pool counters. Bumped registrations are passed to
+        the bump handler.
+        """
+        increments = {}
+        bumped = []
+        with transaction.atomic():
+            for registration, pool in moves:
+                if registration.pool_id is None:
+                    bumped.append(registration)
+                else:
+                    increments[registration.pool_id] = increments.get(registration.pool_id, 0) - 1
+                    self.get_pool(registration.pool_id).registered -= 1
+                increments[pool.id] = increments.get(pool.id, 0) + 1
+                pool.registered += 1
+
+                if Registration.pool.field.is_cached(registration):
+                    Registration.pool.field.delete_cached_value(registration)
+                registration.pool_id = pool.id
+                registration.save(update_fields=['pool'])
+
+            for pool_id, increment in increments.items():
+                if increment:
+                    Pool.objects.filter(id=pool_id).update(counter=F('counter') + increment)
+
+        for registration in bumped:
+            get_handler(Registration).handle_bump(registration)
+        return moves
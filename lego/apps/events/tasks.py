@@ -1,21 +1,26 @@
 from datetime import timedelta
 
 import stripe
+from django.conf import settings
+from django.core.cache import cache
 from django.db import IntegrityError, transaction
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from redis.exceptions import LockError
 from structlog import get_logger
 
 from lego import celery_app
-from lego.apps.events import constants
+from lego.apps.events import activation, constants
 from lego.apps.events.exceptions import (
-    EventHasClosed, PoolCounterNotEqualToRegistrationCount, WebhookDidNotFindRegistration
+    EventHasClosed, EventNotReady, PoolCounterNotEqualToRegistrationCount,
+    WebhookDidNotFindRegistration
 )
-from lego.apps.events.models import Event, Registration
+from lego.apps.events.models import Event, Pool, Registration
 from lego.apps.events.notifications import EventPaymentOverdueCreatorNotification
+from lego.apps.events.registration_engine import RegistrationEngine
 from lego.apps.events.serializers.registrations import StripeObjectSerializer
 from lego.apps.events.websockets import (
-    notify_event_registration, notify_user_payment, notify_user_registration
+    notify_event_registration, notify_occupancy, notify_user_payment, notify_user_registration
 )
 from lego.apps.feed.registry import get_handler
 from lego.utils.tasks import AbakusTask
@@ -89,6 +94,114 @@ def async_register(self, registration_id, logger_context=None):
         raise self.retry(exc=e, max_retries=3)
 
 
+REGISTER_BATCH_CACHE_KEY = 'register_batch_scheduled_'
+
+
+class AsyncRegisterBatch(AbakusTask):
+    serializer = 'json'
+    default_retry_delay = 5
+    max_retries = 3
+
+
+def schedule_register_batch(event_id):
+    """
+    Queue a batch task for the event, unless one is already waiting in the queue. The task clears
+    the key before it drains the event, registrations arriving after that schedules a new batch.
+    """
+    if cache.add(f'{REGISTER_BATCH_CACHE_KEY}{event_id}', True, timeout=60):
+        async_register_batch.delay(event_id)
+
+
+@celery_app.task(base=AsyncRegisterBatch, bind=True)
+def async_register_batch(self, event_id, logger_context=None):
+    """
+    Drain all pending registrations for an event in one pass. The event is locked once, the
+    registrations are allocated in memory in registration_date order and written back in bulk.
+    Registrations that can't be allocated yet stay pending and are retried with the batch, like
+    `async_register` they are marked as failed when the retries are used up.
+    """
+    self.setup_logger(logger_context)
+    cache.delete(f'{REGISTER_BATCH_CACHE_KEY}{event_id}')
+
+    failed = []
+    with transaction.atomic():
+        event = Event.objects.select_for_update().get(pk=event_id)
+        pending = list(
+            event.registrations.select_for_update().filter(status=constants.PENDING_REGISTER)
+            .order_by('registration_date', 'id')
+        )
+        if not pending:
+            return
+
+        engine = RegistrationEngine(event).load()
+        engine.load_users([registration.user_id for registration in pending])
+        for index, registration in enumerate(pending):
+            try:
+                engine.register(registration, registration_date=registration.registration_date)
+            except EventHasClosed as e:
+                log.warn(
+                    'registration_tried_after_started', exception=e, registration_id=registration.id
+                )
+            except EventNotReady as e:
+                # The event isn't ready for any of the registrations.
+                log.error('registration_event_not_ready', exception=e, event_id=event_id)
+                failed += pending[index:]
+                break
+            except ValueError as e:
+                log.error('registration_error', exception=e, registration_id=registration.id)
+                failed.append(registration)
+
+        registrations = engine.flush()
+
+        def notify():
+            for registration in registrations:
+                notify_event_registration(constants.SOCKET_REGISTRATION_SUCCESS, registration)
+
+        transaction.on_commit(notify)
+    log.info('registration_batch_success', event_id=event_id, registrations=len(registrations))
+
+    if failed:
+        if self.request.retries < self.max_retries:
+            raise self.retry()
+
+        Registration.objects.filter(id__in=[registration.id for registration in failed])\
+            .update(status=constants.FAILURE_REGISTER)
+        for registration in failed:
+            registration.status = constants.FAILURE_REGISTER
+            notify_user_registration(
+                constants.SOCKET_REGISTRATION_FAILURE, registration,
+                error_message='Registrering feilet'
+            )
+
+
+EVENT_BROADCAST_CACHE_KEY = 'event_broadcast_scheduled_'
+
+
+def schedule_event_broadcast(event_id):
+    """
+    Queue a broadcast of the pool counts of an event, unless one is already waiting. Updates to
+    the same event within EVENT_BROADCAST_INTERVAL seconds are sent as one message.
+    """
+    if cache.add(f'{EVENT_BROADCAST_CACHE_KEY}{event_id}', True, timeout=60):
+        broadcast_event_occupancy.apply_async(
+            (event_id, ), countdown=settings.EVENT_BROADCAST_INTERVAL
+        )
+
+
+@celery_app.task(serializer='json', bind=True, base=AbakusTask)
+def broadcast_event_occupancy(self, event_id, logger_context=None):
+    """
+    Send the current pool counts to the sockets following the event. The key is cleared before
+    the counts are read, updates arriving after that schedule a new broadcast.
+    """
+    self.setup_logger(logger_context)
+    cache.delete(f'{EVENT_BROADCAST_CACHE_KEY}{event_id}')
+
+    occupancy = Event.objects.filter(pk=event_id).values_list('occupancy', flat=True).first()
+    if occupancy:
+        notify_occupancy(event_id, occupancy)
+
+
 @celery_app.task(serializer='json', bind=True, base=AbakusTask, default_retry_delay=30)
 def async_unregister(self, registration_id, logger_context=None):
     self.setup_logger(logger_context)
@@ -242,6 +355,68 @@ def bump_waiting_users_to_new_pool(self, logger_context=None):
                             locked_event.early_bump(pool)
 
 
+@celery_app.task(serializer='json', bind=True, base=AbakusTask)
+def schedule_pool_activations(self, logger_context=None):
+    """
+    Queue `prepare_pool_activation` for the pools opening within the next minutes, to run
+    POOL_ACTIVATION_PREWARM_SECONDS before the activation. Runs every minute, every activation is
+    queued once.
+    """
+    self.setup_logger(logger_context)
+
+    now = timezone.now()
+    lead_time = timedelta(seconds=settings.POOL_ACTIVATION_PREWARM_SECONDS)
+    window = lead_time + timedelta(minutes=2)
+    pools = Pool.objects.filter(
+        activation_date__gt=now, activation_date__lte=now + window, event__start_time__gte=now
+    ).values_list('id', 'activation_date')
+    for pool_id, activation_date in pools:
+        if activation.mark_scheduled(pool_id, activation_date, timeout=window.total_seconds()):
+            prepare_pool_activation.apply_async(
+                (pool_id, activation_date.isoformat()), eta=max(now, activation_date - lead_time)
+            )
+            log.info('pool_activation_scheduled', pool_id=pool_id)
+
+
+@celery_app.task(serializer='json', bind=True, base=AbakusTask)
+def prepare_pool_activation(self, pool_id, activation_date, logger_context=None):
+    """
+    Bump the waiting list to a pool about to open, and prepare the allocation state used by the
+    registrations arriving at the activation, see lego.apps.events.activation.
+    """
+    self.setup_logger(logger_context)
+
+    event_id = Pool.objects.filter(id=pool_id).values_list('event_id', flat=True).first()
+    if event_id is None:
+        return
+
+    with transaction.atomic():
+        locked_event = Event.objects.select_for_update().get(pk=event_id)
+        pool = locked_event.pools.get(id=pool_id)
+        if pool.activation_date != parse_datetime(activation_date):
+            log.info('pool_activation_moved', event_id=event_id, pool_id=pool_id)
+            return
+
+        if not pool.is_full and locked_event.waiting_registrations.exists():
+            locked_event.early_bump(pool)
+            log.info('early_bump_executed', event_id=event_id, pool_id=pool_id)
+
+        engine = RegistrationEngine(locked_event).load()
+        user_ids = set().union(
+            *[users for groups in engine.pool_members().values() for users in groups.values()]
+        )
+        engine.load_users(user_ids)
+        activation.store_allocation_state(
+            event_id,
+            potential_members=engine.count_potential_members(),
+            user_ids=user_ids if locked_event.heed_penalties else [],
+            penalties=engine.user_penalties,
+            timeout=settings.POOL_ACTIVATION_PREWARM_SECONDS +
+            settings.POOL_ACTIVATION_STATE_TIMEOUT,
+        )
+    log.info('pool_activation_prepared', event_id=event_id, pool_id=pool_id, users=len(user_ids))
+
+
 @celery_app.task(serializer='json', bind=True, base=AbakusTask)
 def notify_user_when_payment_soon_overdue(self, logger_context=None):
     self.setup_logger(logger_context)
@@ -293,17 +468,29 @@ def notify_event_creator_when_payment_overdue(self, logger_context=None):
 @celery_app.task(serializer='json', bind=True, base=AbakusTask)
 def check_that_pool_counters_match_registration_number(self, logger_context=None):
     """
-    Task that checks whether pools counters are in sync with number of registrations. We do not
-    enforce this check for events that are merged, hence the merge_time filter, because
-    incrementing the counter decreases the registration performance
+    Task that reconciles the occupancy snapshot of upcoming events with the registrations, and
+    checks whether pools counters are in sync with number of registrations. We do not enforce the
+    counter check for events that are merged, hence the merge_time check, because incrementing
+    the counter decreases the registration performance
     """
     self.setup_logger(logger_context)
 
-    events_ids = Event.objects.filter(
-        start_time__gte=timezone.now(), merge_time__gte=timezone.now()
-    ).values_list('id', flat=True)
+    events = Event.objects.filter(start_time__gte=timezone.now()).values_list('id', 'merge_time')
+
+    for event_id, merge_time in events:
+        with transaction.atomic():
+            locked_event = Event.objects.select_for_update().get(pk=event_id)
+            occupancy = locked_event.compute_occupancy()
+            if occupancy != locked_event.occupancy:
+                log.warning(
+                    'event_occupancy_reconciled', event_id=event_id, stored=locked_event.occupancy,
+                    counted=occupancy
+                )
+                Event.objects.filter(pk=event_id).update(occupancy=occupancy)
+
+        if merge_time is None or merge_time < timezone.now():
+            continue
 
-    for event_id in events_ids:
         with transaction.atomic():
             locked_event = Event.objects.select_for_update().get(pk=event_id)
             for pool in locked_event.pools.all():
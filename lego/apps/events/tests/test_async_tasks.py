@@ -1,18 +1,23 @@
 from datetime import timedelta
 from unittest import mock
 
+from django.conf import settings
+from django.core.cache import cache
+from django.test import override_settings
 from django.utils import timezone
 
-from lego.apps.events import constants
+from lego.apps.events import activation, constants
 from lego.apps.events.exceptions import PoolCounterNotEqualToRegistrationCount
 from lego.apps.events.models import Event, Registration
 from lego.apps.events.tasks import (
-    async_register, bump_waiting_users_to_new_pool,
-    check_events_for_registrations_with_expired_penalties,
+    EVENT_BROADCAST_CACHE_KEY, async_register, async_register_batch, broadcast_event_occupancy,
+    bump_waiting_users_to_new_pool, check_events_for_registrations_with_expired_penalties,
     check_that_pool_counters_match_registration_number, notify_event_creator_when_payment_overdue,
-    notify_user_when_payment_soon_overdue
+    notify_user_when_payment_soon_overdue, prepare_pool_activation, schedule_event_broadcast,
+    schedule_pool_activations
 )
 from lego.apps.events.tests.utils import get_dummy_users, make_penalty_expire
+from lego.apps.events.websockets import notify_event_registration
 from lego.apps.users.models import AbakusGroup, Penalty
 from lego.utils.test_utils import BaseAPITestCase, BaseTestCase
 
@@ -175,6 +180,73 @@ class PoolActivationTestCase(BaseAPITestCase):
         self.assertEqual(self.pool_two.registrations.count(), 0)
         self.assertEqual(self.event.waiting_registrations.count(), 1)
 
+    def test_prepare_pool_activation_bumps_waiting_users(self):
+        """ The waiting list is bumped when the activation of a pool is prepared """
+        users = get_dummy_users(3)
+
+        for user in users:
+            AbakusGroup.objects.get(name='Webkom').add_user(user)
+            registration = Registration.objects.get_or_create(event=self.event, user=user)[0]
+            self.event.register(registration)
+
+        prepare_pool_activation(self.pool_two.id, self.pool_two.activation_date.isoformat())
+
+        self.assertEqual(self.pool_two.registrations.count(), 2)
+        self.pool_two.refresh_from_db()
+        self.assertEqual(self.pool_two.counter, 2)
+
+    def test_prepare_pool_activation_ignores_moved_activation(self):
+        """ Nothing is done when the activation date changed after the task was queued """
+        users = get_dummy_users(3)
+
+        for user in users:
+            AbakusGroup.objects.get(name='Webkom').add_user(user)
+            registration = Registration.objects.get_or_create(event=self.event, user=user)[0]
+            self.event.register(registration)
+
+        moved_from = self.pool_two.activation_date - timedelta(minutes=10)
+        prepare_pool_activation(self.pool_two.id, moved_from.isoformat())
+
+        self.assertEqual(self.pool_two.registrations.count(), 0)
+
+    @override_settings(POOL_ACTIVATION_PREWARM=True)
+    def test_prepare_pool_activation_stores_allocation_state(self):
+        """ Penalties are served from the prepared state until a penalty changes """
+        activation.invalidate_all()
+        user = get_dummy_users(1)[0]
+        AbakusGroup.objects.get(name='Webkom').add_user(user)
+        Penalty.objects.create(user=user, reason='test', weight=2, source_event=self.event)
+
+        prepare_pool_activation(self.pool_two.id, self.pool_two.activation_date.isoformat())
+
+        with self.assertNumQueries(0):
+            self.assertEqual(activation.get_penalties(self.event.id, [user.id]), {user.id: 2})
+        self.assertIsNotNone(
+            activation.get_potential_members(self.event.id,
+                                             [self.pool_one.id, self.pool_two.id])
+        )
+
+        Penalty.objects.create(user=user, reason='test', weight=1, source_event=self.event)
+        self.assertIsNone(activation.get_allocation_state(self.event.id))
+        self.assertEqual(activation.get_penalties(self.event.id, [user.id]), {user.id: 3})
+
+    @mock.patch('lego.apps.events.tasks.prepare_pool_activation.apply_async')
+    def test_schedule_pool_activations(self, mock_apply_async):
+        """ Activations are queued ahead of time, once per activation date """
+        self.pool_two.activation_date = timezone.now() + timedelta(minutes=2)
+        self.pool_two.save()
+
+        schedule_pool_activations()
+        schedule_pool_activations()
+
+        mock_apply_async.assert_called_once()
+        args, kwargs = mock_apply_async.call_args
+        self.assertEqual(args[0], (self.pool_two.id, self.pool_two.activation_date.isoformat()))
+        self.assertEqual(
+            kwargs['eta'], self.pool_two.activation_date -
+            timedelta(seconds=settings.POOL_ACTIVATION_PREWARM_SECONDS)
+        )
+
     def test_ensure_pool_counters_raise_error_when_incorrect(self):
         """Test that counter raises error due to incorrect counter"""
 
@@ -211,6 +283,26 @@ class PoolActivationTestCase(BaseAPITestCase):
 
         check_that_pool_counters_match_registration_number()
 
+    def test_occupancy_is_reconciled(self):
+        """Test that the occupancy snapshot is corrected when registrations bypass the models"""
+        self.event.merge_time = timezone.now() - timedelta(days=1)
+        self.event.save()
+        Registration.objects.bulk_create(
+            [
+                Registration(event=self.event, user=user, pool=self.pool_one)
+                for user in get_dummy_users(2)
+            ]
+        )
+
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.registration_count, 0)
+
+        check_that_pool_counters_match_registration_number()
+
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.registration_count, 2)
+        self.assertEqual(self.event.occupancy, self.event.compute_occupancy())
+
 
 class PenaltyExpiredTestCase(BaseTestCase):
     fixtures = [
@@ -346,6 +438,144 @@ class PenaltyExpiredTestCase(BaseTestCase):
         self.assertEqual(self.event.number_of_registrations, 2)
 
 
+class RegisterBatchTestCase(BaseTestCase):
+    fixtures = [
+        'test_abakus_groups.yaml', 'test_users.yaml', 'test_events.yaml', 'test_companies.yaml'
+    ]
+
+    def setUp(self):
+        self.event = Event.objects.get(title='POOLS_NO_REGISTRATIONS')
+        self.event.start_time = timezone.now() + timedelta(days=1)
+        self.event.merge_time = timezone.now() + timedelta(hours=12)
+        self.event.save()
+        self.pool_one = self.event.pools.get(name='Abakusmember')
+        self.pool_two = self.event.pools.get(name='Webkom')
+
+    def create_pending(self, users):
+        registrations = []
+        for i, user in enumerate(users):
+            registrations.append(
+                Registration.objects.create(
+                    event=self.event, user=user, status=constants.PENDING_REGISTER,
+                    registration_date=timezone.now() + timedelta(seconds=i)
+                )
+            )
+        return registrations
+
+    @mock.patch('lego.apps.events.tasks.notify_event_registration')
+    def test_drains_all_pending_registrations(self, mock_notify):
+        """All pending registrations for the event are processed by one task"""
+        users = get_dummy_users(6)
+        for user in users:
+            AbakusGroup.objects.get(name='Webkom').add_user(user)
+        registrations = self.create_pending(users)
+
+        async_register_batch(self.event.id)
+
+        self.assertEqual(self.pool_one.registrations.count(), 3)
+        self.assertEqual(self.pool_two.registrations.count(), 2)
+        self.assertEqual(self.event.waiting_registrations.count(), 1)
+        self.assertFalse(
+            self.event.registrations.filter(status=constants.PENDING_REGISTER).exists()
+        )
+        self.assertIsNone(Registration.objects.get(id=registrations[-1].id).pool)
+        self.assertEqual(mock_notify.call_count, 6)
+
+    @mock.patch('lego.apps.events.tasks.notify_event_registration')
+    def test_notifications_are_sent_in_order(self, mock_notify):
+        """Notifications are sent in the order the registrations were requested"""
+        users = get_dummy_users(3)
+        for user in users:
+            AbakusGroup.objects.get(name='Abakus').add_user(user)
+        registrations = self.create_pending(reversed(users))
+
+        async_register_batch(self.event.id)
+
+        notified = [call[0][1].id for call in mock_notify.call_args_list]
+        self.assertEqual(notified, [registration.id for registration in registrations])
+
+    @mock.patch('lego.apps.events.tasks.notify_event_registration')
+    def test_counters_match_after_batch(self, mock_notify):
+        """Pool counters are adjusted once and match the registrations"""
+        users = get_dummy_users(4)
+        for user in users:
+            AbakusGroup.objects.get(name='Webkom').add_user(user)
+        self.create_pending(users)
+
+        async_register_batch(self.event.id)
+
+        for pool in self.event.pools.all():
+            self.assertEqual(pool.counter, pool.registrations.count())
+
+    @mock.patch('lego.apps.events.tasks.notify_user_registration')
+    def test_event_not_ready(self, mock_notify):
+        """Registrations for an event that isn't ready are retried, then marked as failed"""
+        self.event.is_ready = False
+        self.event.save()
+        users = get_dummy_users(2)
+        for user in users:
+            AbakusGroup.objects.get(name='Abakus').add_user(user)
+        registrations = self.create_pending(users)
+
+        async_register_batch.apply(args=(self.event.id, ))
+
+        for registration in registrations:
+            self.assertEqual(
+                Registration.objects.get(id=registration.id).status, constants.FAILURE_REGISTER
+            )
+        self.assertEqual(mock_notify.call_count, 2)
+        self.assertEqual(mock_notify.call_args[0][0], constants.SOCKET_REGISTRATION_FAILURE)
+
+
+class EventBroadcastTestCase(BaseTestCase):
+    fixtures = [
+        'test_abakus_groups.yaml', 'test_users.yaml', 'test_events.yaml', 'test_companies.yaml'
+    ]
+
+    def setUp(self):
+        self.event = Event.objects.get(title='POOLS_NO_REGISTRATIONS')
+        self.event.start_time = timezone.now() + timedelta(days=1)
+        self.event.save()
+        self.addCleanup(cache.delete, f'{EVENT_BROADCAST_CACHE_KEY}{self.event.id}')
+
+    @mock.patch('lego.apps.events.tasks.broadcast_event_occupancy.apply_async')
+    def test_broadcasts_are_coalesced(self, mock_apply_async):
+        """Only one broadcast is queued for updates arriving before it is sent"""
+        schedule_event_broadcast(self.event.id)
+        schedule_event_broadcast(self.event.id)
+
+        mock_apply_async.assert_called_once_with(
+            (self.event.id, ), countdown=settings.EVENT_BROADCAST_INTERVAL
+        )
+
+    @mock.patch('lego.apps.events.websockets.notify_group')
+    def test_broadcast_sends_pool_counts(self, mock_notify_group):
+        """The pool counts are sent to the event group"""
+        user = get_dummy_users(1)[0]
+        AbakusGroup.objects.get(name='Webkom').add_user(user)
+        registration = Registration.objects.create(event=self.event, user=user)
+        self.event.register(registration)
+
+        broadcast_event_occupancy(self.event.id)
+
+        group, message = mock_notify_group.call_args[0]
+        self.assertEqual(group, f'event-{self.event.id}')
+        self.assertEqual(message['type'], constants.SOCKET_OCCUPANCY)
+        self.assertEqual(sum(pool['registration_count'] for pool in message['payload']['pools']), 1)
+        self.assertEqual(message['payload']['waiting_registration_count'], 0)
+
+    @mock.patch('lego.apps.events.websockets.notify_group')
+    def test_registration_is_sent_to_the_user(self, mock_notify_group):
+        """Registration results are sent to the user right away"""
+        user = get_dummy_users(1)[0]
+        registration = Registration.objects.create(event=self.event, user=user)
+
+        notify_event_registration(constants.SOCKET_REGISTRATION_SUCCESS, registration)
+
+        mock_notify_group.assert_called_once()
+        self.assertEqual(mock_notify_group.call_args[0][0], f'user-{user.id}')
+
+
 class PaymentDueTestCase(BaseTestCase):
     fixtures = [
         'test_abakus_groups.yaml', 'test_users.yaml', 'test_events.yaml', 'test_companies.yaml'
@@ -0,0 +1,167 @@
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from lego.apps.events.models import Event, Registration
+from lego.apps.events.registration_engine import BumpPlanner, RegistrationEngine
+from lego.apps.users.models import AbakusGroup
+from lego.utils.test_utils import BaseTestCase
+
+from .utils import get_dummy_users
+
+
+class RegistrationEngineTestCase(BaseTestCase):
+    fixtures = [
+        'test_abakus_groups.yaml', 'test_users.yaml', 'test_companies.yaml', 'test_events.yaml'
+    ]
+
+    def setUp(self):
+        Event.objects.all().update(
+            start_time=timezone.now() + timedelta(hours=3),
+            merge_time=timezone.now() + timedelta(hours=12), heed_penalties=True
+        )
+        self.event = Event.objects.get(title='POOLS_NO_REGISTRATIONS')
+        self.abakus_pool = self.event.pools.get(name='Abakusmember')
+        self.webkom_pool = self.event.pools.get(name='Webkom')
+
+    def register(self, users):
+        registrations = [
+            Registration.objects.get_or_create(event=self.event, user=user)[0] for user in users
+        ]
+        with transaction.atomic():
+            engine = RegistrationEngine(self.event)
+            for registration in registrations:
+                engine.register(registration)
+            engine.flush()
+        return registrations
+
+    def test_selects_most_exclusive_pool(self):
+        """Webkom members should be placed in the Webkom pool before the Abakus pool"""
+        user = get_dummy_users(1)[0]
+        AbakusGroup.objects.get(name='Webkom').add_user(user)
+
+        registration = self.register([user])[0]
+
+        self.assertEqual(registration.pool_id, self.webkom_pool.id)
+        self.assertEqual(self.webkom_pool.registrations.count(), 1)
+        self.assertEqual(self.abakus_pool.registrations.count(), 0)
+
+    def test_batch_fills_pools_and_waiting_list(self):
+        """Registrations exceeding the capacity should be put on the waiting list"""
+        users = get_dummy_users(6)
+        for user in users:
+            AbakusGroup.objects.get(name='Webkom').add_user(user)
+
+        registrations = self.register(users)
+
+        self.assertEqual(self.webkom_pool.registrations.count(), 2)
+        self.assertEqual(self.abakus_pool.registrations.count(), 3)
+        self.assertEqual(self.event.waiting_registrations.count(), 1)
+        self.assertIsNone(registrations[-1].pool_id)
+
+    def test_counters_are_written_back(self):
+        """Pool counters should match the number of registrations after a flush"""
+        users = get_dummy_users(4)
+        for user in users:
+            AbakusGroup.objects.get(name='Abakus').add_user(user)
+
+        self.register(users)
+
+        self.abakus_pool.refresh_from_db()
+        self.assertEqual(self.abakus_pool.counter, 3)
+        self.assertEqual(self.abakus_pool.counter, self.abakus_pool.registrations.count())
+
+    def test_raises_without_permission(self):
+        """Users without access to any pools should raise like Event.register"""
+        user = get_dummy_users(1)[0]
+        registration = Registration.objects.get_or_create(event=self.event, user=user)[0]
+
+        engine = RegistrationEngine(self.event)
+        with self.assertRaises(ValueError):
+            engine.register(registration)
+
+    def test_merged_event_ignores_pool_capacity(self):
+        """Merged events should only look at the total capacity"""
+        self.event.merge_time = timezone.now() - timedelta(hours=1)
+        self.event.save()
+        users = get_dummy_users(5)
+        for user in users:
+            AbakusGroup.objects.get(name='Abakus').add_user(user)
+
+        self.register(users)
+
+        self.assertEqual(self.event.number_of_registrations, 5)
+        self.assertEqual(self.event.waiting_registrations.count(), 0)
+
+
+class BumpPlannerTestCase(BaseTestCase):
+    fixtures = [
+        'test_abakus_groups.yaml', 'test_users.yaml', 'test_companies.yaml', 'test_events.yaml'
+    ]
+
+    def setUp(self):
+        Event.objects.all().update(
+            start_time=timezone.now() + timedelta(hours=3),
+            merge_time=timezone.now() + timedelta(hours=12), heed_penalties=True
+        )
+        self.event = Event.objects.get(title='POOLS_NO_REGISTRATIONS')
+        self.abakus_pool = self.event.pools.get(name='Abakusmember')
+        self.webkom_pool = self.event.pools.get(name='Webkom')
+
+    def register(self, users, group_name):
+        for user in users:
+            AbakusGroup.objects.get(name=group_name).add_user(user)
+            registration = Registration.objects.get_or_create(event=self.event, user=user)[0]
+            self.event.register(registration)
+
+    def plan(self):
+        with transaction.atomic():
+            return BumpPlanner(self.event).plan(self.webkom_pool)
+
+    def test_plans_rebalance(self):
+        """A webkom member in the abakus pool should move so the waiting list can be bumped"""
+        users = get_dummy_users(6)
+        self.register(users[3:], 'Webkom')
+        self.register(users[:3], 'Abakus')
+        self.event.registrations.get(user=users[3]).unregister()
+
+        moves = self.plan()
+
+        self.assertEqual(
+            [(registration.user, pool.id) for registration, pool in moves],
+            [(users[5], self.webkom_pool.id),
+             (users[2], self.abakus_pool.id)]
+        )
+
+    def test_apply_updates_counters(self):
+        """Counters should follow the moved registrations"""
+        users = get_dummy_users(6)
+        self.register(users[3:], 'Webkom')
+        self.register(users[:3], 'Abakus')
+        self.event.registrations.get(user=users[3]).unregister()
+
+        with transaction.atomic():
+            planner = BumpPlanner(self.event)
+            planner.apply(planner.plan(self.webkom_pool))
+
+        for pool in (self.abakus_pool, self.webkom_pool):
+            pool.refresh_from_db()
+            self.assertEqual(pool.counter, pool.registrations.count())
+        self.assertEqual(self.event.waiting_registrations.count(), 0)
+
+    def test_queries_do_not_depend_on_waiting_list(self):
+        """Planning should use the same amount of queries regardless of the waiting list"""
+        users = get_dummy_users(25)
+        self.register(users[:5], 'Abakus')
+        self.event.registrations.get(user=users[0]).unregister()
+
+        with CaptureQueriesContext(connection) as short_list:
+            self.plan()
+
+        self.register(users[5:], 'Abakus')
+        with CaptureQueriesContext(connection) as long_list:
+            self.plan()
+
+        self.assertEqual(len(short_list), len(long_list))
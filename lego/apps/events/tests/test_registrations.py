@@ -1,9 +1,11 @@
 from datetime import timedelta
+from unittest import mock
 
 from django.utils import timezone
 
+from lego.apps.events import constants
 from lego.apps.events.exceptions import EventNotReady
-from lego.apps.events.models import Event, Pool, Registration
+from lego.apps.events.models import WAITING_LIST, Event, Pool, Registration, change_occupancy
 from lego.apps.users.models import AbakusGroup, User
 from lego.utils.test_utils import BaseTestCase
 
@@ -882,3 +884,106 @@ class RegistrationTestCase(BaseTestCase):
         registration = Registration.objects.get_or_create(event=event, user=user)[0]
         with self.assertRaises(EventNotReady):
             event.register(registration)
+
+
+class OccupancyTestCase(BaseTestCase):
+    fixtures = [
+        'test_abakus_groups.yaml', 'test_users.yaml', 'test_companies.yaml', 'test_events.yaml'
+    ]
+
+    def setUp(self):
+        Event.objects.all().update(
+            start_time=timezone.now() + timedelta(hours=3),
+            merge_time=timezone.now() + timedelta(hours=12)
+        )
+        self.event = Event.objects.get(title='POOLS_NO_REGISTRATIONS')
+
+    def assertOccupancyMatchesRegistrations(self):
+        stored = Event.objects.get(pk=self.event.pk).occupancy
+        self.assertEqual(stored, self.event.compute_occupancy())
+
+    def test_snapshot_follows_registrations_and_bumps(self):
+        """Test that the snapshot changed by deltas matches the registrations"""
+        users = get_dummy_users(6)
+        for user in users[:3]:
+            AbakusGroup.objects.get(name='Abakus').add_user(user)
+        for user in users[3:]:
+            AbakusGroup.objects.get(name='Webkom').add_user(user)
+
+        for user in users:
+            registration = Registration.objects.get_or_create(event=self.event, user=user)[0]
+            self.event.register(registration)
+        self.assertOccupancyMatchesRegistrations()
+
+        self.event.unregister(Registration.objects.get(event=self.event, user=users[3]))
+        self.assertOccupancyMatchesRegistrations()
+
+        waiting = self.event.waiting_registrations.first()
+        if waiting:
+            self.event.unregister(waiting)
+        self.assertOccupancyMatchesRegistrations()
+
+    def test_snapshot_follows_status_changes(self):
+        """Test that a waiting registration pending unregistration leaves the waiting list"""
+        user = get_dummy_users(1)[0]
+        registration = self.event.add_to_waiting_list(user)
+        self.assertEqual(Event.objects.get(pk=self.event.pk).waiting_registration_count, 1)
+
+        registration.status = constants.PENDING_UNREGISTER
+        registration.save()
+        self.assertEqual(Event.objects.get(pk=self.event.pk).waiting_registration_count, 0)
+
+        registration.delete()
+        self.assertOccupancyMatchesRegistrations()
+
+    def test_saves_in_place_leave_the_event_alone(self):
+        """Test that saves keeping the registration in its pool don't lock the event"""
+        user = get_dummy_users(1)[0]
+        AbakusGroup.objects.get(name='Abakus').add_user(user)
+        self.event.add_to_waiting_list(user)
+        registration = Registration.objects.get(event=self.event, user=user)
+
+        with mock.patch.object(Registration, 'lock_event') as lock_event:
+            registration.charge_status = constants.PAYMENT_SUCCESS
+            registration.save()
+            registration.set_presence(constants.PRESENT)
+            lock_event.assert_not_called()
+
+            registration.pool = self.event.pools.first()
+            registration.save()
+            lock_event.assert_called_once_with()
+        self.assertOccupancyMatchesRegistrations()
+
+    def test_snapshot_follows_pool_changes(self):
+        """Test that created, changed and deleted pools are reflected in the snapshot"""
+        pool = Pool.objects.create(
+            name='Extra', capacity=3, event=self.event, activation_date=timezone.now()
+        )
+        self.assertOccupancyMatchesRegistrations()
+
+        pool.capacity = 5
+        pool.save()
+        self.assertOccupancyMatchesRegistrations()
+
+        pool.delete()
+        self.assertOccupancyMatchesRegistrations()
+
+    def test_change_occupancy(self):
+        occupancy = {
+            'pools': [{
+                'id': 1,
+                'registered': 2
+            }, {
+                'id': 2,
+                'registered': 0
+            }],
+            'waiting': 1
+        }
+
+        changed = change_occupancy(occupancy, moves=[(WAITING_LIST, 2), (1, None)])
+        self.assertEqual(changed['pools'], [{'id': 1, 'registered': 1}, {'id': 2, 'registered': 1}])
+        self.assertEqual(changed['waiting'], 0)
+        self.assertEqual(occupancy['waiting'], 1)
+
+        self.assertIsNone(change_occupancy(occupancy, moves=[(None, 3)]))
+        self.assertIsNone(change_occupancy({}, moves=[(None, WAITING_LIST)]))
@@ -0,0 +1,52 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+from lego.apps.events.models import Event, Registration
+from lego.apps.events.websockets import find_event_group, find_event_ids
+from lego.apps.users.models import AbakusGroup, User
+from lego.utils.test_utils import BaseTestCase
+
+from .utils import get_dummy_users
+
+
+class FindEventIdsTestCase(BaseTestCase):
+    fixtures = [
+        'test_abakus_groups.yaml', 'test_users.yaml', 'test_companies.yaml', 'test_events.yaml'
+    ]
+
+    def setUp(self):
+        Event.objects.all().update(start_time=timezone.now() + timedelta(hours=3))
+        self.user = get_dummy_users(1)[0]
+
+    def event_ids(self, *titles):
+        return set(Event.objects.filter(title__in=titles).values_list('id', flat=True))
+
+    def test_events_with_pools_the_user_can_join(self):
+        self.assertEqual(find_event_ids(self.user), self.event_ids('POOLS_AND_PRICED'))
+
+        AbakusGroup.objects.get(name='Abakus').add_user(self.user)
+        user = User.objects.get(pk=self.user.pk)
+        self.assertEqual(
+            find_event_ids(user),
+            self.event_ids(
+                'POOLS_WITH_REGISTRATIONS', 'POOLS_NO_REGISTRATIONS', 'POOLS_AND_PRICED'
+            )
+        )
+
+    def test_events_the_user_is_registered_for(self):
+        event = Event.objects.get(title='ABAKOM_ONLY')
+        Registration.objects.create(event=event, user=self.user)
+
+        self.assertIn(event.id, find_event_ids(self.user))
+
+    def test_past_events_are_ignored(self):
+        Event.objects.all().update(start_time=timezone.now() - timedelta(hours=3))
+
+        self.assertEqual(find_event_ids(self.user), set())
+
+    def test_find_event_group(self):
+        event = Event.objects.get(title='POOLS_NO_REGISTRATIONS')
+
+        self.assertEqual(find_event_group(self.user, event.id), f'event-{event.id}')
+        self.assertIsNone(find_event_group(self.user, 0))
@@ -1,4 +1,5 @@
 from celery import chain
+from django.conf import settings
 from django.db import transaction
 from django.db.models import Count, Prefetch, Q
 from django.utils import timezone
@@ -28,7 +29,7 @@ from lego.apps.events.serializers.registrations import (
 )
 from lego.apps.events.tasks import (
     async_payment, async_register, async_unregister, check_for_bump_on_pool_creation_or_expansion,
-    registration_payment_save
+    registration_payment_save, schedule_register_batch
 )
 from lego.apps.permissions.api.views import AllowedPermissionsMixin
 from lego.apps.permissions.utils import get_permission_handler
@@ -44,9 +45,7 @@ class EventViewSet(AllowedPermissionsMixin, viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         if self.action in ['list', 'upcoming']:
-            queryset = Event.objects.select_related('company').prefetch_related(
-                'pools', 'pools__registrations', 'tags'
-            )
+            queryset = Event.objects.select_related('company').prefetch_related('pools', 'tags')
         elif self.action == 'retrieve':
             queryset = Event.objects.select_related('company', 'responsible_group')\
                 .prefetch_related('pools', 'pools__permission_groups', 'tags')
@@ -62,10 +61,9 @@ class EventViewSet(AllowedPermissionsMixin, viewsets.ModelViewSet):
         return queryset
 
     def get_registrations(self, user):
-        current_user_groups = user.all_groups
         query = Q()
-        for group in current_user_groups:
-            query |= Q(user__abakus_groups=group)
+        for group_id in user.all_group_ids:
+            query |= Q(user__abakus_groups=group_id)
         registrations = Registration.objects.select_related('user').annotate(
             shared_memberships=Count('user__abakus_groups', filter=query)
         )
@@ -214,8 +212,14 @@ class RegistrationViewSet(
                 raise ValidationError({'error': 'Feedback is required'})
             registration.status = constants.PENDING_REGISTER
             registration.feedback = feedback
-            registration.save(update_fields=['status', 'feedback'])
-            transaction.on_commit(lambda: async_register.delay(registration.id))
+            if settings.REGISTRATION_BATCH_MODE:
+                # The batch worker processes pending registrations in registration_date order.
+                registration.registration_date = timezone.now()
+                registration.save(update_fields=['status', 'feedback', 'registration_date'])
+                transaction.on_commit(lambda: schedule_register_batch(event_id))
+            else:
+                registration.save(update_fields=['status', 'feedback'])
+                transaction.on_commit(lambda: async_register.delay(registration.id))
         registration_serializer = RegistrationReadSerializer(
             registration, context={'user': registration.user}
         )
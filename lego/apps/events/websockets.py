@@ -1,44 +1,85 @@
-from datetime import datetime
+from django.utils import timezone
 
-from lego.apps.events.models import Event
+from lego.apps.events import constants
+from lego.apps.events.models import Event, Pool, Registration
 from lego.apps.events.serializers.sockets import (
     EventReadDetailedSocketSerializer, RegistrationPaymentReadSocketSerializer,
-    RegistrationReadSocketSerializer
+    RegistrationReadSocketSerializer, WebsocketSerializer
 )
-from lego.apps.permissions.constants import LIST
-from lego.apps.permissions.utils import get_permission_handler
-from lego.apps.websockets.groups import group_for_event, group_for_user
+from lego.apps.permissions.constants import VIEW
+from lego.apps.websockets.groups import group_for_event, group_for_event_id, group_for_user
 from lego.apps.websockets.notifiers import notify_group
 
 
+def find_event_ids(user):
+    """
+    Ids of the future events relevant to a user: events the user is registered for, including
+    the waiting list, and events with a pool the user is allowed to join. Both lookups are
+    answered by the foreign key indexes, without loading the events.
+    """
+    now = timezone.now()
+    eligible = Pool.objects.filter(
+        event__start_time__gt=now, permission_groups__in=user.all_group_ids
+    ).values_list('event_id', flat=True)
+    registered = Registration.objects.filter(user=user, event__start_time__gt=now).values_list(
+        'event_id', flat=True
+    )
+    return set(eligible) | set(registered)
+
+
 def find_event_groups(user):
     """
     Find all channels groups the user belongs to as a result
-    of being signed up to future events.
+    of being signed up to, or being able to sign up to, future events.
+    Other events are subscribed to on demand, see `find_event_group`.
     """
-    queryset = Event.objects.filter(start_time__gt=datetime.now())
-    if not user.has_perm(LIST, queryset):
-        permission_handler = get_permission_handler(queryset.model)
-        queryset = permission_handler.filter_queryset(user, queryset)
+    return [group_for_event_id(event_id) for event_id in sorted(find_event_ids(user))]
 
-    groups = []
-    for event in queryset:
-        groups.append(group_for_event(event))
 
-    return groups
+def find_event_group(user, event_id):
+    """
+    The channels group of an event the user asked to subscribe to, None if the user isn't
+    allowed to view the event.
+    """
+    event = Event.objects.filter(id=event_id).first()
+    if event is None or not user.has_perm(VIEW, event):
+        return None
+    return group_for_event(event)
 
 
 def notify_event_registration(action_type, registration, **kwargs):
-    group = group_for_event(registration.event)
-    kwargs['event_id'] = registration.event.id
-    serializer = RegistrationReadSocketSerializer(
+    """
+    The registration is sent to the user right away. Sockets following the event receive the
+    new pool counts, coalesced by `broadcast_event_occupancy` when the occupancy is updated.
+    """
+    notify_user_registration(action_type, registration, **kwargs)
+
+
+def notify_occupancy(event_id, occupancy):
+    """
+    Send the number of registrations in every pool and on the waiting list of an event to the
+    sockets following it. The payload is built once for all sockets.
+    """
+    pools = [
         {
-            'type': action_type,
-            'payload': registration,
-            'meta': kwargs
+            'id': pool['id'],
+            'capacity': pool['capacity'],
+            'registration_count': pool['registered'],
+        } for pool in occupancy['pools']
+    ]
+    serializer = WebsocketSerializer(
+        {
+            'type': constants.SOCKET_OCCUPANCY,
+            'payload': {
+                'pools': pools,
+                'waiting_registration_count': occupancy['waiting'],
+            },
+            'meta': {
+                'event_id': event_id
+            }
         }
     )
-    notify_group(group, serializer.data)
+    notify_group(group_for_event_id(event_id), serializer.data)
 
 
 def notify_user_payment(action_type, registration, **kwargs):
@@ -0,0 +1,186 @@
+"""
+Compact binary encoding of the activities stored in an aggregated activity.
+
+Layout, all integers are little-endian:
+
+* Header: codec version (uint8) and the number of interned content types (uint16).
+* Content type table: length (uint8) and utf-8 name of each content type.
+* Number of activities (uint16), followed by one record per activity: time in microseconds since
+  the epoch (int64), verb id (uint16), and a content type index (uint16) and id (int64) for the
+  actor, object and target. Each record ends with the length (uint32) of the extra context and
+  the extra context as JSON.
+
+Rows written before the codec was introduced are JSON lists, these are still decoded.
+
+Timeline storages without columns store the whole aggregated activity, see encode_aggregated.
+"""
+import json
+import struct
+from datetime import datetime, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.dateparse import parse_datetime
+from stream_framework.verbs import get_verb_by_id
+
+CODEC_VERSION = 1
+
+NO_CONTENT_TYPE = 0xFFFF
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+_header = struct.Struct('<BH')
+_content_type = struct.Struct('<B')
+_count = struct.Struct('<H')
+_activity = struct.Struct('<qHHqHqHqI')
+_aggregated = struct.Struct('<qqIH')
+
+
+def _to_microseconds(value):
+    return (value - EPOCH) // MICROSECOND
+
+
+def encode_activities(activities):
+    """
+    Encode a list of activities, the inverse of decode_activities.
+    """
+    content_types = {}
+
+    def intern(content_type, object_id):
+        if content_type is None or object_id is None:
+            return NO_CONTENT_TYPE, 0
+        return content_types.setdefault(content_type, len(content_types)), object_id
+
+    records = []
+    for activity in activities:
+        extra_context = b''
+        if activity.extra_context:
+            extra_context = json.dumps(
+                activity.extra_context, cls=DjangoJSONEncoder, separators=(',', ':')
+            ).encode()
+        records.append(
+            _activity.pack(
+                _to_microseconds(activity.time),
+                activity.verb.id,
+                *intern(activity.actor_content_type, activity.actor_id),
+                *intern(activity.object_content_type, activity.object_id),
+                *intern(activity.target_content_type, activity.target_id),
+                len(extra_context),
+            ) + extra_context
+        )
+
+    parts = [_header.pack(CODEC_VERSION, len(content_types))]
+    for content_type in content_types:
+        name = content_type.encode()
+        parts.append(_content_type.pack(len(name)) + name)
+    parts.append(_count.pack(len(records)))
+    parts += records
+    return b''.join(parts)
+
+
+def _decode_binary(data, activity_class):
+    version, content_type_count = _header.unpack_from(data)
+    if version != CODEC_VERSION:
+        raise ValueError(f'Unsupported activity codec version {version}')
+    offset = _header.size
+
+    content_types = []
+    for _ in range(content_type_count):
+        length, = _content_type.unpack_from(data, offset)
+        offset += _content_type.size
+        content_types.append(data[offset:offset + length].decode())
+        offset += length
+
+    def content_string(content_type, object_id):
+        if content_type == NO_CONTENT_TYPE:
+            return None
+        return f'{content_types[content_type]}-{object_id}'
+
+    count, = _count.unpack_from(data, offset)
+    offset += _count.size
+
+    activities = []
+    for _ in range(count):
+        (
+            time, verb, actor_type, actor_id, object_type, object_id, target_type, target_id,
+            extra_length
+        ) = _activity.unpack_from(data, offset)
+        offset += _activity.size
+
+        extra_context = {}
+        if extra_length:
+            extra_context = json.loads(data[offset:offset + extra_length].decode())
+            offset += extra_length
+
+        activities.append(
+            activity_class(
+                content_string(actor_type, actor_id), get_verb_by_id(verb),
+                content_string(object_type, object_id), content_string(target_type, target_id),
+                time=EPOCH + time * MICROSECOND, extra_context=extra_context
+            )
+        )
+    return activities
+
+
+def activity_to_dict(activity):
+    """
+    Represent an activity with JSON types, used to pass activities to celery tasks.
+    """
+    return {
+        'time': activity.time.isoformat(),
+        'verb': activity.verb.id,
+        'actor': activity.actor,
+        'object': activity.object,
+        'target': activity.target,
+        'extra_context': activity.extra_context or {},
+    }
+
+
+def activity_from_dict(data, activity_class):
+    return activity_class(
+        data['actor'], get_verb_by_id(data['verb']), data['object'], data['target'],
+        time=parse_datetime(data['time']), extra_context=data.get('extra_context') or {}
+    )
+
+
+def _decode_json(data, activity_class):
+    """
+    Decode rows stored as JSON by the DRF serializer used before the binary codec. The rows were
+    validated when they were written, and aren't validated again.
+    """
+    return [activity_from_dict(activity, activity_class) for activity in json.loads(data.decode())]
+
+
+def decode_activities(data, activity_class):
+    """
+    Decode stored activities, both binary and JSON rows are supported.
+    """
+    data = bytes(data)
+    if data[:1] == b'[':
+        return _decode_json(data, activity_class)
+    return _decode_binary(data, activity_class)
+
+
+def encode_aggregated(aggregated):
+    """
+    Encode an aggregated activity: created and updated time in microseconds since the epoch
+    (int64), the number of minimized activities (uint32) and the length (uint16) and utf-8 name
+    of the group, followed by the encoded activities.
+    """
+    group = aggregated.group.encode()
+    return _aggregated.pack(
+        _to_microseconds(aggregated.created_at), _to_microseconds(aggregated.updated_at),
+        aggregated.minimized_activities or 0, len(group)
+    ) + group + encode_activities(aggregated.activities)
+
+
+def decode_aggregated(data, aggregated_activity_class, activity_class):
+    data = bytes(data)
+    created_at, updated_at, minimized_activities, group_length = _aggregated.unpack_from(data)
+    offset = _aggregated.size
+    aggregated = aggregated_activity_class(
+        group=data[offset:offset + group_length].decode(),
+        activities=_decode_binary(data[offset + group_length:], activity_class),
+        created_at=EPOCH + created_at * MICROSECOND, updated_at=EPOCH + updated_at * MICROSECOND
+    )
+    aggregated.minimized_activities = minimized_activities
+    return aggregated
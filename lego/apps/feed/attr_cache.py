@@ -1,7 +1,8 @@
+from django.conf import settings
 from django.core.cache import cache
 from structlog import get_logger
 
-from lego.utils.content_types import string_to_model_cls
+from lego.utils.content_types import instance_to_content_type_string, string_to_model_cls
 
 from . import attr_renderers
 
@@ -11,10 +12,10 @@ log = get_logger()
 class AttrCache:
     """
     The feed contains a lot of content strings, it's heavy to lookup all these values
-    on each request. The AttrCache stores the lookups for an small amount of time to reduce the
-    load on the database.
+    on each request. The AttrCache stores the lookups to reduce the load on the database.
 
-    We don't do any invalidation, the cached values is only stored for a small amount of time.
+    Cached values are rendered again when the instance is saved, and removed when the instance is
+    deleted. FEED_ATTR_CACHE_TIMEOUT limits the lifetime of values nobody looks up.
     """
 
     CACHE_KEY = 'feed_attr_cache_'
@@ -50,13 +51,42 @@ class AttrCache:
 
     def save_lookups(self, items):
         """
-        Cache the items we looked up for a small amount of time.
+        Cache the items we looked up.
         """
         cache.set_many(
             {f'{self.CACHE_KEY}{key}': value
-             for key, value in items.items()}, timeout=60
+             for key, value in items.items()}, timeout=settings.FEED_ATTR_CACHE_TIMEOUT
         )
 
+    def is_rendered(self, instance):
+        return instance_to_content_type_string(instance) in self.RENDERS
+
+    def refresh(self, instance):
+        """
+        Render a saved instance again, called by the post_save signal. Instances no longer
+        available through the default manager are removed from the cache.
+
+        Returns True when a cached value was changed. Instances that aren't cached haven't been
+        looked up recently, so they aren't part of any rendered page.
+        """
+        content_type = instance_to_content_type_string(instance)
+        if content_type not in self.RENDERS:
+            return False
+
+        content_string = f'{content_type}-{instance.pk}'
+        previous = cache.get(f'{self.CACHE_KEY}{content_string}')
+        lookups = self.extract_properties(content_type, [instance.pk])
+        if lookups:
+            self.save_lookups(lookups)
+        else:
+            self.remove(instance)
+        return previous is not None and previous != lookups.get(content_string)
+
+    def remove(self, instance):
+        if self.is_rendered(instance):
+            content_type = instance_to_content_type_string(instance)
+            cache.delete(f'{self.CACHE_KEY}{content_type}-{instance.pk}')
+
     def extract_properties(self, content_type, ids):
         """
         Lookup the values we need from the database.
@@ -0,0 +1,195 @@
+"""
+Compaction of aggregated feed timelines.
+
+Feeds are trimmed to `max_length` at random when activities are added, and old rows are never
+removed from feeds that don't receive new activities. Compaction enforces the `max_length` and
+`max_age` of a feed class on every feed in the column family. Only the Cassandra timeline
+storage is compacted, the Redis and in-memory storages are bounded by trimming.
+
+The activity id of an aggregated activity is the update time in milliseconds, and rows are
+clustered by the id in descending order. Every row to remove is older than the rows kept, the
+rows are removed with a single range delete per feed, which leaves one range tombstone instead of
+a tombstone per row.
+
+Feed keys are scanned in token order, the last compacted key is stored in the cache. An
+interrupted run continues from that key when `resume` is set.
+"""
+import time
+from datetime import datetime
+
+from cassandra.concurrent import execute_concurrent_with_args
+from cassandra.cqlengine.connection import get_session
+from django.conf import settings
+from django.core.cache import cache
+from stream_framework.feeds.notification_feed.base import BaseNotificationFeed
+from stream_framework.utils import datetime_to_epoch
+from structlog import get_logger
+
+from . import render_cache
+from .fanout import prepare_statement
+from .feeds.company_feed import CompanyFeed
+from .feeds.group_feed import GroupFeed
+from .feeds.notification_feed import NotificationFeed
+from .feeds.personal_feed import PersonalFeed
+from .feeds.user_feed import UserFeed
+from .timeline_storage import uses_cassandra
+
+log = get_logger()
+
+FEED_CLASSES = {
+    feed_class.timeline_cf_name: feed_class
+    for feed_class in (PersonalFeed, UserFeed, NotificationFeed, GroupFeed, CompanyFeed)
+}
+
+PROGRESS_KEY = 'feed_compaction_progress_'
+
+
+def get_progress(feed_class):
+    """
+    Return the last compacted key of an unfinished compaction, None if no compaction is running.
+    """
+    return cache.get(f'{PROGRESS_KEY}{feed_class.timeline_cf_name}')
+
+
+def set_progress(feed_class, key):
+    cache.set(f'{PROGRESS_KEY}{feed_class.timeline_cf_name}', key, timeout=None)
+
+
+def clear_progress(feed_class):
+    cache.delete(f'{PROGRESS_KEY}{feed_class.timeline_cf_name}')
+
+
+def scan_keys(feed_class, chunk_size, start=None):
+    """
+    Yield the feed keys in a column family in chunks, in token order.
+    """
+    session = get_session()
+    table = feed_class.get_timeline_storage().model.column_family_name()
+    first = prepare_statement(session, f'SELECT DISTINCT "feed_id" FROM {table} LIMIT ?')
+    following = prepare_statement(
+        session, f'SELECT DISTINCT "feed_id" FROM {table} WHERE token("feed_id") > token(?) LIMIT ?'
+    )
+
+    while True:
+        if start is None:
+            rows = session.execute(first, (chunk_size, ))
+        else:
+            rows = session.execute(following, (start, chunk_size))
+        keys = [row['feed_id'] for row in rows]
+        if not keys:
+            return
+        yield keys
+        start = keys[-1]
+
+
+class Compactor:
+    """
+    Remove the rows beyond `max_length` and older than `max_age` from the feeds of a class.
+    """
+
+    def __init__(self, feed_class, chunk_size=500, resume=False, now=None):
+        if not uses_cassandra():
+            raise ValueError('Compaction requires the Cassandra timeline storage')
+
+        self.feed_class = feed_class
+        self.chunk_size = chunk_size
+        self.resume = resume
+        self.now = now or datetime.utcnow()
+
+        self.session = get_session()
+        self.table = feed_class.get_timeline_storage().model.column_family_name()
+        self.concurrency = settings.FEED_FANOUT_WRITE_CONCURRENCY
+
+    def get_cutoff(self):
+        """
+        Return the lowest activity id allowed by max_age, None if the age isn't limited.
+        """
+        max_age = self.feed_class.max_age
+        if max_age is None:
+            return None
+        return int(datetime_to_epoch(self.now - max_age)) * 1000
+
+    def _execute(self, query, parameters):
+        statement = prepare_statement(self.session, query)
+        return execute_concurrent_with_args(
+            self.session, statement, parameters, concurrency=self.concurrency
+        )
+
+    def compact_keys(self, keys):
+        """
+        Compact a chunk of feeds.
+
+        :return: A dict mapping the compacted feed keys to the number of removed rows.
+        """
+        # The ids of the rows kept by max_length, and the first row beyond it.
+        results = self._execute(
+            f'SELECT "activity_id" FROM {self.table} WHERE "feed_id" = ? LIMIT ?',
+            [(key, self.feed_class.max_length + 1) for key in keys]
+        )
+
+        cutoff = self.get_cutoff()
+        thresholds = []
+        for key, (success, rows) in zip(keys, results):
+            # Rows with an id up to the threshold are removed.
+            candidates = [] if cutoff is None else [cutoff - 1]
+            activity_ids = [row['activity_id'] for row in rows]
+            if len(activity_ids) > self.feed_class.max_length:
+                candidates.append(activity_ids[-1])
+            if candidates:
+                thresholds.append((key, max(candidates)))
+
+        results = self._execute(
+            f'SELECT "activity_id" FROM {self.table} WHERE "feed_id" = ? AND "activity_id" <= ?',
+            thresholds
+        )
+        removed = {}
+        for (key, threshold), (success, rows) in zip(thresholds, results):
+            activity_ids = [row['activity_id'] for row in rows]
+            if activity_ids:
+                removed[key] = activity_ids
+
+        self._execute(
+            f'DELETE FROM {self.table} WHERE "feed_id" = ? AND "activity_id" <= ?',
+            [(key, threshold) for key, threshold in thresholds if key in removed]
+        )
+
+        if issubclass(self.feed_class, BaseNotificationFeed):
+            for key, activity_ids in removed.items():
+                self.feed_class(key).update_markers(activity_ids, activity_ids, operation='remove')
+        render_cache.invalidate(self.feed_class, removed.keys())
+
+        return {key: len(activity_ids) for key, activity_ids in removed.items()}
+
+    def get_start(self):
+        if not self.resume:
+            return None
+        start = get_progress(self.feed_class)
+        if start is not None:
+            log.info('feed_compaction_resume', feed=self.feed_class.timeline_cf_name, key=start)
+        return start
+
+    def run(self):
+        """
+        Compact every feed of the class. Returns a dict with the number of feeds and removed rows.
+        """
+        start_time = time.time()
+        feeds = compacted = rows = 0
+
+        for keys in scan_keys(self.feed_class, self.chunk_size, self.get_start()):
+            removed = self.compact_keys(keys)
+            feeds += len(keys)
+            compacted += len(removed)
+            rows += sum(removed.values())
+            set_progress(self.feed_class, keys[-1])
+
+        clear_progress(self.feed_class)
+
+        stats = {
+            'feed': self.feed_class.timeline_cf_name,
+            'feeds': feeds,
+            'compacted_feeds': compacted,
+            'reclaimed_rows': rows,
+            'seconds': round(time.time() - start_time, 2),
+        }
+        log.info('feed_compaction_done', **stats)
+        return stats
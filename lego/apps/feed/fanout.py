@@ -0,0 +1,177 @@
+"""
+Fanout of activities to a chunk of aggregated feeds.
+
+Adding an activity with the stream-framework add_operation aggregates the activities, serializes
+the result and writes it with a separate batch for every recipient. The activities in a fanout are
+the same for every recipient, and so is the aggregated activity in most feeds. This module
+aggregates the activities once per chunk, serializes each aggregated activity once, and writes the
+rows for the whole chunk at once. Cassandra rows are written using prepared statements.
+"""
+import random
+from collections import defaultdict
+from copy import deepcopy
+
+from cassandra.concurrent import execute_concurrent_with_args
+from cassandra.cqlengine.connection import get_session
+from django.conf import settings
+from stream_framework.exceptions import DuplicateActivityException
+from stream_framework.feeds.notification_feed.base import BaseNotificationFeed
+from stream_framework.storage.cassandra.timeline_storage import CassandraTimelineStorage
+
+# Prepared statements, keyed by the session and table.
+_statements = {}
+
+
+def prepare_statement(session, query):
+    key = (id(session), query)
+    statement = _statements.get(key)
+    if statement is None:
+        statement = _statements[key] = session.prepare(query)
+    return statement
+
+
+class TimelineWriter:
+    """
+    Collect the timeline changes of many feeds of the same class, and write them at once.
+    Aggregated activities shared by many feeds are serialized once.
+
+    Cassandra rows are written using prepared statements executed concurrently, other timeline
+    storages are written through the storage API.
+    """
+
+    def __init__(self, feed_class):
+        self.timeline_storage = feed_class.get_timeline_storage()
+        self.serializer = self.timeline_storage.serializer
+        self.cassandra = isinstance(self.timeline_storage, CassandraTimelineStorage)
+
+        self.additions = []
+        self.removals = []
+        self._serialized = {}
+
+    def _serialize(self, aggregated):
+        key = id(aggregated)
+        if key not in self._serialized:
+            self._serialized[key] = (aggregated, self.serializer.dumps(aggregated))
+        return self._serialized[key][1]
+
+    def add(self, key, aggregated_activities):
+        self.additions += [
+            (str(key), aggregated.serialization_id, self._serialize(aggregated))
+            for aggregated in aggregated_activities
+        ]
+
+    def remove(self, key, aggregated_activities):
+        self.removals += [
+            (str(key), int(aggregated.serialization_id)) for aggregated in aggregated_activities
+        ]
+
+    def execute(self):
+        if self.cassandra:
+            self._execute_cassandra()
+            return
+
+        # Changed aggregated activities are removed and added again, the removals go first.
+        removals = defaultdict(dict)
+        for key, activity_id in self.removals:
+            removals[key][activity_id] = activity_id
+        for key, activities in removals.items():
+            self.timeline_storage.remove_from_storage(key, activities)
+
+        additions = defaultdict(dict)
+        for key, activity_id, serialized in self.additions:
+            additions[key][activity_id] = serialized
+        for key, activities in additions.items():
+            self.timeline_storage.add_to_storage(key, activities)
+
+    def _execute_cassandra(self):
+        session = get_session()
+        model = self.timeline_storage.model
+        table = model.column_family_name()
+        columns = list(model._columns.keys())
+        concurrency = settings.FEED_FANOUT_WRITE_CONCURRENCY
+
+        if self.removals:
+            statement = prepare_statement(
+                session, f'DELETE FROM {table} WHERE "feed_id" = ? AND "activity_id" = ?'
+            )
+            execute_concurrent_with_args(session, statement, self.removals, concurrency=concurrency)
+
+        if self.additions:
+            rows = [
+                [key if column == 'feed_id' else getattr(instance, column) for column in columns]
+                for key, activity_id, instance in self.additions
+            ]
+            column_names = ', '.join(f'"{column}"' for column in columns)
+            placeholders = ', '.join('?' for _ in columns)
+            statement = prepare_statement(
+                session, f'INSERT INTO {table} ({column_names}) VALUES ({placeholders})'
+            )
+            execute_concurrent_with_args(session, statement, rows, concurrency=concurrency)
+
+
+def merge(current_activities, aggregated_activities):
+    """
+    Same as BaseAggregator.merge, using activities aggregated up front.
+
+    :return: A tuple with the aggregated activities to add and to remove.
+    """
+    current = {aggregated.group: aggregated for aggregated in current_activities}
+    to_add = []
+    to_remove = []
+
+    for aggregated in aggregated_activities:
+        current_aggregated = current.get(aggregated.group)
+        if current_aggregated is None:
+            # New groups are the same object in every feed, and serialized once.
+            to_add.append(aggregated)
+            continue
+
+        merged = deepcopy(current_aggregated)
+        for activity in aggregated.activities:
+            try:
+                merged.append(activity)
+            except DuplicateActivityException:
+                pass
+        if merged.activities != current_aggregated.activities:
+            to_remove.append(current_aggregated)
+            to_add.append(merged)
+
+    return to_add, to_remove
+
+
+def add_to_aggregated_feeds(feed_class, user_ids, activities, trim=True):
+    """
+    Add activities to the aggregated feeds of a chunk of users.
+
+    :return: The number of feeds that changed.
+    """
+    aggregator = feed_class.aggregator_class(
+        feed_class.aggregated_activity_class, feed_class.activity_class
+    )
+    aggregated_activities = aggregator.aggregate(activities)
+    writer = TimelineWriter(feed_class)
+
+    changes = []
+    for user_id in user_ids:
+        feed = feed_class(user_id)
+        to_add, to_remove = merge(feed[:feed.merge_max_length], aggregated_activities)
+        if to_add or to_remove:
+            writer.remove(feed.key, to_remove)
+            writer.add(feed.key, to_add)
+            changes.append((feed, to_add, to_remove))
+
+    writer.execute()
+
+    for feed, to_add, to_remove in changes:
+        if isinstance(feed, BaseNotificationFeed):
+            removed_ids = [aggregated.serialization_id for aggregated in to_remove]
+            added_ids = [aggregated.serialization_id for aggregated in to_add]
+            if removed_ids:
+                feed.update_markers(removed_ids, removed_ids, operation='remove')
+            feed.update_markers(added_ids, added_ids, operation='add')
+        feed.on_update_feed(to_add, to_remove)
+
+        if trim and random.random() <= feed.trim_chance:
+            feed.timeline_storage.trim(feed.key, feed.max_length)
+
+    return len(changes)
@@ -1,11 +1,13 @@
+from stream_framework.feed_managers.base import FanoutPriority
 from stream_framework.feeds.aggregated_feed.cassandra import CassandraAggregatedFeed
 from stream_framework.feeds.notification_feed.base import BaseNotificationFeed
-from stream_framework.storage.redis.lists_storage import RedisListsStorage
 
 from lego.apps.feed.activities import Activity, AggregatedActivity, NotificationActivity
 from lego.apps.feed.aggregator import FeedAggregator
 from lego.apps.feed.feed_models import AggregatedActivityModel
 from lego.apps.feed.feed_serializers import AggregatedActivitySerializer
+from lego.apps.feed.notification_counters import CountedListsStorage, get_notification_data
+from lego.apps.feed.timeline_storage import get_storage_class
 
 
 class AggregatedFeed(CassandraAggregatedFeed):
@@ -14,6 +16,10 @@ class AggregatedFeed(CassandraAggregatedFeed):
     Usage:
     * Set the column_family used to store the feed in cassandra
       timeline_cf_name = ''
+    * The timeline storage is selected with the FEED_TIMELINE_STORAGE setting, see
+      timeline_storage.py
+    * Set the fanout_priority to select the celery queue used by small fanouts
+    * Set max_length and max_age to limit the size of the feed, see compaction.py
     """
     key_format = '%(user_id)s'
     timeline_model = AggregatedActivityModel
@@ -21,11 +27,27 @@ class AggregatedFeed(CassandraAggregatedFeed):
     aggregator_class = FeedAggregator
     activity_class = Activity
     aggregated_activity_class = AggregatedActivity
+    fanout_priority = FanoutPriority.LOW
+    max_length = 100
+    max_age = None
+
+    @classmethod
+    def get_timeline_storage(cls):
+        storage_class = get_storage_class()
+        options = cls.get_timeline_storage_options()
+        options['serializer_class'] = getattr(
+            storage_class, 'aggregated_serializer_class', cls.timeline_serializer
+        )
+        return storage_class(**options)
 
 
 class NotificationFeed(AggregatedFeed, BaseNotificationFeed):
     """
     Track read/seen states on an aggregated feed.
     """
-    markers_storage_class = RedisListsStorage
+    markers_storage_class = CountedListsStorage
+    fanout_priority = FanoutPriority.HIGH
     aggregated_activity_class = NotificationActivity
+
+    def get_notification_data(self):
+        return get_notification_data(self.__class__, self.user_id)
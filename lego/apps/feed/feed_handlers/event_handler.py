@@ -6,6 +6,7 @@ from lego.apps.feed.feeds.company_feed import CompanyFeed
 from lego.apps.feed.feeds.personal_feed import PersonalFeed
 from lego.apps.feed.registry import register_handler
 from lego.apps.feed.verbs import EventCreateVerb
+from lego.apps.users.recipients import followers_of, union
 
 
 class EventHandler(BaseHandler):
@@ -28,12 +29,7 @@ class EventHandler(BaseHandler):
     def get_feeds_and_recipients(self, event):
         result = []
         if event.company_id:
-            result.append(
-                (
-                    [PersonalFeed],
-                    list(event.company.followers.values_list('follower__id', flat=True))
-                )
-            )
+            result.append(([PersonalFeed], union(followers_of(event.company))))
             result.append(([CompanyFeed], [event.company_id]))
         return result
 
@@ -6,6 +6,7 @@ from lego.apps.feed.registry import register_handler
 from lego.apps.feed.verbs import GroupJoinVerb
 from lego.apps.users.constants import GROUP_COMMITTEE, GROUP_INTEREST
 from lego.apps.users.models import Membership
+from lego.apps.users.recipients import followers_of, union
 
 
 class MembershipHandler(BaseHandler):
@@ -21,9 +22,7 @@ class MembershipHandler(BaseHandler):
         # Add activity to feed on the user profile site.
         self.manager.add_activity(activity, [membership.user_id], [UserFeed])
         # Add activity to followers timeline.
-        followers = membership.user.followers\
-            .exclude(follower_id=membership.user_id)\
-            .values_list('follower_id', flat=True)
+        followers = union(followers_of(membership.user)) - {membership.user_id}
 
         self.manager.add_activity(activity, followers, [PersonalFeed])
 
@@ -14,6 +14,7 @@ from lego.apps.feed.verbs import (
     AdminRegistrationVerb, AdminUnregistrationVerb, EventRegisterVerb, PaymentOverdueVerb,
     RegistrationBumpVerb
 )
+from lego.apps.users.recipients import followers_of, union
 
 
 class RegistrationHandler(BaseHandler):
@@ -51,9 +52,7 @@ class RegistrationHandler(BaseHandler):
     def get_feeds_and_recipients(self, registration):
         result = []
 
-        followers = registration.user.followers \
-            .exclude(follower_id=registration.user_id) \
-            .values_list('follower_id', flat=True)
+        followers = union(followers_of(registration.user)) - {registration.user_id}
 
         result.append(([PersonalFeed], followers))
         result.append(([UserFeed], [registration.user_id]))
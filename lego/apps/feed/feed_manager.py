@@ -1,12 +1,17 @@
 import logging
+import math
+import time
 
+from django.conf import settings
 from stream_framework.feed_managers.base import FanoutPriority, add_operation, remove_operation
-from stream_framework.tasks import (
-    fanout_operation, fanout_operation_hi_priority, fanout_operation_low_priority
-)
 from stream_framework.utils import chunks, get_metrics_instance
 from structlog import get_logger
 
+from . import render_cache
+from .activity_codec import activity_to_dict
+from .fanout import add_to_aggregated_feeds
+from .feed import AggregatedFeed
+
 logger = logging.getLogger(__name__)
 log = get_logger()
 
@@ -17,11 +22,10 @@ class FeedManager:
     helper functions that makes async fanout easier.
     """
 
-    priority_fanout_task = {
-        FanoutPriority.HIGH: fanout_operation_hi_priority,
-        FanoutPriority.LOW: fanout_operation_low_priority
-    }
+    # Operations are passed to the fanout task by name.
+    operations = {'add': add_operation, 'remove': remove_operation}
 
+    # Chunk size used before the fanout latency of a feed class is measured.
     fanout_chunk_size = 100
 
     metrics = get_metrics_instance()
@@ -34,8 +38,7 @@ class FeedManager:
 
         for feed_class in feed_classes:
             self.create_fanout_tasks(
-                set(recipients), feed_class, add_operation, operation_kwargs=operation_kwargs,
-                fanout_priority=FanoutPriority.HIGH
+                set(recipients), feed_class, add_operation, operation_kwargs=operation_kwargs
             )
         self.metrics.on_activity_published()
 
@@ -47,17 +50,49 @@ class FeedManager:
 
         for feed_class in feed_classes:
             self.create_fanout_tasks(
-                set(recipients), feed_class, remove_operation, operation_kwargs=operation_kwargs,
-                fanout_priority=FanoutPriority.HIGH
+                set(recipients), feed_class, remove_operation, operation_kwargs=operation_kwargs
             )
         self.metrics.on_activity_removed()
 
     def get_fanout_task(self, priority=None, feed_class=None):
         """
-        Returns the fanout task taking priority in account.
+        Returns the fanout task. All priorities use the same task.
+        """
+        from .tasks import fanout_activities
+
+        return fanout_activities
+
+    def get_fanout_priority(self, feed_class, recipients, priority=None):
+        """
+        Fanouts use the priority of the feed class, large fanouts always use the low priority so
+        they don't delay notifications.
         """
+        if recipients > settings.FEED_FANOUT_BULK_THRESHOLD:
+            return FanoutPriority.LOW
+        return priority or getattr(feed_class, 'fanout_priority', FanoutPriority.HIGH)
 
-        return self.priority_fanout_task.get(priority, fanout_operation)
+    def get_fanout_queue(self, priority):
+        return settings.FEED_FANOUT_QUEUES[priority]
+
+    def get_chunk_size(self, feed_class, recipients):
+        """
+        Pick a chunk size where a chunk takes about FEED_FANOUT_CHUNK_SECONDS to process, based on
+        the measured latency of the feed class. Large fanouts use bigger chunks to limit the
+        number of tasks to FEED_FANOUT_MAX_CHUNKS.
+        """
+        chunk_size = self.fanout_chunk_size
+        latency = self.metrics.get_recipient_latency(feed_class)
+        if latency:
+            chunk_size = int(settings.FEED_FANOUT_CHUNK_SECONDS / latency)
+
+        chunk_size = max(chunk_size, math.ceil(recipients / settings.FEED_FANOUT_MAX_CHUNKS))
+        return min(
+            max(chunk_size, settings.FEED_FANOUT_MIN_CHUNK_SIZE),
+            settings.FEED_FANOUT_MAX_CHUNK_SIZE
+        )
+
+    def get_operation_name(self, operation):
+        return next(name for name, function in self.operations.items() if function is operation)
 
     def create_fanout_tasks(
         self, follower_ids, feed_class, operation, operation_kwargs=None, fanout_priority=None
@@ -65,47 +100,75 @@ class FeedManager:
         """
         Creates the fanout task for the given activities and feed classes
         followers
-        It takes the following ids and distributes them per fanout_chunk_size
-        into smaller tasks
+        It takes the following ids and distributes them into smaller tasks, the chunk size and
+        queue is selected based on the number of followers and the feed class.
         """
-
-        fanout_task = self.get_fanout_task(fanout_priority, feed_class=feed_class)
+        priority = self.get_fanout_priority(feed_class, len(follower_ids), fanout_priority)
+        fanout_task = self.get_fanout_task(priority, feed_class=feed_class)
 
         if not fanout_task:
             return []
 
-        chunk_size = self.fanout_chunk_size
+        chunk_size = self.get_chunk_size(feed_class, len(follower_ids))
         user_ids_chunks = list(chunks(follower_ids, chunk_size))
+        queue = self.get_fanout_queue(priority)
 
-        log.info('feed_spawn_tasks', subtasks=len(user_ids_chunks), recipients=len(follower_ids))
+        log.info(
+            'feed_spawn_tasks', subtasks=len(user_ids_chunks), recipients=len(follower_ids),
+            chunk_size=chunk_size, queue=queue
+        )
+        self.metrics.on_fanout_queued(feed_class, len(follower_ids), len(user_ids_chunks), queue)
+
+        # The task payload only contains ids, the activities are converted once for all chunks.
+        feed_class_path = f'{feed_class.__module__}.{feed_class.__name__}'
+        operation_name = self.get_operation_name(operation)
+        activities = [activity_to_dict(activity) for activity in operation_kwargs['activities']]
+        trim = operation_kwargs.get('trim', True)
 
         tasks = []
 
         for ids_chunk in user_ids_chunks:
-            task = fanout_task.delay(
-                feed_manager=self, feed_class=feed_class, user_ids=ids_chunk, operation=operation,
-                operation_kwargs=operation_kwargs
+            task = fanout_task.apply_async(
+                (feed_class_path, list(ids_chunk), operation_name, activities, trim), {},
+                queue=queue
             )
             tasks.append(task)
         return tasks
 
     def fanout(self, user_ids, feed_class, operation, operation_kwargs):
         """
-        This functionality is called from within stream_framework.tasks.fanout_operation
-        This function is almost always called in async tasks created by stream_framework.
+        This functionality is called from within lego.apps.feed.tasks.fanout_activities
+        Adding activities to aggregated feeds is done for the whole chunk at once, see
+        lego.apps.feed.fanout.
         """
+        start_time = time.time()
         with self.metrics.fanout_timer(feed_class):
-            batch_context_manager = feed_class.get_timeline_batch_interface()
-            with batch_context_manager as batch_interface:
-                log.info('feed_batch_fanout', recipients=len(user_ids))
+            if operation is add_operation and issubclass(feed_class, AggregatedFeed):
+                add_to_aggregated_feeds(
+                    feed_class, user_ids, operation_kwargs['activities'],
+                    trim=operation_kwargs.get('trim', True)
+                )
+            else:
+                self.fanout_feeds(user_ids, feed_class, operation, operation_kwargs)
 
-                operation_kwargs['batch_interface'] = batch_interface
-                for user_id in user_ids:
-                    feed = feed_class(user_id)
-                    operation(feed, **operation_kwargs)
+        self.metrics.on_fanout_chunk(feed_class, len(user_ids), time.time() - start_time)
+        render_cache.invalidate(feed_class, user_ids)
 
         fanout_count = len(operation_kwargs['activities']) * len(user_ids)
         self.metrics.on_fanout(feed_class, operation, fanout_count)
 
+    def fanout_feeds(self, user_ids, feed_class, operation, operation_kwargs):
+        """
+        Run the operation on each feed, used by operations without a chunked implementation.
+        """
+        batch_context_manager = feed_class.get_timeline_batch_interface()
+        with batch_context_manager as batch_interface:
+            log.info('feed_batch_fanout', recipients=len(user_ids))
+
+            operation_kwargs['batch_interface'] = batch_interface
+            for user_id in user_ids:
+                feed = feed_class(user_id)
+                operation(feed, **operation_kwargs)
+
 
 feed_manager = FeedManager()
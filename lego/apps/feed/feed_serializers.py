@@ -1,23 +1,9 @@
-from django.utils.six import BytesIO
-from rest_framework import serializers
-from rest_framework.parsers import JSONParser
-from rest_framework.renderers import JSONRenderer
 from stream_framework.serializers.base import BaseAggregatedSerializer
 from stream_framework.utils.five import long_t
-from stream_framework.verbs import get_verb_by_id
 
-
-class StoreActivitySerializer(serializers.Serializer):
-    """
-    This serializer is used to serialize our custom activity. The DRF serializer is a convenient
-    way to do this. Used for storage inside a aggregated activity.
-    """
-    time = serializers.DateTimeField()
-    verb = serializers.IntegerField(source='verb.id')
-    actor = serializers.CharField()
-    object = serializers.CharField(allow_null=True)
-    target = serializers.CharField(allow_null=True)
-    extra_context = serializers.DictField(default={}, required=False)
+from .activity_codec import (
+    decode_activities, decode_aggregated, encode_activities, encode_aggregated
+)
 
 
 class AggregatedActivitySerializer(BaseAggregatedSerializer):
@@ -33,10 +19,9 @@ class AggregatedActivitySerializer(BaseAggregatedSerializer):
 
     def dumps(self, aggregated):
         self.check_type(aggregated)
-        activities_serializer = StoreActivitySerializer(many=True, instance=aggregated.activities)
         return self.model(
             activity_id=long_t(aggregated.serialization_id),
-            activities=JSONRenderer().render(activities_serializer.data),
+            activities=encode_activities(aggregated.activities),
             group=aggregated.group,
             created_at=aggregated.created_at,
             updated_at=aggregated.updated_at,
@@ -55,28 +40,22 @@ class AggregatedActivitySerializer(BaseAggregatedSerializer):
 
     def parse_serialized_activities(self, serialized_activities):
         """
-        Parse the activities bytes using the serializer.
+        Decode the activities bytes, see lego.apps.feed.activity_codec.
         """
-        data = JSONParser().parse(BytesIO(serialized_activities))
-        serializer = StoreActivitySerializer(data=data, many=True)
-        serializer.is_valid(raise_exception=True)
-        return self.activities_list_to_objects(serializer.validated_data)
+        return decode_activities(serialized_activities, self.activity_class)
 
-    def activities_list_to_objects(self, activities_list):
-        """
-        Create activities based on the serializer data.
-        """
-
-        def create_object(activity):
-            verb = get_verb_by_id(activity['verb']['id'])
-            extra_context = activity['extra_context']
-            activity_datetime = activity['time']
 
-            activity = self.activity_class(
-                activity['actor'], verb, activity['object'], activity['target'],
-                time=activity_datetime, extra_context=extra_context
-            )
+class AggregatedActivityBytesSerializer(BaseAggregatedSerializer):
+    """
+    Serialize aggregated activities to bytes, used by timeline storages without columns.
+    """
+    dehydrate = False
 
-            return activity
+    def dumps(self, aggregated):
+        self.check_type(aggregated)
+        return encode_aggregated(aggregated)
 
-        return list(map(create_object, activities_list))
+    def loads(self, serialized_aggregated):
+        return decode_aggregated(
+            serialized_aggregated, self.aggregated_activity_class, self.activity_class
+        )
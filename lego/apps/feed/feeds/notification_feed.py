@@ -1,6 +1,9 @@
+from datetime import timedelta
+
 from lego.apps.feed.feed import NotificationFeed as BaseNotificationFeed
 
 
 class NotificationFeed(BaseNotificationFeed):
 
+    max_age = timedelta(days=365)
     timeline_cf_name = 'notification'
@@ -1,6 +1,9 @@
+from datetime import timedelta
+
 from lego.apps.feed.feed import AggregatedFeed
 
 
 class PersonalFeed(AggregatedFeed):
 
+    max_age = timedelta(days=180)
     timeline_cf_name = 'personal'
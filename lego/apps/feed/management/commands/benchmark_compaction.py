@@ -0,0 +1,141 @@
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+
+from cassandra.concurrent import execute_concurrent_with_args
+from cassandra.cqlengine.connection import get_session
+from django.conf import settings
+
+from lego.apps.feed.activities import Activity
+from lego.apps.feed.compaction import FEED_CLASSES, Compactor
+from lego.apps.feed.fanout import TimelineWriter
+from lego.apps.feed.verbs import CommentVerb
+from lego.utils.management_command import BaseCommand
+
+log = logging.getLogger(__name__)
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+class Command(BaseCommand):
+
+    help = 'Measure the page-read latency of feeds before and after compaction.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--feed',
+            choices=FEED_CLASSES.keys(),
+            default='personal',
+        )
+        parser.add_argument(
+            '--feeds',
+            type=int,
+            default=100,
+            help='Number of feeds to create',
+        )
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=1000,
+            help='Number of aggregated activities in each feed, one per day',
+        )
+        parser.add_argument(
+            '--page-size',
+            type=int,
+            default=25,
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            default=False,
+            help='Print the results as JSON',
+        )
+
+    def create_feeds(self, feed_class, keys, rows):
+        now = datetime.utcnow()
+        aggregated_activities = []
+        for day in range(rows):
+            updated_at = now - timedelta(days=day)
+            activity = Activity(
+                actor='users.user-1', verb=CommentVerb, object=f'comments.comment-{day}',
+                target='articles.article-1', time=updated_at
+            )
+            aggregated_activities.append(
+                feed_class.aggregated_activity_class(
+                    f'benchmark-{day}', activities=[activity], created_at=updated_at,
+                    updated_at=updated_at
+                )
+            )
+
+        writer = TimelineWriter(feed_class)
+        for key in keys:
+            writer.add(key, aggregated_activities)
+        writer.execute()
+
+    def clear_feeds(self, feed_class, keys):
+        session = get_session()
+        table = feed_class.get_timeline_storage().model.column_family_name()
+        statement = session.prepare(f'DELETE FROM {table} WHERE "feed_id" = ?')
+        execute_concurrent_with_args(
+            session, statement,
+            [(key, ) for key in keys], concurrency=settings.FEED_FANOUT_WRITE_CONCURRENCY
+        )
+
+    def measure(self, feed_class, keys, page_size):
+        """
+        Read the first page and the last page kept by max_length of every feed.
+        """
+        last_page = max(feed_class.max_length - page_size, 0)
+        latencies = {'first_page': [], 'last_page': []}
+        for key in keys:
+            feed = feed_class(key)
+            for name, start in (('first_page', 0), ('last_page', last_page)):
+                start_time = time.time()
+                feed[start:start + page_size]
+                latencies[name].append((time.time() - start_time) * 1000)
+
+        return {
+            name: {
+                'p50_ms': round(percentile(values, 50), 2),
+                'p95_ms': round(percentile(values, 95), 2),
+            }
+            for name, values in latencies.items()
+        }
+
+    def run(self, *args, **options):
+        feed_class = FEED_CLASSES[options['feed']]
+        keys = [f'benchmark-{number}' for number in range(options['feeds'])]
+
+        self.create_feeds(feed_class, keys, options['rows'])
+        before = self.measure(feed_class, keys, options['page_size'])
+
+        compactor = Compactor(feed_class)
+        start_time = time.time()
+        reclaimed = sum(compactor.compact_keys(keys).values())
+        seconds = time.time() - start_time
+
+        after = self.measure(feed_class, keys, options['page_size'])
+        self.clear_feeds(feed_class, keys)
+
+        result = {
+            'feed': options['feed'],
+            'feeds': options['feeds'],
+            'rows': options['rows'],
+            'reclaimed_rows': reclaimed,
+            'compaction_seconds': round(seconds, 2),
+            'before': before,
+            'after': after,
+        }
+        log.info(
+            f'First page p50 {before["first_page"]["p50_ms"]} ms before and '
+            f'{after["first_page"]["p50_ms"]} ms after removing {reclaimed} rows'
+        )
+
+        if options['json']:
+            self.stdout.write(json.dumps(result))
+
+        log.info('Done!')
@@ -0,0 +1,133 @@
+import json
+import logging
+import time
+
+from cassandra.concurrent import execute_concurrent_with_args
+from cassandra.cqlengine.connection import get_session
+from django.conf import settings
+from stream_framework.feed_managers.base import add_operation
+from stream_framework.storage.cassandra.timeline_storage import CassandraTimelineStorage
+from stream_framework.utils import chunks
+
+from lego.apps.feed.activities import Activity
+from lego.apps.feed.activity_codec import activity_to_dict
+from lego.apps.feed.fanout import add_to_aggregated_feeds
+from lego.apps.feed.feed_manager import feed_manager
+from lego.apps.feed.feeds.notification_feed import NotificationFeed
+from lego.apps.feed.feeds.personal_feed import PersonalFeed
+from lego.apps.feed.feeds.user_feed import UserFeed
+from lego.apps.feed.verbs import CommentVerb
+from lego.utils.management_command import BaseCommand
+
+log = logging.getLogger(__name__)
+
+FEED_CLASSES = {
+    'personal': PersonalFeed,
+    'user': UserFeed,
+    'notification': NotificationFeed,
+}
+
+
+class Command(BaseCommand):
+
+    help = 'Measure fanout throughput of the per-feed and the chunked fanout paths.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipients',
+            type=int,
+            nargs='+',
+            default=[1000, 10000, 50000],
+            help='Number of recipients in each run',
+        )
+        parser.add_argument(
+            '--feed',
+            choices=FEED_CLASSES.keys(),
+            default='personal',
+        )
+        parser.add_argument(
+            '--skip-legacy',
+            action='store_true',
+            default=False,
+            help='Only measure the chunked fanout',
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            default=False,
+            help='Print the results as JSON',
+        )
+
+    def legacy_fanout(self, feed_class, user_ids, activity):
+        feed_manager.fanout_feeds(
+            user_ids, feed_class, add_operation, dict(activities=[activity], trim=False)
+        )
+
+    def chunked_fanout(self, feed_class, user_ids, activity):
+        add_to_aggregated_feeds(feed_class, user_ids, [activity], trim=False)
+
+    def clear_feeds(self, feed_class, user_ids):
+        keys = [feed_class(user_id).key for user_id in user_ids]
+        timeline_storage = feed_class.get_timeline_storage()
+        if isinstance(timeline_storage, CassandraTimelineStorage):
+            session = get_session()
+            table = timeline_storage.model.column_family_name()
+            statement = session.prepare(f'DELETE FROM {table} WHERE "feed_id" = ?')
+            execute_concurrent_with_args(
+                session, statement,
+                [(key, ) for key in keys], concurrency=settings.FEED_FANOUT_WRITE_CONCURRENCY
+            )
+        else:
+            for key in keys:
+                timeline_storage.delete(key)
+
+        if issubclass(feed_class, NotificationFeed):
+            for user_id in user_ids:
+                feed_class(user_id).feed_markers.flush('unseen', 'unread')
+
+    def measure(self, fanout, feed_class, user_ids, activity):
+        chunk_size = feed_manager.get_chunk_size(feed_class, len(user_ids))
+        start_time = time.time()
+        for ids_chunk in chunks(user_ids, chunk_size):
+            fanout(feed_class, list(ids_chunk), activity)
+        seconds = time.time() - start_time
+        self.clear_feeds(feed_class, user_ids)
+        return {
+            'chunk_size': chunk_size,
+            'seconds': round(seconds, 2),
+            'recipients_per_second': round(len(user_ids) / seconds, 2),
+        }
+
+    def run(self, *args, **options):
+        feed_class = FEED_CLASSES[options['feed']]
+        activity = Activity(
+            actor='users.user-1', verb=CommentVerb, object='comments.comment-1',
+            target='articles.article-1'
+        )
+        payload = [
+            f'{feed_class.__module__}.{feed_class.__name__}',
+            list(range(feed_manager.fanout_chunk_size)), 'add', [activity_to_dict(activity)], True
+        ]
+
+        results = []
+        for recipients in options['recipients']:
+            user_ids = [f'benchmark-{number}' for number in range(recipients)]
+            result = {
+                'feed': options['feed'],
+                'recipients': recipients,
+                'task_payload_bytes': len(json.dumps(payload)),
+                'chunked': self.measure(self.chunked_fanout, feed_class, user_ids, activity),
+            }
+            if not options['skip_legacy']:
+                result['legacy'] = self.measure(self.legacy_fanout, feed_class, user_ids, activity)
+
+            log.info(
+                f'{recipients} recipients: {result["chunked"]["recipients_per_second"]} '
+                'recipients/sec'
+            )
+            results.append(result)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results))
+
+        log.info('Done!')
@@ -0,0 +1,125 @@
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+
+from django.test.utils import override_settings
+from stream_framework.utils import chunks
+
+from lego.apps.feed.activities import Activity
+from lego.apps.feed.fanout import add_to_aggregated_feeds
+from lego.apps.feed.feed_manager import feed_manager
+from lego.apps.feed.feeds.personal_feed import PersonalFeed
+from lego.apps.feed.verbs import CommentVerb
+from lego.utils.management_command import BaseCommand
+
+log = logging.getLogger(__name__)
+
+STORAGES = {
+    'cassandra': 'stream_framework.storage.cassandra.timeline_storage.CassandraTimelineStorage',
+    'redis': 'lego.apps.feed.timeline_storage.RedisTimelineStorage',
+    'memory': 'lego.apps.feed.timeline_storage.InMemoryTimelineStorage',
+}
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+class Command(BaseCommand):
+
+    help = 'Measure fanout throughput and page-read latency of the feed timeline storages.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--storage',
+            choices=STORAGES.keys(),
+            nargs='+',
+            default=['redis', 'memory'],
+        )
+        parser.add_argument(
+            '--recipients',
+            type=int,
+            default=10000,
+            help='Number of feeds receiving each activity',
+        )
+        parser.add_argument(
+            '--activities',
+            type=int,
+            default=50,
+            help='Number of activities added to every feed',
+        )
+        parser.add_argument(
+            '--page-size',
+            type=int,
+            default=25,
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            default=False,
+            help='Print the results as JSON',
+        )
+
+    def fanout(self, feed_class, user_ids, activities):
+        chunk_size = feed_manager.get_chunk_size(feed_class, len(user_ids))
+        start_time = time.time()
+        for activity in activities:
+            for ids_chunk in chunks(user_ids, chunk_size):
+                add_to_aggregated_feeds(feed_class, list(ids_chunk), [activity])
+        seconds = time.time() - start_time
+        return {
+            'seconds': round(seconds, 2),
+            'recipients_per_second': round(len(user_ids) * len(activities) / seconds, 2),
+        }
+
+    def read(self, feed_class, user_ids, page_size):
+        latencies = []
+        for user_id in user_ids:
+            start_time = time.time()
+            feed_class(user_id)[:page_size]
+            latencies.append((time.time() - start_time) * 1000)
+        return {
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+        }
+
+    def clear_feeds(self, feed_class, user_ids):
+        timeline_storage = feed_class.get_timeline_storage()
+        for user_id in user_ids:
+            timeline_storage.delete(feed_class(user_id).key)
+
+    def run(self, *args, **options):
+        feed_class = PersonalFeed
+        now = datetime.utcnow()
+        activities = [
+            Activity(
+                actor='users.user-1', verb=CommentVerb, object=f'comments.comment-{number}',
+                target=f'articles.article-{number}', time=now - timedelta(hours=number)
+            ) for number in range(options['activities'])
+        ]
+        user_ids = [f'benchmark-{number}' for number in range(options['recipients'])]
+
+        results = []
+        for storage in options['storage']:
+            with override_settings(FEED_TIMELINE_STORAGE=STORAGES[storage]):
+                result = {
+                    'storage': storage,
+                    'recipients': options['recipients'],
+                    'activities': options['activities'],
+                    'fanout': self.fanout(feed_class, user_ids, activities),
+                    'first_page': self.read(feed_class, user_ids, options['page_size']),
+                }
+                self.clear_feeds(feed_class, user_ids)
+
+            log.info(
+                f'{storage}: {result["fanout"]["recipients_per_second"]} recipients/sec, '
+                f'first page p50 {result["first_page"]["p50_ms"]} ms'
+            )
+            results.append(result)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results))
+
+        log.info('Done!')
@@ -0,0 +1,57 @@
+import json
+import logging
+
+from lego.apps.feed.compaction import FEED_CLASSES, Compactor
+from lego.utils.management_command import BaseCommand
+
+log = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+
+    help = 'Remove the rows beyond the max length and age of each feed class.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--feed',
+            action='append',
+            dest='feeds',
+            choices=FEED_CLASSES.keys(),
+            help='Only compact the given feeds',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Number of feeds compacted concurrently',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            default=False,
+            help='Continue from the last compacted feed of an interrupted compaction',
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            default=False,
+            help='Print the reclaimed rows of each feed as JSON',
+        )
+
+    def run(self, *args, **options):
+        results = []
+        for feed in options['feeds'] or FEED_CLASSES.keys():
+            log.info(f'Compacting the {feed} feeds')
+            result = Compactor(
+                FEED_CLASSES[feed], chunk_size=options['chunk_size'], resume=options['resume']
+            ).run()
+            log.info(
+                f'Removed {result["reclaimed_rows"]} rows from {result["compacted_feeds"]} of '
+                f'{result["feeds"]} feeds in {result["seconds"]} seconds'
+            )
+            results.append(result)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results))
+
+        log.info('Done!')
@@ -0,0 +1,70 @@
+from django.core.cache import cache
+from stream_framework.metrics.base import Metrics
+from structlog import get_logger
+
+log = get_logger()
+
+
+class FeedMetrics(Metrics):
+    """
+    Stream framework metrics used by the FeedManager, set STREAM_METRIC_CLASS to this class.
+
+    Fanout latency and backlog are tracked per feed class in the cache:
+
+    * The latency is a moving average of the seconds used per recipient, measured for each chunk.
+      The FeedManager uses it to size the fanout chunks.
+    * The backlog is the number of queued fanout chunks that haven't been processed yet.
+    """
+
+    LATENCY_KEY = 'feed_fanout_latency_'
+    BACKLOG_KEY = 'feed_fanout_backlog_'
+
+    # Weight of the latest measurement in the moving average.
+    smoothing = 0.2
+
+    def _latency_key(self, feed_class):
+        return f'{self.LATENCY_KEY}{feed_class.__name__}'
+
+    def _backlog_key(self, feed_class):
+        return f'{self.BACKLOG_KEY}{feed_class.__name__}'
+
+    def get_recipient_latency(self, feed_class):
+        """
+        Return the average fanout seconds per recipient, None if no chunks are measured.
+        """
+        return cache.get(self._latency_key(feed_class))
+
+    def get_backlog(self, feed_class):
+        return cache.get(self._backlog_key(feed_class)) or 0
+
+    def on_fanout_queued(self, feed_class, recipients, chunks, queue):
+        key = self._backlog_key(feed_class)
+        cache.add(key, 0, timeout=None)
+        backlog = cache.incr(key, chunks)
+        log.info(
+            'feed_fanout_queued', feed_class=feed_class.__name__, recipients=recipients,
+            chunks=chunks, queue=queue, backlog=backlog
+        )
+
+    def on_fanout_chunk(self, feed_class, recipients, seconds):
+        """
+        Record a processed chunk, updates the latency average and the backlog.
+        """
+        latency = seconds / max(recipients, 1)
+        average = self.get_recipient_latency(feed_class)
+        if average is not None:
+            latency = average + self.smoothing * (latency - average)
+        cache.set(self._latency_key(feed_class), latency, timeout=None)
+
+        key = self._backlog_key(feed_class)
+        cache.add(key, 0, timeout=None)
+        backlog = cache.decr(key)
+        if backlog < 0:
+            # Chunks fanned out without being queued, like eager tasks in development.
+            cache.set(key, 0, timeout=None)
+            backlog = 0
+
+        log.info(
+            'feed_fanout_chunk', feed_class=feed_class.__name__, recipients=recipients,
+            seconds=round(seconds, 3), backlog=backlog
+        )
@@ -0,0 +1,115 @@
+"""
+Unseen and unread counters of notification feeds.
+
+The unseen and unread notifications are tracked by the feed markers, Redis lists of aggregated
+activity ids. The length of each list is stored in a counters hash, updated in the same
+transaction as the lists by the markers storage. Reading the notification data of a feed is a
+single HMGET, and doesn't require a feed instance.
+
+Counters missing from Redis, stored before the counters were introduced or evicted, are
+recomputed from the lists when they are read. The repair_notification_counters task recomputes
+the counters of every user.
+"""
+from stream_framework.storage.redis.connection import get_redis_connection
+from stream_framework.storage.redis.lists_storage import RedisListsStorage
+
+COUNTERS_KEY_FORMAT = 'counters:%(key)s'
+LIST_NAMES = ('unseen', 'unread')
+
+# Set a field in the counters hash (KEYS[1]) to the length of each list (KEYS[2:]), the field
+# names are passed as arguments.
+COUNT_SCRIPT = """
+for index = 2, #KEYS do
+    redis.call('HSET', KEYS[1], ARGV[index - 1], redis.call('LLEN', KEYS[index]))
+end
+"""
+
+
+class CountedListsStorage(RedisListsStorage):
+    """
+    Lists storage keeping the length of each list in a counters hash.
+    """
+
+    @property
+    def counters_key(self):
+        return COUNTERS_KEY_FORMAT % {'key': self.base_key}
+
+    def count_lists(self, pipe, list_names):
+        """
+        Queue a recount of the given lists on a pipeline.
+        """
+        script = self.redis.register_script(COUNT_SCRIPT)
+        script(
+            keys=[self.counters_key] + self.get_keys(list_names), args=list(list_names), client=pipe
+        )
+
+    def add(self, **kwargs):
+        list_names = [list_name for list_name, values in kwargs.items() if values]
+        if list_names:
+            pipe = self.redis.pipeline()
+            for list_name in list_names:
+                key = self.get_key(list_name)
+                for value in kwargs[list_name]:
+                    pipe.rpush(key, value)
+                # Removes items from list's head
+                pipe.ltrim(key, -self.max_length, -1)
+            self.count_lists(pipe, list_names)
+            pipe.execute()
+
+    def remove(self, **kwargs):
+        if kwargs:
+            pipe = self.redis.pipeline()
+            for list_name, values in kwargs.items():
+                key = self.get_key(list_name)
+                for value in values:
+                    # Removes all occurrences of value in the list
+                    pipe.lrem(key, 0, value)
+            self.count_lists(pipe, kwargs.keys())
+            pipe.execute()
+
+    def flush(self, *args):
+        if args:
+            pipe = self.redis.pipeline()
+            pipe.delete(*self.get_keys(args))
+            pipe.hmset(self.counters_key, {list_name: 0 for list_name in args})
+            pipe.execute()
+
+
+def _markers(feed_class, user_id):
+    return feed_class.markers_storage_class(
+        key=feed_class.markers_key_format % {'user_id': user_id},
+        max_length=feed_class.markers_max_length
+    )
+
+
+def _notification_data(unseen, unread):
+    return {'unseen_count': int(unseen), 'unread_count': int(unread)}
+
+
+def repair(feed_class, user_ids):
+    """
+    Recompute the counters of many feeds from the markers, using one pipeline.
+
+    :return: A dict mapping every user id to the notification data of the feed.
+    """
+    user_ids = list(user_ids)
+    pipe = get_redis_connection().pipeline()
+    for user_id in user_ids:
+        markers = _markers(feed_class, user_id)
+        markers.count_lists(pipe, LIST_NAMES)
+        pipe.hmget(markers.counters_key, LIST_NAMES)
+
+    # Every user has a script result followed by the counters.
+    counters = pipe.execute()[1::2]
+    return {user_id: _notification_data(*values) for user_id, values in zip(user_ids, counters)}
+
+
+def get_notification_data(feed_class, user_id):
+    """
+    Return the unseen and unread count of a notification feed.
+    """
+    markers = _markers(feed_class, user_id)
+    unseen, unread = get_redis_connection().hmget(markers.counters_key, LIST_NAMES)
+    if unseen is None or unread is None:
+        return repair(feed_class, [user_id])[user_id]
+    return _notification_data(unseen, unread)
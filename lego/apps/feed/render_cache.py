@@ -0,0 +1,70 @@
+"""
+Cache of rendered feed pages.
+
+A rendered page is the paginated response of a feed endpoint, with the context attached by
+FeedViewSet.attach_metadata. Pages are keyed by the feed, the viewer and the query string, and a
+version stored per feed. FeedManager.fanout removes the version of every feed it writes to, the
+next request renders the page again. The pages of every feed also share a content version, it is
+removed when an object rendered in the context of the pages changes.
+"""
+import hashlib
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+
+PAGE_CACHE_KEY = 'feed_render_'
+VERSION_CACHE_KEY = 'feed_render_version_'
+CONTENT_VERSION_CACHE_KEY = 'feed_render_content_version'
+
+
+def _version_key(feed_class, feed_id):
+    return f'{VERSION_CACHE_KEY}{feed_class.timeline_cf_name}_{feed_id}'
+
+
+def _versions(*keys):
+    versions = cache.get_many(keys)
+    return [versions.get(key) or cache.get_or_set(key, uuid4().hex, timeout=None) for key in keys]
+
+
+def _page_key(feed_class, feed_id, user_id, query):
+    version, content_version = _versions(
+        _version_key(feed_class, feed_id), CONTENT_VERSION_CACHE_KEY
+    )
+    digest = hashlib.sha1(query.encode()).hexdigest()
+    return (
+        f'{PAGE_CACHE_KEY}{feed_class.timeline_cf_name}_{feed_id}_{version}_{content_version}_'
+        f'{user_id}_{digest}'
+    )
+
+
+def get_or_render(feed_class, feed_id, user_id, query, render):
+    """
+    Return the cached page, or call `render` and cache the result for FEED_RENDER_CACHE_TIMEOUT
+    seconds.
+    """
+    if not settings.FEED_RENDER_CACHE:
+        return render()
+
+    key = _page_key(feed_class, feed_id, user_id, query)
+    page = cache.get(key)
+    if page is None:
+        page = render()
+        cache.set(key, page, timeout=settings.FEED_RENDER_CACHE_TIMEOUT)
+    return page
+
+
+def invalidate(feed_class, feed_ids):
+    """
+    Invalidate the rendered pages of many feeds of the same class using one cache operation.
+    """
+    if settings.FEED_RENDER_CACHE:
+        cache.delete_many([_version_key(feed_class, feed_id) for feed_id in feed_ids])
+
+
+def invalidate_content():
+    """
+    Invalidate the rendered pages of every feed, the context of the pages has changed.
+    """
+    if settings.FEED_RENDER_CACHE:
+        cache.delete(CONTENT_VERSION_CACHE_KEY)
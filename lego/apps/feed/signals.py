@@ -1,11 +1,15 @@
 from functools import wraps
 
+from django.db import transaction
 from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
+from . import render_cache
+from .attr_cache import AttrCache
 from .signal_handler import AsyncSignalHandler
 
 signal_handler = AsyncSignalHandler()
+attr_cache = AttrCache()
 
 
 def disable_for_loaddata(signal_handler):
@@ -34,3 +38,27 @@ def post_save_callback(**kwargs):
 @receiver(post_delete)
 def post_delete_callback(**kwargs):
     signal_handler.on_delete(kwargs.get('instance'))
+
+
+@receiver(post_save)
+@disable_for_loaddata
+def refresh_attr_cache(**kwargs):
+    instance = kwargs.get('instance')
+    if attr_cache.is_rendered(instance):
+        transaction.on_commit(lambda: refresh_rendered(instance))
+
+
+def refresh_rendered(instance):
+    """
+    Render the instance again, and the cached feed pages when the rendered value changed.
+    """
+    if attr_cache.refresh(instance):
+        render_cache.invalidate_content()
+
+
+@receiver(post_delete)
+def remove_from_attr_cache(**kwargs):
+    instance = kwargs.get('instance')
+    if attr_cache.is_rendered(instance):
+        attr_cache.remove(instance)
+        render_cache.invalidate_content()
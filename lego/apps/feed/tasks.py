@@ -1,9 +1,14 @@
+from django.utils.module_loading import import_string
+from stream_framework.utils import chunks
 from structlog import get_logger
 
 from lego import celery_app
 from lego.apps.feed.registry import get_handler
 from lego.utils.tasks import AbakusTask
 
+from . import notification_counters
+from .activity_codec import activity_from_dict
+
 log = get_logger()
 
 
@@ -20,3 +25,61 @@ def add_to_feeds(self, instance, action='update', logger_context=None):
         return
 
     handler.handle_event(instance, action)
+
+
+@celery_app.task(serializer='json', bind=True, base=AbakusTask)
+def fanout_activities(
+    self, feed_class, user_ids, operation, activities, trim=True, logger_context=None
+):
+    """
+    Run a fanout operation on a chunk of feeds. The payload only contains ids, the feed class is
+    passed as a dotted path and the activities as dicts.
+    """
+    from .feed_manager import feed_manager
+
+    self.setup_logger(logger_context)
+
+    feed_class = import_string(feed_class)
+    activities = [
+        activity_from_dict(activity, feed_class.activity_class) for activity in activities
+    ]
+    feed_manager.fanout(
+        user_ids, feed_class, feed_manager.operations[operation],
+        dict(activities=activities, trim=trim)
+    )
+
+
+@celery_app.task(serializer='json', bind=True, base=AbakusTask)
+def repair_notification_counters(self, logger_context=None):
+    """
+    Recompute the unseen and unread counters of every notification feed from the markers.
+    """
+    from lego.apps.users.models import User
+
+    from .feeds.notification_feed import NotificationFeed
+
+    self.setup_logger(logger_context)
+
+    user_ids = User.objects.values_list('pk', flat=True).iterator()
+    repaired = 0
+    for user_ids_chunk in chunks(user_ids, 1000):
+        repaired += len(notification_counters.repair(NotificationFeed, user_ids_chunk))
+
+    log.info('notification_counters_repaired', feeds=repaired)
+
+
+@celery_app.task(serializer='json', bind=True, base=AbakusTask)
+def compact_feeds(self, logger_context=None):
+    """
+    Enforce the max length and age of every feed. Continues an interrupted compaction.
+    """
+    from .compaction import FEED_CLASSES, Compactor
+    from .timeline_storage import uses_cassandra
+
+    self.setup_logger(logger_context)
+
+    if not uses_cassandra():
+        return
+
+    for feed_class in FEED_CLASSES.values():
+        Compactor(feed_class, resume=True).run()
@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+from unittest import mock
+
+from django.test import tag
+
+from lego.apps.feed.activities import Activity
+from lego.apps.feed.compaction import Compactor, get_progress
+from lego.apps.feed.fanout import TimelineWriter
+from lego.apps.feed.feeds.personal_feed import PersonalFeed
+from lego.apps.feed.feeds.user_feed import UserFeed
+from lego.apps.feed.tests.feed_test_base import FeedTestBase
+from lego.apps.feed.verbs import CommentVerb
+
+
+@tag('feed')
+class CompactionTestCase(FeedTestBase):
+    def create_feed(self, feed_class, key, days):
+        now = datetime.utcnow()
+        aggregated_activities = []
+        for day in range(days):
+            updated_at = now - timedelta(days=day)
+            activity = Activity(
+                actor='users.user-1', verb=CommentVerb, object=f'comments.comment-{day}',
+                target='articles.article-1', time=updated_at
+            )
+            aggregated_activities.append(
+                feed_class.aggregated_activity_class(
+                    f'group-{day}', activities=[activity], created_at=updated_at,
+                    updated_at=updated_at
+                )
+            )
+
+        writer = TimelineWriter(feed_class)
+        writer.add(key, aggregated_activities)
+        writer.execute()
+
+    def test_max_length(self):
+        self.create_feed(UserFeed, 'test1', 20)
+        self.create_feed(UserFeed, 'test2', 5)
+
+        with mock.patch.object(UserFeed, 'max_length', 10):
+            removed = Compactor(UserFeed).compact_keys(['test1', 'test2'])
+
+        self.assertEqual(removed, {'test1': 10})
+        self.assertEqual(UserFeed('test1').count(), 10)
+        self.assertEqual(UserFeed('test2').count(), 5)
+
+    def test_max_age(self):
+        self.create_feed(PersonalFeed, 'test1', 20)
+
+        with mock.patch.object(PersonalFeed, 'max_age', timedelta(days=9, hours=12)):
+            removed = Compactor(PersonalFeed).compact_keys(['test1'])
+
+        self.assertEqual(removed, {'test1': 10})
+        feed = PersonalFeed('test1')
+        self.assertEqual(feed.count(), 10)
+        self.assertEqual(feed[:1][0].group, 'group-0')
+
+    def test_run(self):
+        for key in ('test1', 'test2', 'test3'):
+            self.create_feed(UserFeed, key, 15)
+
+        with mock.patch.object(UserFeed, 'max_length', 10):
+            result = Compactor(UserFeed, chunk_size=2).run()
+
+        self.assertEqual(result['feeds'], 3)
+        self.assertEqual(result['compacted_feeds'], 3)
+        self.assertEqual(result['reclaimed_rows'], 15)
+        self.assertIsNone(get_progress(UserFeed))
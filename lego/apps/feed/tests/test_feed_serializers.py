@@ -5,6 +5,7 @@ from stream_framework.verbs.base import Comment as CommentVerb
 from lego.apps.articles.models import Article
 from lego.apps.comments.models import Comment
 from lego.apps.feed.activities import Activity, AggregatedActivity
+from lego.apps.feed.activity_codec import decode_activities, encode_activities
 from lego.apps.feed.feed_serializers import AggregatedActivitySerializer
 from lego.apps.feed.feeds.notification_feed import NotificationFeed
 from lego.apps.users.models import User
@@ -46,3 +47,33 @@ class FeedActivitySerializerTestCase(BaseTestCase):
         self.assertEqual(deserialized.updated_at, self.aggregated_activity.updated_at)
         self.assertEqual(deserialized.serialization_id, self.aggregated_activity.serialization_id)
         self.assertEqual(deserialized.last_activities, self.aggregated_activity.last_activities)
+
+    def test_activity_codec(self):
+        """Activities are restored by the binary codec, including missing objects and targets"""
+        activities = [
+            self.activity,
+            Activity(actor=self.user, verb=CommentVerb, object=self.comment),
+        ]
+        decoded = decode_activities(encode_activities(activities), Activity)
+
+        for activity, decoded_activity in zip(activities, decoded):
+            self.assertEqual(decoded_activity.serialization_id, activity.serialization_id)
+            self.assertEqual(decoded_activity.actor, activity.actor)
+            self.assertEqual(decoded_activity.object, activity.object)
+            self.assertEqual(decoded_activity.target, activity.target)
+            self.assertEqual(decoded_activity.time, activity.time)
+            self.assertEqual(decoded_activity.extra_context, activity.extra_context)
+
+    def test_decode_json_rows(self):
+        """Rows stored as JSON before the binary codec can still be read"""
+        row = (
+            '[{"time":"2018-03-01T12:00:00.123456","verb":%d,"actor":"users.user-1",'
+            '"object":"comments.comment-1","target":null,"extra_context":{"content":"comment"}}]'
+        ) % CommentVerb.id
+
+        activity, = decode_activities(row.encode(), Activity)
+        self.assertEqual(activity.actor, 'users.user-1')
+        self.assertEqual(activity.object, 'comments.comment-1')
+        self.assertIsNone(activity.target)
+        self.assertEqual(activity.time, datetime(2018, 3, 1, 12, 0, 0, 123456))
+        self.assertEqual(activity.extra_context, {'content': 'comment'})
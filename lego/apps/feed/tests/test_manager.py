@@ -1,7 +1,7 @@
 from unittest import mock
 
-from django.test import tag
-from stream_framework.feed_managers.base import add_operation, remove_operation
+from django.test import override_settings, tag
+from stream_framework.feed_managers.base import FanoutPriority, add_operation, remove_operation
 
 from lego.apps.comments.models import Comment
 from lego.apps.feed.activities import Activity
@@ -70,3 +70,44 @@ class ManagerTestCase(FeedTestBase):
         self.assertIn({'abc', 'def'}, mock_create_fanout_tasks.call_args[0])
         self.assertIn(NotificationFeed, mock_create_fanout_tasks.call_args[0])
         self.assertIn(remove_operation, mock_create_fanout_tasks.call_args[0])
+
+    def test_fanout_merges_aggregated_activities(self):
+        """Activities in the same group are merged into the current aggregated activity"""
+        second_activity = Activity(
+            actor=self.comment.created_by, verb=CommentVerb,
+            object=Comment.objects.exclude(id=self.comment.id).first(),
+            target=self.comment.content_object
+        )
+        feed_manager.add_activity(self.activity, ['test1'], [NotificationFeed])
+        feed_manager.add_activity(second_activity, ['test1', 'test2'], [NotificationFeed])
+
+        feed = NotificationFeed('test1')
+        self.assertEqual(len(feed[:]), 1)
+        self.assertEqual(self.activity_count(feed), 2)
+        self.assertEqual(feed.count_unseen(), 1)
+        self.assertEqual(self.activity_count(NotificationFeed('test2')), 1)
+
+    @override_settings(
+        FEED_FANOUT_CHUNK_SECONDS=1, FEED_FANOUT_MIN_CHUNK_SIZE=10, FEED_FANOUT_MAX_CHUNK_SIZE=500,
+        FEED_FANOUT_MAX_CHUNKS=100
+    )
+    def test_chunk_size(self):
+        """The chunk size follows the measured latency, within the configured limits"""
+        with mock.patch.object(feed_manager.metrics, 'get_recipient_latency', return_value=None):
+            self.assertEqual(feed_manager.get_chunk_size(PersonalFeed, 50), 100)
+            self.assertEqual(feed_manager.get_chunk_size(PersonalFeed, 30000), 300)
+        with mock.patch.object(feed_manager.metrics, 'get_recipient_latency', return_value=0.02):
+            self.assertEqual(feed_manager.get_chunk_size(PersonalFeed, 1000), 50)
+        with mock.patch.object(feed_manager.metrics, 'get_recipient_latency', return_value=1):
+            self.assertEqual(feed_manager.get_chunk_size(PersonalFeed, 1000), 10)
+        with mock.patch.object(feed_manager.metrics, 'get_recipient_latency', return_value=0.0001):
+            self.assertEqual(feed_manager.get_chunk_size(PersonalFeed, 1000), 500)
+
+    @override_settings(FEED_FANOUT_BULK_THRESHOLD=100)
+    def test_fanout_priority(self):
+        """Small notification fanouts use the high priority, large fanouts the low priority"""
+        self.assertEqual(feed_manager.get_fanout_priority(NotificationFeed, 1), FanoutPriority.HIGH)
+        self.assertEqual(feed_manager.get_fanout_priority(PersonalFeed, 1), FanoutPriority.LOW)
+        self.assertEqual(
+            feed_manager.get_fanout_priority(NotificationFeed, 1000), FanoutPriority.LOW
+        )
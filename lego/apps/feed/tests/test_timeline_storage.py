@@ -0,0 +1,138 @@
+from datetime import datetime, timedelta
+
+from django.test import TestCase, override_settings, tag
+from stream_framework.storage.redis.connection import get_redis_connection
+
+from lego.apps.feed.activities import Activity
+from lego.apps.feed.feed_manager import feed_manager
+from lego.apps.feed.feeds.notification_feed import NotificationFeed
+from lego.apps.feed.feeds.personal_feed import PersonalFeed
+from lego.apps.feed.feeds.user_feed import UserFeed
+from lego.apps.feed.tests.feed_test_base import FeedTestBase
+from lego.apps.feed.timeline_storage import timelines
+from lego.apps.feed.verbs import CommentVerb
+
+
+class TimelineStorageConformance:
+    """
+    Tests shared by every timeline storage, set `storage` to the storage class path.
+    """
+    storage = None
+
+    def setUp(self):
+        storage_settings = override_settings(FEED_TIMELINE_STORAGE=self.storage)
+        storage_settings.enable()
+        self.addCleanup(storage_settings.disable)
+
+        now = datetime.utcnow()
+        self.activities = [
+            Activity(
+                actor='users.user-1', verb=CommentVerb, object=f'comments.comment-{number}',
+                target=f'articles.article-{number}', time=now - timedelta(days=number)
+            ) for number in range(3)
+        ]
+
+    def test_add_and_read(self):
+        for activity in self.activities:
+            feed_manager.add_activity(activity, ['test1', 'test2'], [PersonalFeed])
+
+        feed = PersonalFeed('test1')
+        self.assertEqual(feed.count(), 3)
+        aggregated = feed[:]
+        self.assertEqual(
+            [aggregated.activities for aggregated in aggregated],
+            [[activity] for activity in self.activities]
+        )
+        self.assertEqual(PersonalFeed('test2').count(), 3)
+        self.assertEqual(UserFeed('test1').count(), 0)
+
+    def test_aggregation(self):
+        activity = Activity(
+            actor='users.user-2', verb=CommentVerb, object='comments.comment-10',
+            target='articles.article-0', time=self.activities[0].time
+        )
+        feed_manager.add_activity(self.activities[0], ['test1'], [PersonalFeed])
+        feed_manager.add_activity(activity, ['test1'], [PersonalFeed])
+
+        feed = PersonalFeed('test1')
+        self.assertEqual(feed.count(), 1)
+        self.assertEqual(set(feed[0].activities), {self.activities[0], activity})
+
+    def test_remove(self):
+        for activity in self.activities:
+            feed_manager.add_activity(activity, ['test1'], [PersonalFeed])
+        feed_manager.remove_activity(self.activities[1], ['test1'], [PersonalFeed])
+
+        feed = PersonalFeed('test1')
+        self.assertEqual(feed.count(), 2)
+        self.assertNotIn(self.activities[1], [aggregated.activities[0] for aggregated in feed[:]])
+
+    def test_slice_and_filter(self):
+        for activity in self.activities:
+            feed_manager.add_activity(activity, ['test1'], [PersonalFeed])
+
+        feed = PersonalFeed('test1')
+        newest, middle, oldest = feed[:]
+        self.assertEqual(feed[1:2], [middle])
+
+        older = feed.filter(activity_id__lt=str(newest.serialization_id))
+        self.assertEqual(older[:], [middle, oldest])
+
+        ascending = feed.order_by('activity_id')
+        self.assertEqual(ascending[:1], [oldest])
+
+    def test_trim(self):
+        for activity in self.activities:
+            feed_manager.add_activity(activity, ['test1'], [PersonalFeed])
+
+        feed = PersonalFeed('test1')
+        feed.trim(2)
+        self.assertEqual(feed.count(), 2)
+        self.assertEqual(feed[0].activities, [self.activities[0]])
+
+    def test_notification_markers(self):
+        feed_manager.add_activity(self.activities[0], ['test1'], [NotificationFeed])
+        feed_manager.add_activity(self.activities[1], ['test1'], [NotificationFeed])
+
+        feed = NotificationFeed('test1')
+        self.assertEqual(feed.get_notification_data(), {'unseen_count': 2, 'unread_count': 2})
+
+        feed.mark_activity(feed[0].serialization_id, seen=True, read=True)
+        self.assertEqual(feed.get_notification_data(), {'unseen_count': 1, 'unread_count': 1})
+        self.assertTrue(feed[0].is_read)
+        self.assertFalse(feed[1].is_read)
+
+
+@tag('feed')
+class CassandraTimelineStorageTestCase(TimelineStorageConformance, FeedTestBase):
+    storage = 'stream_framework.storage.cassandra.timeline_storage.CassandraTimelineStorage'
+
+    def setUp(self):
+        super().setUp()
+        get_redis_connection().flushdb()
+
+
+class RedisTimelineStorageTestCase(TimelineStorageConformance, TestCase):
+    storage = 'lego.apps.feed.timeline_storage.RedisTimelineStorage'
+
+    def setUp(self):
+        super().setUp()
+        get_redis_connection().flushdb()
+
+    def test_payload_is_read_as_bytes(self):
+        feed_manager.add_activity(self.activities[0], ['test1'], [PersonalFeed])
+
+        feed = PersonalFeed('test1')
+        ((activity_id, data), ) = feed.timeline_storage.get_slice_from_storage(feed.key, 0, 1)
+        self.assertIsInstance(data, bytes)
+        aggregated = feed.timeline_storage.serializer.loads(data)
+        self.assertEqual(aggregated.activities, [self.activities[0]])
+
+
+class InMemoryTimelineStorageTestCase(TimelineStorageConformance, TestCase):
+    storage = 'lego.apps.feed.timeline_storage.InMemoryTimelineStorage'
+
+    def setUp(self):
+        super().setUp()
+        get_redis_connection().flushdb()
+        timelines.clear()
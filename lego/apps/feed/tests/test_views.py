@@ -1,6 +1,8 @@
 from datetime import datetime, timedelta
 
-from django.test import tag
+from django.core.cache import cache
+from django.test import override_settings, tag
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
 from stream_framework.storage.redis.connection import get_redis_connection
@@ -8,9 +10,12 @@ from stream_framework.verbs.base import Comment as CommentVerb
 
 from lego.apps.articles.models import Article
 from lego.apps.comments.models import Comment
+from lego.apps.feed import render_cache
 from lego.apps.feed.activities import Activity
 from lego.apps.feed.feed_manager import feed_manager
 from lego.apps.feed.feeds.notification_feed import NotificationFeed
+from lego.apps.feed.signals import attr_cache, refresh_rendered
+from lego.apps.feed.tasks import repair_notification_counters
 from lego.apps.feed.tests.feed_test_base import FeedTestBase
 from lego.apps.users.models import User
 
@@ -159,3 +164,59 @@ class NotificationViewsTestCase(APITestCase, FeedTestBase):
         notification = self.client.get(f'{self.url}').json()['results'][0]
         self.assertTrue(notification['read'])
         self.assertTrue(notification['seen'])
+
+    @override_settings(FEED_RENDER_CACHE=True)
+    def test_render_cache(self):
+        """Cached pages are invalidated by fanout and by marking notifications"""
+        self.client.force_login(self.user)
+        notifications = self.client.get(self.url).json()['results']
+        self.assertEqual(len(notifications), 1)
+
+        feed_manager.add_activity(self.activity3, [self.user.pk], [NotificationFeed])
+        notifications = self.client.get(self.url).json()['results']
+        self.assertEqual(len(notifications), 2)
+        self.assertFalse(notifications[0]['seen'])
+
+        self.client.post(f'{self.url}mark_all/', data=dict(seen=True))
+        notification = self.client.get(self.url).json()['results'][0]
+        self.assertTrue(notification['seen'])
+
+    @override_settings(FEED_RENDER_CACHE=True)
+    def test_render_cache_content(self):
+        """Cached pages are invalidated when a rendered object changes"""
+        self.client.force_login(self.user)
+        actor = User.objects.get(id=3)
+        attr_cache.remove(actor)
+        self.addCleanup(attr_cache.remove, actor)
+        context = self.client.get(self.url).json()['results'][0]['context']
+        self.assertEqual(context[f'users.user-{actor.id}']['firstName'], actor.first_name)
+
+        # The signal handler runs on commit, which never happens in a test case.
+        version = cache.get(render_cache.CONTENT_VERSION_CACHE_KEY)
+        actor.last_login = timezone.now()
+        actor.save()
+        refresh_rendered(actor)
+        self.assertEqual(cache.get(render_cache.CONTENT_VERSION_CACHE_KEY), version)
+
+        actor.first_name = 'Renamed'
+        actor.save()
+        refresh_rendered(actor)
+        context = self.client.get(self.url).json()['results'][0]['context']
+        self.assertEqual(context[f'users.user-{actor.id}']['firstName'], 'Renamed')
+
+    def test_notification_counters_repair(self):
+        """Missing or wrong counters are recomputed from the markers"""
+        self.client.force_login(self.user)
+        feed = NotificationFeed(self.user.pk)
+        redis = get_redis_connection()
+
+        redis.delete(feed.feed_markers.counters_key)
+        res = self.client.get(f'{self.url}notification_data/').json()
+        self.assertEqual(res['unseenCount'], 1)
+        self.assertEqual(res['unreadCount'], 1)
+
+        redis.hmset(feed.feed_markers.counters_key, {'unseen': 5, 'unread': 5})
+        repair_notification_counters.delay()
+        res = self.client.get(f'{self.url}notification_data/').json()
+        self.assertEqual(res['unseenCount'], 1)
+        self.assertEqual(res['unreadCount'], 1)
@@ -0,0 +1,169 @@
+"""
+Timeline storages used by aggregated feeds, selected with the FEED_TIMELINE_STORAGE setting.
+
+* CassandraTimelineStorage from stream-framework stores every feed class in a column family.
+* RedisTimelineStorage stores every feed in a sorted set, scored by the activity id.
+* InMemoryTimelineStorage keeps the feeds in the current process, for tests, benchmarks and
+  development without Cassandra.
+
+The Redis and in-memory storages store aggregated activities as bytes, using
+AggregatedActivityBytesSerializer. The bytes aren't valid UTF-8, so the Redis storage uses
+connections that don't decode the responses. Chunked fanout writes to Cassandra using prepared
+statements, the other storages are written through the storage API, see lego.apps.feed.fanout.
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+
+import redis
+from django.conf import settings
+from django.utils.module_loading import import_string
+from stream_framework import settings as stream_settings
+from stream_framework.storage.base import BaseTimelineStorage
+from stream_framework.storage.cassandra.timeline_storage import CassandraTimelineStorage
+from stream_framework.storage.redis.timeline_storage import \
+    RedisTimelineStorage as BaseRedisTimelineStorage
+
+from .feed_serializers import AggregatedActivityBytesSerializer
+
+
+def get_storage_class():
+    return import_string(settings.FEED_TIMELINE_STORAGE)
+
+
+def uses_cassandra():
+    return issubclass(get_storage_class(), CassandraTimelineStorage)
+
+
+class ColumnFamilyMixin:
+    """
+    Accept the options passed to CassandraTimelineStorage, and keep the feed classes apart using
+    the column family name.
+    """
+    aggregated_serializer_class = AggregatedActivityBytesSerializer
+
+    def __init__(self, serializer_class=None, **options):
+        self.column_family_name = options.pop('column_family_name', 'aggregated')
+        options.pop('modelClass', None)
+        options.pop('hosts', None)
+        super().__init__(serializer_class, **options)
+
+
+# Connection pools of the Redis storage, keyed by the server name.
+binary_connection_pools = {}
+
+
+def get_binary_redis_connection(server_name='default'):
+    """
+    Same as get_redis_connection from stream-framework, without decode_responses.
+    """
+    pool = binary_connection_pools.get(server_name)
+    if pool is None:
+        config = stream_settings.STREAM_REDIS_CONFIG[server_name]
+        pool = redis.ConnectionPool(
+            host=config['host'], port=config['port'], password=config.get('password'),
+            db=config['db']
+        )
+        binary_connection_pools[server_name] = pool
+    return redis.StrictRedis(connection_pool=pool)
+
+
+class RedisTimelineStorage(ColumnFamilyMixin, BaseRedisTimelineStorage):
+    def get_connection(self):
+        return get_binary_redis_connection(self.options.get('redis_server', 'default'))
+
+    def get_cache(self, key):
+        cache = super().get_cache(f'feed:{self.column_family_name}:{key}')
+        cache.redis = self.get_connection()
+        return cache
+
+    def get_batch_interface(self):
+        return self.get_connection().pipeline(transaction=False)
+
+    def get_slice_from_storage(self, key, start, stop, filter_kwargs=None, ordering_args=None):
+        # Cursor pagination filters on activity ids passed as strings.
+        filter_kwargs = {name: int(value) for name, value in (filter_kwargs or {}).items()}
+        return super().get_slice_from_storage(key, start, stop, filter_kwargs, ordering_args)
+
+    def remove_from_storage(self, key, activities, batch_interface=None):
+        # Remove by score, the aggregated activity read from the feed and serialized again
+        # doesn't have to match the stored bytes.
+        cache = self.get_cache(key)
+        pipe = cache.redis.pipeline(transaction=False)
+        for activity_id in activities.keys():
+            pipe.zremrangebyscore(cache.get_key(), activity_id, activity_id)
+        return sum(pipe.execute())
+
+
+# Timelines of the in-memory storage, keyed by the column family name and the feed key.
+timelines = defaultdict(dict)
+
+
+class InMemoryTimelineStorage(ColumnFamilyMixin, BaseTimelineStorage):
+    """
+    Store the serialized aggregated activities in a dict per feed. Only shared within a process.
+    """
+
+    def _timeline(self, key):
+        return timelines[(self.column_family_name, str(key))]
+
+    def contains(self, key, activity_id):
+        return int(activity_id) in self._timeline(key)
+
+    def get_index_of(self, key, activity_id):
+        return sorted(self._timeline(key), reverse=True).index(int(activity_id))
+
+    def get_slice_from_storage(self, key, start, stop, filter_kwargs=None, ordering_args=None):
+        timeline = self._timeline(key)
+        activity_ids = list(timeline.keys())
+
+        comparisons = {
+            'gte': lambda a, b: a >= b,
+            'gt': lambda a, b: a > b,
+            'lte': lambda a, b: a <= b,
+            'lt': lambda a, b: a < b,
+        }
+        for name, value in (filter_kwargs or {}).items():
+            field, comparison = name.split('__')
+            if field != 'activity_id' or comparison not in comparisons:
+                raise ValueError(f'Unrecognized filter kwarg {name}')
+            activity_ids = [
+                activity_id for activity_id in activity_ids
+                if comparisons[comparison](activity_id, int(value))
+            ]
+
+        ascending = bool(ordering_args) and 'activity_id' in ordering_args
+        activity_ids = sorted(activity_ids, reverse=not ascending)[start:stop]
+        return [(activity_id, timeline[activity_id]) for activity_id in activity_ids]
+
+    def add_to_storage(self, key, activities, *args, **kwargs):
+        timeline = self._timeline(key)
+        count = len(timeline)
+        timeline.update({int(activity_id): data for activity_id, data in activities.items()})
+        return len(timeline) - count
+
+    def remove_from_storage(self, key, activities, *args, **kwargs):
+        timeline = self._timeline(key)
+        return len(
+            [
+                activity_id for activity_id in activities.keys()
+                if timeline.pop(int(activity_id), None) is not None
+            ]
+        )
+
+    @contextmanager
+    def get_batch_interface(self):
+        yield None
+
+    def count(self, key, *args, **kwargs):
+        return len(self._timeline(key))
+
+    def delete(self, key, *args, **kwargs):
+        timelines.pop((self.column_family_name, str(key)), None)
+
+    def trim(self, key, length, batch_interface=None):
+        timeline = self._timeline(key)
+        for activity_id in sorted(timeline, reverse=True)[length:]:
+            del timeline[activity_id]
+
+    def flush(self):
+        timelines.clear()
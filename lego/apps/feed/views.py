@@ -6,8 +6,13 @@ from lego.apps.feed.feeds.group_feed import GroupFeed
 from lego.apps.feed.feeds.notification_feed import NotificationFeed
 from lego.apps.feed.feeds.personal_feed import PersonalFeed
 from lego.apps.feed.feeds.user_feed import UserFeed
+from lego.apps.permissions.models import ObjectPermissionsModel
+from lego.apps.permissions.utils import get_permission_handler
+from lego.utils.content_types import split_string, string_to_model_cls
 
+from . import render_cache
 from .attr_cache import AttrCache
+from .notification_counters import get_notification_data
 from .serializers import AggregatedFeedSerializer, MarkSerializer, NotificationFeedSerializer
 
 
@@ -42,7 +47,7 @@ class FeedViewSet(viewsets.GenericViewSet):
 
         if content_strings:
             cache = AttrCache()
-            lookup = cache.bulk_lookup(content_strings)
+            lookup = self.filter_visible(cache.bulk_lookup(content_strings))
 
         for item in data:
             context = {}
@@ -64,6 +69,45 @@ class FeedViewSet(viewsets.GenericViewSet):
 
         return data
 
+    def filter_visible(self, lookup):
+        """
+        Remove context the user isn't allowed to view. Only content types with object permissions
+        are checked, each content type is resolved with one query.
+        """
+        pks_by_content_type = {}
+        for content_string in lookup.keys():
+            content_type, pk = split_string(content_string)
+            pks_by_content_type.setdefault(content_type, set()).add(pk)
+
+        hidden = set()
+        for content_type, pks in pks_by_content_type.items():
+            model = string_to_model_cls(content_type)
+            if not issubclass(model, ObjectPermissionsModel):
+                continue
+            handler = get_permission_handler(model)
+            visible = {str(pk) for pk in handler.filter_visible(self.request.user, model, pks)}
+            hidden.update(f'{content_type}-{pk}' for pk in pks - visible)
+
+        return {key: value for key, value in lookup.items() if key not in hidden}
+
+    def render_page(self, feed):
+        """
+        Return the paginated and hydrated page of a feed. Pages are cached until the feed changes,
+        see lego.apps.feed.render_cache.
+        """
+
+        def render():
+            page = self.paginate_queryset(feed)
+            if page is None:
+                raise exceptions.APIException
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(self.attach_metadata(serializer.data)).data
+
+        query = self.request.query_params.urlencode()
+        return render_cache.get_or_render(
+            self.feed_class, feed.user_id, self.request.user.pk, query, render
+        )
+
     def get_queryset(self):
         # Perform the lookup filtering.
         lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
@@ -87,14 +131,8 @@ class FeedRetrieveMixin:
     """
 
     def retrieve(self, request, *args, **kwargs):
-        queryset = self.filter_queryset(self.get_queryset())
-
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(self.attach_metadata(serializer.data))
-
-        raise exceptions.APIException
+        feed = self.filter_queryset(self.get_queryset())
+        return Response(self.render_page(feed))
 
 
 class FeedListMixin:
@@ -103,14 +141,8 @@ class FeedListMixin:
     """
 
     def list(self, request, *args, **kwargs):
-        queryset = self.filter_queryset(self.get_queryset())
-
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(self.attach_metadata(serializer.data))
-
-        raise exceptions.APIException
+        feed = self.filter_queryset(self.get_queryset())
+        return Response(self.render_page(feed))
 
 
 class UserFeedViewSet(FeedViewSet, FeedRetrieveMixin):
@@ -166,6 +198,7 @@ class NotificationFeedViewSet(FeedViewSet, FeedListMixin):
         data = serializer.validated_data
         feed = self.get_queryset()
         feed.mark_all(**data)
+        render_cache.invalidate(self.feed_class, [feed.user_id])
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     @decorators.detail_route(
@@ -181,9 +214,9 @@ class NotificationFeedViewSet(FeedViewSet, FeedListMixin):
         data = serializer.validated_data
         feed = self.get_queryset()
         feed.mark_activity(pk, **data)
+        render_cache.invalidate(self.feed_class, [feed.user_id])
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     @decorators.list_route(permission_classes=[permissions.IsAuthenticated], methods=['GET'])
     def notification_data(self, request):
-        feed = self.get_queryset()
-        return Response(feed.get_notification_data())
+        return Response(get_notification_data(self.feed_class, request.user.pk))
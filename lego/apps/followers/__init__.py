@@ -0,0 +1 @@
+default_app_config = 'lego.apps.followers.apps.FollowersConfig'
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class FollowersConfig(AppConfig):
+    name = 'lego.apps.followers'
+    verbose_name = 'Followers'
+
+    def ready(self):
+        super().ready()
+        from .signals import follow_changed_callback  # noqa
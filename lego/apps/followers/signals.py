@@ -0,0 +1,15 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from lego.apps.followers.models import FollowCompany, FollowEvent, FollowUser
+from lego.apps.users.recipients import invalidate_followers
+
+
+@receiver(post_save, sender=FollowUser)
+@receiver(post_save, sender=FollowEvent)
+@receiver(post_save, sender=FollowCompany)
+@receiver(post_delete, sender=FollowUser)
+@receiver(post_delete, sender=FollowEvent)
+@receiver(post_delete, sender=FollowCompany)
+def follow_changed_callback(instance, **kwargs):
+    invalidate_followers(instance.target)
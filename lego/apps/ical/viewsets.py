@@ -86,7 +86,7 @@ class ICalViewset(viewsets.ViewSet):
         feed = utils.generate_ical_feed(request, calendar_type)
 
         permission_handler = get_permission_handler(Event)
-        following_events = permission_handler.filter_queryset(
+        following_events = permission_handler.filter_visible_queryset(
             request.user,
             Event.objects.filter(
                 followers__follower_id=request.user.id,
@@ -114,7 +114,7 @@ class ICalViewset(viewsets.ViewSet):
         feed = utils.generate_ical_feed(request, calendar_type)
 
         permission_handler = get_permission_handler(Event)
-        events = permission_handler.filter_queryset(
+        events = permission_handler.filter_visible_queryset(
             request.user,
             Event.objects.all().filter(end_time__gt=timezone.now())
         )
@@ -144,7 +144,7 @@ class ICalViewset(viewsets.ViewSet):
         feed = utils.generate_ical_feed(request, calendar_type)
 
         permission_handler = get_permission_handler(Event)
-        events = permission_handler.filter_queryset(
+        events = permission_handler.filter_visible_queryset(
             request.user,
             Event.objects.all().filter(
                 end_time__gt=timezone.now() - timedelta(days=constants.HISTORY_BACKWARDS_IN_DAYS)
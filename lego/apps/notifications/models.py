@@ -3,6 +3,8 @@ from django.db import models
 from django.utils import timezone
 
 from lego.apps.feed.tasks import add_to_feeds
+from lego.apps.users.models import User
+from lego.apps.users.recipients import members_of, union
 from lego.utils.models import BasisModel
 
 from .constants import CHANNEL_CHOICES, CHANNELS, NOTIFICATION_CHOICES, NOTIFICATION_TYPES
@@ -77,17 +79,18 @@ class Announcement(BasisModel):
         """
         Lookup users that should receive this message.
         """
-        all_users = []
+        # Group members are resolved with a single lookup in the recipient cache.
+        user_ids = union(
+            *[members_of(group_id) for group_id in self.groups.values_list('pk', flat=True)]
+        )
+        user_ids.update(self.users.values_list('pk', flat=True))
 
-        for relation_name in self.MANY_TO_MANY_RELATIONS:
+        for relation_name in ('events', 'meetings'):
             relation = getattr(self, relation_name)
             for instance in relation.all():
-                announcement_lookup = getattr(instance, 'announcement_lookup', None)
-                if announcement_lookup:
-                    users = announcement_lookup()
-                    all_users += list(users)
+                user_ids.update(user.pk for user in instance.announcement_lookup())
 
-        return list(set(all_users))
+        return list(User.objects.filter(pk__in=user_ids))
 
     def send(self):
         if self.sent:
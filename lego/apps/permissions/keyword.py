@@ -1,25 +1,159 @@
+import time
+
+from django.conf import settings
+
+_END = object()
+
+# In-process cache of compiled permissions, keyed by closure version and group ids.
+_compiled_permissions = {}
+
+
+class PermissionTrie:
+    """
+    Compiled set of keyword permissions.
+
+    Keyword permissions are prefixes, a user with `/sudo/admin/` has `/sudo/admin/users/list/`.
+    The permissions are stored in a trie of path segments, so a lookup walks the segments of the
+    permission string once instead of comparing it with every permission the user has.
+    """
+
+    def __init__(self, permissions=()):
+        self.permissions = frozenset(permissions)
+        self.root = {}
+        # Permissions not following the /segment/ format are checked with a plain prefix scan.
+        self.fallback = []
+
+        for permission in self.permissions:
+            if not (permission.startswith('/') and permission.endswith('/')):
+                self.fallback.append(permission)
+                continue
+            node = self.root
+            for part in permission[1:-1].split('/') if len(permission) > 1 else []:
+                node = node.setdefault(part, {})
+            node[_END] = True
+
+    def _match_fallback(self, perm):
+        for permission in self.fallback:
+            if perm.startswith(permission):
+                return True
+        return False
+
+    def match(self, perm):
+        """
+        Same result as checking perm.startswith(permission) for every permission in the trie.
+        """
+        parts = perm.split('/')
+        if parts[0] == '':
+            node = self.root
+            for part in parts[1:]:
+                if _END in node:
+                    return True
+                node = node.get(part)
+                if node is None:
+                    break
+        return self._match_fallback(perm)
+
+    def match_many(self, perms):
+        """
+        Match many permission strings in one traversal of the trie. Permission strings sharing a
+        prefix are walked together.
+
+        :return: The set of matched permission strings.
+        """
+        matched = set()
+        candidates = []
+        for perm in set(perms):
+            parts = perm.split('/')
+            if parts[0] == '':
+                candidates.append((perm, parts))
+            elif self._match_fallback(perm):
+                matched.add(perm)
+
+        stack = [(self.root, 1, candidates)]
+        while stack:
+            node, depth, pending = stack.pop()
+            remaining = [(perm, parts) for perm, parts in pending if len(parts) > depth]
+            if _END in node:
+                matched.update(perm for perm, _ in remaining)
+                continue
+
+            children = {}
+            for perm, parts in remaining:
+                children.setdefault(parts[depth], []).append((perm, parts))
+            for part, group in children.items():
+                child = node.get(part)
+                if child is not None:
+                    stack.append((child, depth + 1, group))
+
+        if self.fallback:
+            matched.update(perm for perm, _ in candidates if self._match_fallback(perm))
+        return matched
+
+
+def _load_permissions(group_ids):
+    from lego.apps.users.models import AbakusGroup
+
+    permissions = set()
+    groups = AbakusGroup.all_objects.filter(id__in=group_ids)
+    for available_perms in groups.values_list('permissions', flat=True):
+        if available_perms:
+            permissions.update(available_perms)
+    return permissions
+
+
+def compile_permissions(group_ids):
+    """
+    Compile the keyword permissions given by a set of groups. The result is cached in-process for
+    `KEYWORD_PERMISSIONS_CACHE_TIMEOUT` seconds, and shared by users with the same groups. The
+    cache key contains the group closure version, changes to a group invalidates the entries.
+    """
+    from lego.apps.users.group_closure import get_version
+
+    group_ids = frozenset(group_ids)
+    version = get_version()
+    if version is None:
+        return PermissionTrie(_load_permissions(group_ids))
+
+    key = (version, group_ids)
+    now = time.monotonic()
+    cached = _compiled_permissions.get(key)
+    if cached and cached[0] > now:
+        return cached[1]
+
+    if len(_compiled_permissions) >= settings.KEYWORD_PERMISSIONS_CACHE_SIZE:
+        _compiled_permissions.clear()
+
+    trie = PermissionTrie(_load_permissions(group_ids))
+    _compiled_permissions[key] = (now + settings.KEYWORD_PERMISSIONS_CACHE_TIMEOUT, trie)
+    return trie
+
+
 class KeywordPermissions:
     """
     This class manages keyword permissions.
     """
 
     @staticmethod
-    def get_group_permissions(user):
+    def get_compiled_permissions(user):
         if user.is_anonymous:
-            return set()
-
-        perms = set()
-        for group in user.all_groups:
-            available_perms = group.permissions
-            if available_perms:
-                perms.update(available_perms)
+            return PermissionTrie()
+        return user.keyword_permissions
 
-        return perms
+    @staticmethod
+    def get_group_permissions(user):
+        return set(KeywordPermissions.get_compiled_permissions(user).permissions)
 
     @staticmethod
     def has_perm(user, perm):
-        permissions = KeywordPermissions.get_group_permissions(user)
-        for permission in permissions:
-            if perm.startswith(permission):
-                return True
-        return False
+        return KeywordPermissions.get_compiled_permissions(user).match(perm)
+
+    @staticmethod
+    def has_perms(user, perms):
+        """
+        Check a list of permission strings using one traversal of the compiled permissions.
+        """
+        perms = set(perms)
+        if not perms:
+            return True
+        matched = KeywordPermissions.get_compiled_permissions(user).match_many(perms)
+        return len(matched) == len(perms)
@@ -0,0 +1,89 @@
+import json
+import logging
+import timeit
+
+from lego.apps.permissions.keyword import PermissionTrie
+from lego.utils.management_command import BaseCommand
+
+log = logging.getLogger(__name__)
+
+ACTIONS = ['list', 'view', 'edit', 'create']
+
+
+def linear_scan(permissions, perm):
+    """
+    The prefix scan used before the permissions were compiled.
+    """
+    for permission in permissions:
+        if perm.startswith(permission):
+            return True
+    return False
+
+
+class Command(BaseCommand):
+
+    help = 'Compare the compiled keyword permissions with a linear prefix scan.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--models',
+            type=int,
+            default=50,
+            help='Number of models the user has permissions for',
+        )
+        parser.add_argument(
+            '--rounds',
+            type=int,
+            default=100,
+            help='Number of times every lookup is repeated',
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            default=False,
+            help='Print the results as JSON',
+        )
+
+    def run(self, *args, **options):
+        models = options['models']
+        rounds = options['rounds']
+        permissions = [
+            f'/sudo/admin/{model}s/{action}/' for model in range(models) for action in ACTIONS
+        ] + ['/sudo/admin/meetings/']
+        # Half of the lookups are permissions the user doesn't have.
+        perms = [
+            f'/sudo/admin/{model}s/{action}/' for model in range(models // 2, models + models // 2)
+            for action in ['list', 'delete']
+        ]
+        trie = PermissionTrie(permissions)
+
+        timings = {
+            'scan':
+            timeit.timeit(
+                lambda: [linear_scan(permissions, perm) for perm in perms], number=rounds
+            ),
+            'trie':
+            timeit.timeit(lambda: [trie.match(perm) for perm in perms], number=rounds),
+            'batch':
+            timeit.timeit(lambda: trie.match_many(perms), number=rounds),
+        }
+
+        lookups = len(perms) * rounds
+        results = []
+        for strategy, seconds in timings.items():
+            result = {
+                'strategy': strategy,
+                'permissions': len(permissions),
+                'lookups': lookups,
+                'us_per_lookup': round(seconds * 1000000 / lookups, 3),
+            }
+            log.info(
+                f'{strategy}: {result["us_per_lookup"]} us per lookup, '
+                f'{result["permissions"]} permissions'
+            )
+            results.append(result)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results))
+
+        log.info('Done!')
@@ -1,7 +1,12 @@
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import FieldDoesNotExist
 from django.db.models import Q
 
 from lego.apps.permissions.constants import CREATE, LIST, VIEW
 from lego.apps.permissions.models import ObjectPermissionsModel
+from lego.utils.content_types import string_to_model_cls
 
 
 def _check_intersection(first, second):
@@ -153,7 +158,7 @@ class PermissionHandler:
                 return queryset.filter(require_auth=False)
 
             # User is authenticated, display objects created by user or object with group rights.
-            groups = [abakus_group.pk for abakus_group in user.all_groups]
+            groups = list(user.all_group_ids)
             return queryset.filter(
                 Q(can_edit_users__in=[user.pk])
                 | Q(can_edit_groups__in=groups)
@@ -163,6 +168,86 @@ class PermissionHandler:
 
         return queryset
 
+    def has_default_object_permissions(self):
+        """
+        Bulk evaluation in filter_visible mirrors the object checks implemented by this class.
+        Handlers overriding them are evaluated one object at a time.
+        """
+        handler = type(self)
+        return all(
+            getattr(handler, method) is getattr(PermissionHandler, method)
+            for method in ['has_perm', 'has_object_permissions', 'created_by', 'require_auth']
+        )
+
+    def filter_visible(self, user, content_type, pks, perm=VIEW):
+        """
+        Resolve which objects of a content type the user has a permission on. Equal to calling
+        `user.has_perm(perm, obj)` for every object, but evaluated for the whole batch with one
+        query.
+
+        :param content_type: Content type string like `events.event`, or a model class.
+        :return: The set of permitted primary keys.
+        """
+        if isinstance(content_type, str):
+            model = string_to_model_cls(content_type)
+        else:
+            model = content_type
+
+        queryset = model.objects.filter(pk__in=list(pks))
+        if not self.has_default_object_permissions():
+            return {obj.pk for obj in queryset if user.has_perm(perm, obj)}
+
+        visible = self.filter_visible_queryset(user, queryset, perm)
+        return set(visible.values_list('pk', flat=True))
+
+    def filter_visible_queryset(self, user, queryset, perm=VIEW):
+        """
+        Queryset version of filter_visible. Unlike filter_queryset, the result matches the object
+        permission checks done by has_perm, keyword permissions included.
+        """
+        if not self.has_default_object_permissions():
+            pks = [obj.pk for obj in queryset if user.has_perm(perm, obj)]
+            return queryset.model.objects.filter(pk__in=pks)
+
+        if not user.is_anonymous and not user.is_active:
+            return queryset.none()
+
+        model = queryset.model
+        object_permissions = issubclass(model, ObjectPermissionsModel)
+        authenticated = self.is_authenticated(user)
+        require_auth = self.authentication_map.get(perm, self.default_require_auth)
+        conditions = []
+
+        if not require_auth:
+            if perm in self.safe_methods:
+                return queryset
+            elif not authenticated:
+                return queryset.none()
+        elif perm in self.safe_methods and object_permissions:
+            conditions.append(Q(require_auth=False))
+
+        if not authenticated:
+            return queryset.filter(*conditions) if conditions else queryset.none()
+
+        if user.has_perms(self.required_keyword_permissions(model, perm)):
+            return queryset
+
+        try:
+            model._meta.get_field('created_by')
+            conditions.append(Q(created_by=user))
+        except FieldDoesNotExist:
+            pass
+
+        if object_permissions:
+            groups = list(user.all_group_ids)
+            conditions += [Q(can_edit_groups__in=groups), Q(can_edit_users__in=[user.pk])]
+            if perm in self.safe_methods:
+                conditions.append(Q(can_view_groups__in=groups))
+
+        if not conditions:
+            return queryset.none()
+        return queryset.filter(reduce(or_, conditions)).distinct()
+
     def require_auth(self, perm, obj=None, queryset=None):
         require_auth = self.authentication_map.get(perm, self.default_require_auth)
         if not require_auth:
@@ -207,17 +292,17 @@ class PermissionHandler:
     def has_object_permissions(self, user, perm, obj):
         if perm in self.safe_methods:
             # Check can_view
-            if _check_intersection(
-                user.all_groups,
-                obj.can_view_groups.all() | obj.can_edit_groups.all()
-            ):
+            groups = obj.can_view_groups.all() | obj.can_edit_groups.all()
+            if _check_intersection(user.all_group_ids, groups.values_list('pk', flat=True)):
                 return True
             elif user in obj.can_edit_users.all():
                 return True
             return False
         else:
             # Check can_edit
-            if _check_intersection(user.all_groups, obj.can_edit_groups.all()):
+            if _check_intersection(
+                user.all_group_ids, obj.can_edit_groups.values_list('pk', flat=True)
+            ):
                 return True
             elif user in obj.can_edit_users.all():
                 return True
@@ -1,4 +1,7 @@
-from lego.apps.permissions.keyword import KeywordPermissions
+from django.test import override_settings
+
+from lego.apps.permissions.keyword import KeywordPermissions, PermissionTrie
+from lego.apps.users.group_closure import invalidate_all
 from lego.apps.users.models import AbakusGroup, User
 from lego.utils.test_utils import BaseTestCase
 
@@ -24,3 +27,64 @@ class KeywordPermissionsTestCase(BaseTestCase):
     def test_has_perm_incorrect(self):
         has_perm = KeywordPermissions.has_perm(self.test_user, '/sudo')
         self.assertFalse(has_perm)
+
+    def test_has_perms(self):
+        self.assertTrue(
+            KeywordPermissions.has_perms(
+                self.test_user, ['/sudo/admin/users/list/', '/sudo/admin/users/view/']
+            )
+        )
+        self.assertFalse(
+            KeywordPermissions.has_perms(self.test_user, ['/sudo/admin/users/list/', '/sudo/'])
+        )
+        self.assertTrue(KeywordPermissions.has_perms(self.test_user, []))
+
+    @override_settings(GROUP_CLOSURE_CACHE=True)
+    def test_compiled_permissions_are_invalidated(self):
+        invalidate_all()
+        self.assertFalse(KeywordPermissions.has_perm(self.test_user, '/sudo/admin/events/'))
+
+        self.useradmin_group.permissions = ['/sudo/admin/']
+        self.useradmin_group.save()
+
+        user = User.objects.get(pk=self.test_user.pk)
+        self.assertTrue(KeywordPermissions.has_perm(user, '/sudo/admin/events/'))
+
+
+class PermissionTrieTestCase(BaseTestCase):
+
+    permissions = [
+        f'/sudo/admin/{model}s/{action}/' for model in range(50)
+        for action in ['list', 'view', 'edit', 'create']
+    ] + ['/sudo/admin/meetings/']
+
+    def linear_scan(self, perm):
+        for permission in self.permissions:
+            if perm.startswith(permission):
+                return True
+        return False
+
+    def test_matches_prefix_scan(self):
+        trie = PermissionTrie(self.permissions)
+        perms = [
+            '/sudo/', '/sudo/admin/', '/sudo/admin/meetings/', '/sudo/admin/meetings/list/',
+            '/sudo/admin/meetingsx/', '/sudo/admin/10s/list/', '/sudo/admin/10s/list',
+            '/sudo/admin/10s/delete/', '/sudo/admin/99s/list/', ''
+        ]
+        for perm in perms:
+            self.assertEqual(trie.match(perm), self.linear_scan(perm), perm)
+        self.assertEqual(trie.match_many(perms), set(filter(self.linear_scan, perms)))
+
+    def test_matches_prefix_scan_for_many_permissions(self):
+        """
+        The timing is measured by the benchmark_permissions command.
+        """
+        trie = PermissionTrie(self.permissions)
+        perms = [
+            f'/sudo/admin/{model}s/{action}/' for model in range(25, 75)
+            for action in ['list', 'delete']
+        ]
+
+        expected = [self.linear_scan(perm) for perm in perms]
+        self.assertEqual([trie.match(perm) for perm in perms], expected)
+        self.assertEqual(trie.match_many(perms), {perm for perm in perms if self.linear_scan(perm)})
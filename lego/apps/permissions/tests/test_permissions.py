@@ -1,9 +1,12 @@
+from django.contrib.auth.models import AnonymousUser
 from rest_framework.test import APIRequestFactory, force_authenticate
 
+from lego.apps.permissions.constants import EDIT, VIEW
 from lego.apps.permissions.tests.models import TestModel
 from lego.apps.permissions.tests.view import TestViewSet
+from lego.apps.permissions.utils import get_permission_handler
 from lego.apps.users.models import AbakusGroup, User
-from lego.utils.test_utils import BaseAPITestCase
+from lego.utils.test_utils import BaseAPITestCase, BaseTestCase
 
 
 class PermissionTestCase(BaseAPITestCase):
@@ -151,3 +154,57 @@ class PermissionTestCase(BaseAPITestCase):
             f'/permissiontest/{self.test_object.id}/', self.test_update_object
         )
         self.assertEqual(response.status_code, 404)
+
+
+class FilterVisibleTestCase(BaseTestCase):
+    fixtures = ['test_abakus_groups.yaml', 'test_users.yaml']
+
+    def setUp(self):
+        users = User.objects.all()
+        self.creator = users[0]
+        self.allowed_user = users[1]
+        self.disallowed_user = users[2]
+        self.webkom = AbakusGroup.objects.get(name='Webkom')
+        self.webkom.add_user(self.allowed_user)
+
+        self.objects = []
+        for require_auth in [True, False]:
+            for name in ['private', 'view_group', 'edit_user']:
+                test_object = TestModel(name=name, require_auth=require_auth)
+                test_object.save(current_user=self.creator)
+                if name == 'view_group':
+                    test_object.can_view_groups.add(self.webkom)
+                elif name == 'edit_user':
+                    test_object.can_edit_users.add(self.allowed_user)
+                self.objects.append(test_object)
+
+        self.pks = [test_object.pk for test_object in self.objects]
+        self.handler = get_permission_handler(TestModel)
+
+    def assertMatchesHasPerm(self, user, perm):
+        expected = {
+            test_object.pk
+            for test_object in self.objects if user.has_perm(perm, test_object)
+        }
+        self.assertEqual(self.handler.filter_visible(user, TestModel, self.pks, perm), expected)
+
+    def test_matches_has_perm(self):
+        users = [self.creator, self.allowed_user, self.disallowed_user, AnonymousUser()]
+        for user in users:
+            for perm in [VIEW, EDIT]:
+                self.assertMatchesHasPerm(user, perm)
+
+    def test_keyword_permissions(self):
+        group = AbakusGroup.objects.create(
+            name='test_object_admins', permissions=['/sudo/admin/testmodels/']
+        )
+        group.add_user(self.disallowed_user)
+        self.assertEqual(
+            self.handler.filter_visible(self.disallowed_user, 'tests.testmodel', self.pks),
+            set(self.pks)
+        )
+
+    def test_single_query(self):
+        self.allowed_user.keyword_permissions
+        with self.assertNumQueries(1):
+            self.handler.filter_visible(self.allowed_user, TestModel, self.pks)
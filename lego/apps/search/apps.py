@@ -1,9 +1,8 @@
 from django.apps import AppConfig
 from django.conf import settings
-from django.utils.module_loading import autodiscover_modules
+from django.utils.module_loading import autodiscover_modules, import_string
 
 from . import backend
-from .backends.elasticsearch import ElasticsearchBackend
 
 
 class SearchConfig(AppConfig):
@@ -17,8 +16,8 @@ class SearchConfig(AppConfig):
         is registered this way.
         """
         if not settings.TESTING:
-            # Simple way to initialize the search backend. We may change this in the future.
-            search_backed = ElasticsearchBackend()
+            # The backend class is selected with the SEARCH_BACKEND setting.
+            search_backed = import_string(settings.SEARCH_BACKEND)()
             search_backed.set_up()
             backend.current_backend = search_backed
 
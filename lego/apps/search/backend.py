@@ -31,6 +31,13 @@ class SearchBacked:
         """
         pass
 
+    def refresh(self):
+        """
+        Make recent changes visible to search. Backends with near real-time indexing should
+        override this function, it's used by the benchmark_search command.
+        """
+        pass
+
     def update_many(self, tuple_list):
         """
         Bulk update items. Used by the update function by default.
@@ -38,6 +45,15 @@ class SearchBacked:
         """
         raise NotImplementedError('Please implement the update_many function.')
 
+    def update_stream(self, tuple_iterator):
+        """
+        Index a stream of items, used when reindexing. Returns the number of indexed items.
+        Backends supporting concurrent bulk requests should override this function.
+        """
+        tuple_list = list(tuple_iterator)
+        self.update_many(tuple_list)
+        return len(tuple_list)
+
     def update(self, content_type, pk, data):
         return self.update_many([(content_type, pk, data)])
 
@@ -2,9 +2,13 @@ import certifi
 from django.conf import settings
 from django.template.loader import render_to_string
 from elasticsearch import Elasticsearch, NotFoundError
-from elasticsearch.helpers import bulk
+from elasticsearch.helpers import bulk, parallel_bulk
+from structlog import get_logger
 
 from lego.apps.search.backend import SearchBacked
+from lego.apps.search.registry import index_registry
+
+log = get_logger()
 
 
 class ElasticsearchBackend(SearchBacked):
@@ -96,6 +100,21 @@ class ElasticsearchBackend(SearchBacked):
                 }
             }
 
+    def _source_fields(self, content_types=None, autocomplete=False):
+        """
+        Return the document fields used to build results. Only these fields are returned by
+        Elasticsearch, large fields like article text aren't sent back and parsed for every query.
+        """
+        source_fields = {'id_', 'type_'}
+        for content_type, search_index in index_registry.items():
+            if content_types and content_type not in content_types:
+                continue
+            if autocomplete:
+                source_fields.update(search_index.get_autocomplete_result_fields())
+            else:
+                source_fields.update(search_index.get_result_fields())
+        return sorted(source_fields)
+
     def migrate(self):
         """
         The only migration we need is to upload a index template. This is used by ES when the
@@ -103,26 +122,48 @@ class ElasticsearchBackend(SearchBacked):
         """
         self._refresh_template()
 
-    def update_many(self, tuple_list):
-        def create_operation(data_tuple):
-            content_type, pk, data = data_tuple
-            data_fields = dict()
+    def _update_operation(self, data_tuple):
+        """
+        Create a index operation from a ('content_type', 'pk', 'data') tuple.
+        """
+        content_type, pk, data = data_tuple
+        data_fields = dict()
 
-            # Add fields to the operation payload
-            data_fields.update(data.get('fields', {}))
+        # Add fields to the operation payload
+        data_fields.update(data.get('fields', {}))
 
-            # Add autocomplete to the operation if it exists
-            autocomplete = self._format_autocomplete(content_type, data.pop('autocomplete'))
-            if autocomplete:
-                data_fields.update(autocomplete)
+        # Add autocomplete to the operation if it exists
+        autocomplete = self._format_autocomplete(content_type, data.pop('autocomplete'))
+        if autocomplete:
+            data_fields.update(autocomplete)
 
-            # Add filter fields
-            filter_fields = data.get('filters', {})
-            data_fields.update({f'{k}_filter': v for k, v in filter_fields.items()})
+        # Add filter fields
+        filter_fields = data.get('filters', {})
+        data_fields.update({f'{k}_filter': v for k, v in filter_fields.items()})
 
-            return self._index(content_type, pk, data_fields)
+        return self._index(content_type, pk, data_fields)
 
-        return self._bulk(map(create_operation, tuple_list))
+    def refresh(self):
+        self.connection.indices.refresh(self._index_name())
+
+    def update_many(self, tuple_list):
+        return self._bulk(map(self._update_operation, tuple_list))
+
+    def update_stream(self, tuple_iterator):
+        """
+        Stream operations to Elasticsearch using concurrent bulk requests.
+        """
+        indexed = 0
+        for success, info in parallel_bulk(
+            self.connection, map(self._update_operation,
+                                 tuple_iterator), thread_count=settings.SEARCH_BULK_THREADS,
+            chunk_size=settings.SEARCH_BULK_CHUNK_SIZE, raise_on_error=False
+        ):
+            if success:
+                indexed += 1
+            else:
+                log.warn('search_bulk_index_failed', info=info)
+        return indexed
 
     def remove_many(self, tuple_list):
         def create_operation(data_tuple):
@@ -140,6 +181,7 @@ class ElasticsearchBackend(SearchBacked):
         """
         if not filters:
             search_query = {
+                '_source': self._source_fields(),
                 'query': {
                     'multi_match': {
                         "query": query,
@@ -150,6 +192,7 @@ class ElasticsearchBackend(SearchBacked):
             }
         else:
             search_query = {
+                '_source': self._source_fields(),
                 'query': {
                     'bool': {
                         'must': {
@@ -185,6 +228,7 @@ class ElasticsearchBackend(SearchBacked):
 
     def autocomplete(self, query, content_types=None):
         autocomplete_query = {
+            '_source': self._source_fields(content_types, autocomplete=True),
             'suggest': {
                 'autocomplete': {
                     'prefix': query,
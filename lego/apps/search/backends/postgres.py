@@ -0,0 +1,136 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection, transaction
+from django.db.models import F
+
+from lego.apps.search.backend import SearchBacked
+
+AUTOCOMPLETE_SEPARATOR = '\n'
+
+
+class PostgresBackend(SearchBacked):
+    """
+    Search backend storing documents in a Postgres table. Search uses a tsvector column, and
+    autocomplete uses prefix lookups backed by a trigram index. Useful when Elasticsearch isn't
+    available, and as a baseline when benchmarking.
+    """
+
+    name = 'postgres'
+
+    search_config = 'simple'
+    result_size = 10
+
+    def migrate(self):
+        """
+        Create the trigram index used by autocomplete. The pg_trgm extension is created here
+        instead of in a database migration, so deployments using Elasticsearch don't need it.
+        Creating the extension requires a superuser, unless it exists already.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm;')
+            cursor.execute(
+                'CREATE INDEX IF NOT EXISTS search_document_autocomplete ON search_searchdocument '
+                'USING gin (autocomplete gin_trgm_ops);'
+            )
+
+    def _document(self, content_type, pk, data):
+        from lego.apps.search.models import SearchDocument
+
+        fields = dict(data.get('fields', {}))
+        filters = data.get('filters', {})
+
+        filter_terms = []
+        for key, value in filters.items():
+            values = value if isinstance(value, (list, tuple)) else [value]
+            filter_terms += [f'{key}:{v}' for v in values]
+
+        autocomplete = data.get('autocomplete') or []
+        if isinstance(autocomplete, str):
+            autocomplete = [autocomplete]
+        autocomplete = [term for term in autocomplete if term]
+
+        text = ' '.join(
+            str(value) for value in fields.values() if isinstance(value,
+                                                                  (str, int, float))
+        )
+
+        return SearchDocument(
+            identifier=f'{content_type}-{pk}',
+            content_type=content_type,
+            object_id=pk,
+            fields=fields,
+            filter_terms=filter_terms,
+            autocomplete=''.join(AUTOCOMPLETE_SEPARATOR + term.lower() for term in autocomplete),
+            text=text,
+        )
+
+    def update_many(self, tuple_list):
+        from lego.apps.search.models import SearchDocument
+
+        documents = [self._document(*data_tuple) for data_tuple in tuple_list]
+        identifiers = [document.identifier for document in documents]
+
+        with transaction.atomic():
+            SearchDocument.objects.filter(identifier__in=identifiers).delete()
+            SearchDocument.objects.bulk_create(documents)
+            SearchDocument.objects.filter(identifier__in=identifiers).update(
+                search_vector=SearchVector('text', config=self.search_config)
+            )
+        return len(documents)
+
+    def remove_many(self, tuple_list):
+        from lego.apps.search.models import SearchDocument
+
+        identifiers = [f'{content_type}-{pk}' for content_type, pk in tuple_list]
+        SearchDocument.objects.filter(identifier__in=identifiers).delete()
+
+    def clear(self):
+        from lego.apps.search.models import SearchDocument
+
+        SearchDocument.objects.all().delete()
+
+    def _format_result(self, document, result_fields):
+        result = {
+            field: document.fields[field]
+            for field in result_fields if field in document.fields
+        }
+        result.update({'id': document.object_id, 'content_type': document.content_type})
+        return result
+
+    def search(self, query, content_types=None, filters=None):
+        from lego.apps.search.models import SearchDocument
+
+        search_query = SearchQuery(query, config=self.search_config)
+        documents = SearchDocument.objects.filter(search_vector=search_query)
+
+        if content_types:
+            documents = documents.filter(content_type__in=content_types)
+        for key, values in (filters or {}).items():
+            documents = documents.filter(filter_terms__overlap=[f'{key}:{v}' for v in values])
+
+        documents = documents.annotate(rank=SearchRank(F('search_vector'), search_query))\
+            .order_by('-rank')[:self.result_size]
+
+        for document in documents:
+            search_index = self.get_search_index(document.content_type)
+            if search_index:
+                yield self._format_result(document, search_index.get_result_fields())
+
+    def autocomplete(self, query, content_types=None):
+        from lego.apps.search.models import SearchDocument
+
+        prefix = AUTOCOMPLETE_SEPARATOR + query.lower()
+        documents = SearchDocument.objects.filter(autocomplete__contains=prefix)
+        if content_types:
+            documents = documents.filter(content_type__in=content_types)
+
+        for document in documents[:self.result_size]:
+            search_index = self.get_search_index(document.content_type)
+            if search_index:
+                result = self._format_result(
+                    document, search_index.get_autocomplete_result_fields()
+                )
+                terms = document.autocomplete.split(AUTOCOMPLETE_SEPARATOR)
+                result['text'] = next(
+                    (term for term in terms if term.startswith(query.lower())), query
+                )
+                yield result
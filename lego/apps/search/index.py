@@ -2,7 +2,7 @@ from django.utils.encoding import force_text
 from elasticsearch.helpers import BulkIndexError
 from structlog import get_logger
 
-from . import backend
+from . import backend, result_cache
 
 log = get_logger()
 
@@ -140,35 +140,30 @@ class SearchIndex:
 
         return prepared_instance
 
+    def prepare_tuple(self, instance):
+        """
+        Prepare an instance in the ('content_type', 'pk', 'data') format used by the bulk
+        operations on the backend.
+        """
+        prepared = self.prepare(instance)
+        return prepared['content_type'], prepared['pk'], prepared['data']
+
     def update(self):
         """
         Updates the entire index.
-        We do this in batch to optimize performance. NB: Requires automatic IDs.
+        We do this in batch to optimize performance, see lego.apps.search.reindex for parallel and
+        resumable updates.
         """
+        from .reindex import chunk_pks
 
-        def batch(queryset, func, chunk=100, start=0):
-            if not queryset.exists():
-                return
-
-            try:
-                while start < queryset.order_by('pk').last().pk:
-                    func(queryset.filter(pk__gt=start, pk__lte=start + chunk).iterator())
-                    start += chunk
-            except TypeError:
-                func(queryset.all().iterator())
-
-        def prepare(result):
-            prepared = self.prepare(result)
-            return prepared['content_type'], prepared['pk'], prepared['data']
-
-        def update_bulk(result_set):
+        queryset = self.get_queryset()
+        for pks in chunk_pks(queryset, chunk_size=500):
             try:
-                self.get_backend().update_many(map(prepare, result_set))
+                instances = queryset.filter(pk__in=pks).iterator()
+                self.get_backend().update_stream(map(self.prepare_tuple, instances))
             except BulkIndexError as e:
                 log.critical(e)
 
-        batch(self.get_queryset(), update_bulk)
-
     def update_instance(self, instance):
         """
         Update a given instance in the index.
@@ -178,6 +173,7 @@ class SearchIndex:
             return
 
         self.get_backend().update(**self.prepare(instance))
+        result_cache.invalidate()
 
     def remove_instance(self, pk):
         """
@@ -189,3 +185,4 @@ class SearchIndex:
         self.get_backend().remove(
             content_type=instance_to_content_type_string(self.get_model()), pk=force_text(pk)
         )
+        result_cache.invalidate()
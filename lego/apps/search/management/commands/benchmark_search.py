@@ -0,0 +1,174 @@
+import json
+import logging
+import random
+import statistics
+import time
+
+from django.utils.module_loading import import_string
+
+from lego.apps.search.index import SearchIndex
+from lego.apps.search.registry import index_registry
+from lego.utils.management_command import BaseCommand
+
+log = logging.getLogger(__name__)
+
+BENCHMARK_CONTENT_TYPE = 'search.benchmark'
+
+BACKENDS = {
+    'elasticsearch': 'lego.apps.search.backends.elasticsearch.ElasticsearchBackend',
+    'postgres': 'lego.apps.search.backends.postgres.PostgresBackend',
+}
+
+
+class BenchmarkIndex(SearchIndex):
+    """
+    Index registered while the benchmark runs, used to format results of the generated documents.
+    """
+
+    result_fields = ('title', 'description')
+    autocomplete_result_fields = ('title', )
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def latency_stats(timings):
+    return {
+        'p50_ms': round(percentile(timings, 50) * 1000, 2),
+        'p95_ms': round(percentile(timings, 95) * 1000, 2),
+        'mean_ms': round(statistics.mean(timings) * 1000, 2),
+    }
+
+
+class Command(BaseCommand):
+
+    help = 'Compare indexing and query latency of the search backends on a generated corpus.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--backend',
+            action='append',
+            dest='backends',
+            help='Backend name or dotted path, defaults to all available backends',
+        )
+        parser.add_argument(
+            '--documents',
+            type=int,
+            default=10000,
+            help='Number of generated documents',
+        )
+        parser.add_argument(
+            '--queries',
+            type=int,
+            default=200,
+            help='Number of search and autocomplete queries',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of documents in each update_many call',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            default=False,
+            help='Print the results as JSON',
+        )
+
+    def generate_corpus(self, documents, rng):
+        vocabulary = [
+            ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(3, 10)))
+            for _ in range(5000)
+        ]
+        corpus = []
+        for pk in range(1, documents + 1):
+            title = ' '.join(rng.choice(vocabulary) for _ in range(3))
+            corpus.append(
+                (
+                    BENCHMARK_CONTENT_TYPE, str(pk), {
+                        'autocomplete': title,
+                        'filters': {
+                            'group': [str(rng.randint(1, 10))]
+                        },
+                        'fields': {
+                            'title': title,
+                            'description': ' '.join(rng.choice(vocabulary) for _ in range(50)),
+                        }
+                    }
+                )
+            )
+        return corpus, vocabulary
+
+    def run_backend(self, search_backend, corpus, vocabulary, options):
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+
+        start_time = time.time()
+        for offset in range(0, len(corpus), batch_size):
+            search_backend.update_many(
+                # Backends may modify the data dicts
+                [(ct, pk, dict(data)) for ct, pk, data in corpus[offset:offset + batch_size]]
+            )
+        search_backend.refresh()
+        index_seconds = time.time() - start_time
+
+        search_timings = []
+        autocomplete_timings = []
+        for _ in range(options['queries']):
+            query = rng.choice(vocabulary)
+
+            start_time = time.time()
+            list(search_backend.search(query))
+            search_timings.append(time.time() - start_time)
+
+            start_time = time.time()
+            list(search_backend.autocomplete(query[:3], [BENCHMARK_CONTENT_TYPE]))
+            autocomplete_timings.append(time.time() - start_time)
+
+        search_backend.remove_many([(ct, pk) for ct, pk, _ in corpus])
+
+        return {
+            'backend': search_backend.name,
+            'documents': len(corpus),
+            'index_seconds': round(index_seconds, 2),
+            'docs_per_second': round(len(corpus) / index_seconds, 2),
+            'search': latency_stats(search_timings),
+            'autocomplete': latency_stats(autocomplete_timings),
+        }
+
+    def run(self, *args, **options):
+        backends = options['backends'] or list(BACKENDS.keys())
+        corpus, vocabulary = self.generate_corpus(
+            options['documents'], random.Random(options['seed'])
+        )
+
+        index_registry[BENCHMARK_CONTENT_TYPE] = BenchmarkIndex()
+        results = []
+        try:
+            for backend_path in backends:
+                search_backend = import_string(BACKENDS.get(backend_path, backend_path))()
+                search_backend.set_up()
+
+                log.info(f'Benchmarking the {search_backend.name} backend')
+                result = self.run_backend(search_backend, corpus, vocabulary, options)
+                log.info(
+                    f'Indexed {result["documents"]} documents at {result["docs_per_second"]} '
+                    f'docs/sec, search p95 {result["search"]["p95_ms"]} ms, '
+                    f'autocomplete p95 {result["autocomplete"]["p95_ms"]} ms'
+                )
+                results.append(result)
+        finally:
+            index_registry.pop(BENCHMARK_CONTENT_TYPE)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results))
+
+        log.info('Done!')
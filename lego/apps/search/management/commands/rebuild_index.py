@@ -1,7 +1,8 @@
 import logging
 
-from lego.apps.search import backend
+from lego.apps.search import backend, result_cache
 from lego.apps.search.registry import index_registry
+from lego.apps.search.reindex import Reindexer
 from lego.utils.management_command import BaseCommand
 
 log = logging.getLogger(__name__)
@@ -17,8 +18,12 @@ class Command(BaseCommand):
         log.info(f'Using the {search_backend.name} backend...')
         log.info('Clearing indexes')
         search_backend.clear()
+        result_cache.invalidate()
         log.info('Cleared all indexes')
-        for content_type, index in index_registry.items():
+        for content_type in index_registry.keys():
             log.info(f'Rebuilding the {content_type} index')
-            index.update()
+            result = Reindexer(content_type).run()
+            log.info(
+                f'Indexed {result["documents"]} documents, {result["docs_per_second"]} docs/sec'
+            )
         log.info('Done!')
@@ -0,0 +1,102 @@
+import json
+import logging
+
+from django.utils.dateparse import parse_datetime
+
+from lego.apps.search.registry import index_registry
+from lego.apps.search.reindex import Reindexer, get_last_run
+from lego.utils.management_command import BaseCommand
+
+log = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+
+    help = 'Incremental and resumable reindex of the search indexes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--content-type',
+            action='append',
+            dest='content_types',
+            help='Only reindex the given content types, like events.event',
+        )
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=1,
+            help='Index the chunks using a pool of worker processes',
+        )
+        parser.add_argument(
+            '--celery',
+            action='store_true',
+            default=False,
+            help='Index the chunks using Celery workers',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Number of instances in each chunk',
+        )
+        parser.add_argument(
+            '--since',
+            help='Only index instances updated after this ISO 8601 timestamp',
+        )
+        parser.add_argument(
+            '--changed',
+            action='store_true',
+            default=False,
+            help='Only index instances updated after the last completed reindex',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            default=False,
+            help='Continue from the high-water mark of an interrupted reindex',
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            default=False,
+            help='Print the throughput of each index as JSON',
+        )
+
+    def run(self, *args, **options):
+        since = None
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                raise ValueError(f'Invalid timestamp {options["since"]}')
+
+        content_types = options['content_types'] or list(index_registry.keys())
+        results = []
+
+        for content_type in content_types:
+            if content_type not in index_registry:
+                log.warning(f'No search index registered for {content_type}')
+                continue
+
+            index_since = since
+            if options['changed']:
+                index_since = get_last_run(content_type)
+
+            log.info(f'Reindexing the {content_type} index')
+            result = Reindexer(
+                content_type, chunk_size=options['chunk_size'], since=index_since,
+                resume=options['resume'], processes=options['processes'],
+                use_celery=options['celery']
+            ).run()
+            if 'queued' in result:
+                log.info(f'Queued {result["queued"]} documents in {result["seconds"]} seconds')
+            else:
+                log.info(
+                    f'Indexed {result["documents"]} documents in {result["seconds"]} seconds, '
+                    f'{result["docs_per_second"]} docs/sec'
+                )
+            results.append(result)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results))
+
+        log.info('Done!')
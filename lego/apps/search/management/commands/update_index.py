@@ -2,6 +2,7 @@ import logging
 
 from lego.apps.search import backend
 from lego.apps.search.registry import index_registry
+from lego.apps.search.reindex import Reindexer
 from lego.utils.management_command import BaseCommand
 
 log = logging.getLogger(__name__)
@@ -15,7 +16,10 @@ class Command(BaseCommand):
         log.info('Updating indexes')
         search_backend = backend.current_backend
         log.info(f'Using the {search_backend.name} backend...')
-        for content_type, index in index_registry.items():
+        for content_type in index_registry.keys():
             log.info(f'Updating the {content_type} index')
-            index.update()
+            result = Reindexer(content_type).run()
+            log.info(
+                f'Indexed {result["documents"]} documents, {result["docs_per_second"]} docs/sec'
+            )
         log.info('Done!')
@@ -0,0 +1,45 @@
+import django.contrib.postgres.fields
+import django.contrib.postgres.fields.jsonb
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('identifier', models.CharField(max_length=128, primary_key=True, serialize=False)),
+                ('content_type', models.CharField(db_index=True, max_length=64)),
+                ('object_id', models.CharField(max_length=64)),
+                ('fields', django.contrib.postgres.fields.jsonb.JSONField(default=dict)),
+                (
+                    'filter_terms',
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.CharField(max_length=255), default=list, size=None
+                    )
+                ),
+                ('autocomplete', models.TextField(blank=True)),
+                ('text', models.TextField(blank=True)),
+                ('search_vector', django.contrib.postgres.search.SearchVectorField(null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='searchdocument',
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=['search_vector'], name='search_document_vector'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='searchdocument',
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=['filter_terms'], name='search_document_filters'
+            ),
+        ),
+    ]
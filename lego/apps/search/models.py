@@ -0,0 +1,26 @@
+from django.contrib.postgres.fields import ArrayField, JSONField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models
+
+
+class SearchDocument(models.Model):
+    """
+    Document stored by the Postgres search backend. The identifier has the same
+    `content_type-pk` format as the Elasticsearch document ids.
+    """
+
+    identifier = models.CharField(max_length=128, primary_key=True)
+    content_type = models.CharField(max_length=64, db_index=True)
+    object_id = models.CharField(max_length=64)
+    fields = JSONField(default=dict)
+    filter_terms = ArrayField(models.CharField(max_length=255), default=list)
+    autocomplete = models.TextField(blank=True)
+    text = models.TextField(blank=True)
+    search_vector = SearchVectorField(null=True)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='search_document_vector'),
+            GinIndex(fields=['filter_terms'], name='search_document_filters'),
+        ]
@@ -1,19 +1,20 @@
-from django.core.exceptions import ObjectDoesNotExist
-
-from lego.apps.permissions.constants import VIEW
+from lego.apps.permissions.utils import get_permission_handler
 from lego.utils.content_types import string_to_model_cls
 
 
-def has_permission(content_type, pk, user):
+def filter_hits(hits, user):
     """
-    Check permissions on a given content_type and pk.
+    Remove the hits the user isn't allowed to view. Visibility is resolved with one query per
+    content type, the order of the hits is kept.
     """
-    model = string_to_model_cls(content_type)
+    pks_by_content_type = {}
+    for hit in hits:
+        pks_by_content_type.setdefault(hit['content_type'], set()).add(hit['id'])
 
-    try:
-        instance = model.objects.get(pk=pk)
-        return user.has_perm(VIEW, instance)
-    except ObjectDoesNotExist:
-        pass
+    visible = {}
+    for content_type, pks in pks_by_content_type.items():
+        model = string_to_model_cls(content_type)
+        handler = get_permission_handler(model)
+        visible[content_type] = {str(pk) for pk in handler.filter_visible(user, model, pks)}
 
-    return False
+    return [hit for hit in hits if str(hit['id']) in visible[hit['content_type']]]
@@ -0,0 +1,188 @@
+import multiprocessing
+import time
+
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections
+from django.utils import timezone
+from structlog import get_logger
+
+from . import backend, result_cache
+from .registry import get_content_type_index
+
+log = get_logger()
+
+HIGH_WATER_MARK_KEY = 'search_reindex_high_water_mark_'
+LAST_RUN_KEY = 'search_reindex_last_run_'
+
+
+def get_high_water_mark(content_type):
+    """
+    Return the progress of an unfinished reindex, a dict with the last indexed pk and the `since`
+    timestamp used by the run. Returns None if no reindex is in progress.
+    """
+    return cache.get(f'{HIGH_WATER_MARK_KEY}{content_type}')
+
+
+def set_high_water_mark(content_type, pk, since):
+    cache.set(f'{HIGH_WATER_MARK_KEY}{content_type}', {'pk': pk, 'since': since}, timeout=None)
+
+
+def clear_high_water_mark(content_type):
+    cache.delete(f'{HIGH_WATER_MARK_KEY}{content_type}')
+
+
+def get_last_run(content_type):
+    """
+    Return the start time of the last completed reindex of a content_type.
+    """
+    return cache.get(f'{LAST_RUN_KEY}{content_type}')
+
+
+def chunk_pks(queryset, chunk_size, start=None):
+    """
+    Yield the primary keys of a queryset in ascending chunks. Uses keyset pagination, every chunk
+    is one query regardless of gaps in the pk sequence.
+    """
+    queryset = queryset.order_by('pk').values_list('pk', flat=True)
+    while True:
+        chunk_queryset = queryset if start is None else queryset.filter(pk__gt=start)
+        pks = list(chunk_queryset[:chunk_size])
+        if not pks:
+            return
+        yield pks
+        start = pks[-1]
+
+
+def index_chunk(content_type, pks):
+    """
+    Index a chunk of instances. Returns the number of indexed documents.
+    """
+    index = get_content_type_index(content_type)
+    instances = index.get_queryset().filter(pk__in=pks).iterator()
+    indexed = index.get_backend().update_stream(map(index.prepare_tuple, instances))
+    result_cache.invalidate()
+    return indexed
+
+
+def _init_worker():
+    """
+    Forked workers can't share database or search connections with the parent process.
+    """
+    connections.close_all()
+    backend.current_backend.set_up()
+
+
+def _index_chunk_worker(args):
+    content_type, pks = args
+    return pks[-1], index_chunk(content_type, pks)
+
+
+class Reindexer:
+    """
+    Reindex a search index in chunks of primary keys.
+
+    * The chunks are indexed in this process, by a pool of worker processes or by Celery.
+    * Progress is recorded as a high-water mark, the last pk where every chunk up to it is done.
+      An interrupted run continues from the mark when `resume` is set. Chunks queued on Celery
+      may still fail, so queueing neither moves the mark nor counts as a completed run.
+    * Set `since` to only index instances with `updated_at` after the timestamp. Indexes without
+      the field are reindexed fully.
+    """
+
+    def __init__(
+        self, content_type, chunk_size=500, since=None, resume=False, processes=1, use_celery=False
+    ):
+        self.content_type = content_type
+        self.index = get_content_type_index(content_type)
+        self.chunk_size = chunk_size
+        self.since = since
+        self.resume = resume
+        self.processes = processes
+        self.use_celery = use_celery
+
+    def get_queryset(self):
+        queryset = self.index.get_queryset()
+        if self.since is None:
+            return queryset
+        try:
+            queryset.model._meta.get_field('updated_at')
+        except FieldDoesNotExist:
+            log.info('search_reindex_missing_updated_at', content_type=self.content_type)
+            return queryset
+        return queryset.filter(updated_at__gte=self.since)
+
+    def get_start(self):
+        if not self.resume:
+            return None
+        high_water_mark = get_high_water_mark(self.content_type)
+        if high_water_mark and high_water_mark['since'] == self.since:
+            log.info('search_reindex_resume', content_type=self.content_type, **high_water_mark)
+            return high_water_mark['pk']
+        return None
+
+    def _run_inline(self, chunks):
+        for pks in chunks:
+            yield pks[-1], index_chunk(self.content_type, pks)
+
+    def _run_pool(self, chunks):
+        # The pool consumes the chunks from another thread, resolve them before forking.
+        chunks = list(chunks)
+        connections.close_all()
+        with multiprocessing.Pool(self.processes, initializer=_init_worker) as pool:
+            # imap keeps the chunk order, which lets us move the high-water mark forward.
+            yield from pool.imap(_index_chunk_worker, ((self.content_type, pks) for pks in chunks))
+
+    def queue(self, chunks, start_time):
+        """
+        Queue the chunks as Celery tasks. Returns a dict with the number of queued documents.
+        """
+        from .tasks import reindex_chunk
+
+        queued = 0
+        for pks in chunks:
+            reindex_chunk.delay(self.content_type, pks)
+            queued += len(pks)
+
+        stats = {
+            'content_type': self.content_type,
+            'queued': queued,
+            'seconds': round(time.time() - start_time, 2),
+        }
+        log.info('search_reindex_queued', **stats)
+        return stats
+
+    def run(self):
+        """
+        Run the reindex. Returns a dict with the number of documents and the throughput, or the
+        number of queued documents when the chunks are indexed by Celery.
+        """
+        started_at = timezone.now()
+        start_time = time.time()
+        chunks = chunk_pks(self.get_queryset(), self.chunk_size, self.get_start())
+
+        if self.use_celery:
+            return self.queue(chunks, start_time)
+
+        if self.processes > 1:
+            results = self._run_pool(chunks)
+        else:
+            results = self._run_inline(chunks)
+
+        documents = 0
+        for last_pk, indexed in results:
+            documents += indexed
+            set_high_water_mark(self.content_type, last_pk, self.since)
+
+        clear_high_water_mark(self.content_type)
+        cache.set(f'{LAST_RUN_KEY}{self.content_type}', started_at, timeout=None)
+
+        seconds = time.time() - start_time
+        stats = {
+            'content_type': self.content_type,
+            'documents': documents,
+            'seconds': round(seconds, 2),
+            'docs_per_second': round(documents / seconds, 2) if seconds else documents,
+        }
+        log.info('search_reindex_done', **stats)
+        return stats
@@ -0,0 +1,56 @@
+"""
+Short lived cache of search and autocomplete results.
+
+The cached results are the raw backend results, before permission filtering, so the entries are
+shared between users. Entries are keyed by a version stored in the cache, the version is bumped
+every time the index is changed.
+"""
+import hashlib
+import json
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+
+RESULT_CACHE_KEY = 'search_result_'
+VERSION_CACHE_KEY = 'search_result_version'
+
+
+def _version():
+    return cache.get_or_set(VERSION_CACHE_KEY, uuid4().hex, timeout=None)
+
+
+def _key(kind, query, content_types, filters):
+    normalized = {
+        'query': ' '.join(query.lower().split()),
+        'content_types': sorted(content_types or []),
+        'filters': {key: sorted(map(str, values))
+                    for key, values in (filters or {}).items()},
+    }
+    digest = hashlib.sha1(json.dumps(normalized, sort_keys=True).encode()).hexdigest()
+    return f'{RESULT_CACHE_KEY}{_version()}_{kind}_{digest}'
+
+
+def get_or_search(kind, search_function, query, content_types=None, filters=None):
+    """
+    Return cached results for a query, or run `search_function` and cache the results for
+    SEARCH_RESULT_CACHE_TIMEOUT seconds. Queries differing only in case and whitespace share
+    the same entry.
+    """
+    if not settings.SEARCH_RESULT_CACHE:
+        return list(search_function())
+
+    key = _key(kind, query, content_types, filters)
+    result = cache.get(key)
+    if result is None:
+        result = list(search_function())
+        cache.set(key, result, timeout=settings.SEARCH_RESULT_CACHE_TIMEOUT)
+    return result
+
+
+def invalidate():
+    """
+    Invalidate every cached result. Called by the code paths writing to the search backend.
+    """
+    if settings.SEARCH_RESULT_CACHE:
+        cache.set(VERSION_CACHE_KEY, uuid4().hex, timeout=None)
@@ -1,16 +1,15 @@
 from lego.apps.stats.utils import track
 
 from . import backend
-from .permissions import has_permission
+from .permissions import filter_hits
+from .result_cache import get_or_search
 
 
 def autocomplete(query, types, user):
-    result = backend.current_backend.autocomplete(query, types)
-
-    def permission_check(hit):
-        return has_permission(hit['content_type'], hit['id'], user)
-
-    result = list(filter(permission_check, result))
+    hits = get_or_search(
+        'autocomplete', lambda: backend.current_backend.autocomplete(query, types), query, types
+    )
+    result = filter_hits(hits, user)
 
     track(
         user,
@@ -25,12 +24,11 @@ def autocomplete(query, types, user):
 
 
 def search(query, types, filters, user):
-    result = backend.current_backend.search(query, types, filters)
-
-    def permission_check(hit):
-        return has_permission(hit['content_type'], hit['id'], user)
-
-    result = list(filter(permission_check, result))
+    hits = get_or_search(
+        'search', lambda: backend.current_backend.search(query, types, filters), query, types,
+        filters
+    )
+    result = filter_hits(hits, user)
 
     track(
         user,
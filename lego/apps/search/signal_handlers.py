@@ -1,7 +1,10 @@
+from django.db import transaction
+
 from lego.utils.content_types import instance_to_string
 
 from .registry import get_model_index
 from .tasks import instance_delete, instance_update
+from .update_queue import mark_dirty
 
 
 class BaseSignalHandler:
@@ -32,3 +35,19 @@ class AsyncSignalHandler(BaseSignalHandler):
         identifier = instance_to_string(instance)
         if identifier and get_model_index(instance):
             instance_delete.delay(identifier)
+
+
+class QueuedSignalHandler(BaseSignalHandler):
+    """
+    This handler adds changed instances to the coalescing update queue. Saves and deletes are
+    treated the same way, the queue flusher removes instances that no longer exist in the index
+    queryset.
+    """
+
+    def on_save(self, instance):
+        identifier = instance_to_string(instance)
+        if identifier and get_model_index(instance):
+            transaction.on_commit(lambda: mark_dirty(identifier))
+
+    def on_delete(self, instance):
+        self.on_save(instance)
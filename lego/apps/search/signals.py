@@ -1,9 +1,9 @@
 from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
-from .signal_handlers import AsyncSignalHandler
+from .signal_handlers import QueuedSignalHandler
 
-signal_handler = AsyncSignalHandler()
+signal_handler = QueuedSignalHandler()
 
 
 @receiver(post_save)
@@ -1,4 +1,6 @@
+from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
+from elasticsearch import ElasticsearchException
 from structlog import get_logger
 
 from lego import celery_app
@@ -6,6 +8,7 @@ from lego.utils.content_types import string_to_instance
 from lego.utils.tasks import AbakusTask
 
 from .registry import get_content_type_index, get_model_index
+from .reindex import index_chunk
 
 log = get_logger()
 
@@ -38,3 +41,29 @@ def instance_update(self, identifier, logger_context=None):
         # object gets removed from our index.
         log.warn('search_update_non_existing_instance', identifier=identifier)
         instance_delete.delay(identifier)
+
+
+@celery_app.task(serializer='json', bind=True, base=AbakusTask, default_retry_delay=30)
+def reindex_chunk(self, content_type, pks, logger_context=None):
+    """
+    Index a chunk of instances, used by the reindex management command.
+    """
+    self.setup_logger(logger_context)
+
+    try:
+        indexed = index_chunk(content_type, pks)
+        log.info('search_reindex_chunk_done', content_type=content_type, documents=indexed)
+    except ElasticsearchException as e:
+        raise self.retry(exc=e, max_retries=3)
+
+
+@celery_app.task(serializer='json', bind=True, base=AbakusTask)
+def flush_index_updates(self, logger_context=None):
+    """
+    Flush the coalesced index update queue, see lego.apps.search.update_queue.
+    """
+    from .update_queue import FLUSH_QUEUED_KEY, flush
+
+    self.setup_logger(logger_context)
+    cache.delete(FLUSH_QUEUED_KEY)
+    flush()
@@ -0,0 +1,72 @@
+from lego.apps.search.backends.postgres import PostgresBackend
+from lego.apps.search.models import SearchDocument
+from lego.utils.test_utils import BaseTestCase
+
+
+def article(pk, title, tags=None):
+    data = {
+        'fields': {
+            'title': title,
+            'description': f'{title} description'
+        },
+        'filters': {
+            'tags': tags or []
+        },
+        'autocomplete': title,
+    }
+    return 'articles.article', str(pk), data
+
+
+class PostgresBackendTestCase(BaseTestCase):
+    def setUp(self):
+        self.backend = PostgresBackend()
+        self.backend.update_many(
+            [
+                article(1, 'Bedriftspresentasjon', tags=['bedpres']),
+                article(2, 'Kurs i Python', tags=['kurs']),
+                article(3, 'Python bedpres', tags=['bedpres', 'kurs']),
+            ]
+        )
+
+    def search(self, query, **kwargs):
+        return sorted(result['id'] for result in self.backend.search(query, **kwargs))
+
+    def test_update_many_replaces_documents(self):
+        self.backend.update_many([article(2, 'Kurs i Django')])
+
+        self.assertEqual(SearchDocument.objects.count(), 3)
+        self.assertEqual(self.search('python'), ['3'])
+        self.assertEqual(self.search('django'), ['2'])
+
+    def test_remove_many(self):
+        self.backend.remove_many([('articles.article', '3'), ('articles.article', '4')])
+
+        self.assertEqual(self.search('python'), ['2'])
+
+    def test_search(self):
+        results = list(self.backend.search('bedriftspresentasjon'))
+
+        self.assertEqual(len(results), 1)
+        self.assertEqual(
+            results[0], {
+                'id': '1',
+                'content_type': 'articles.article',
+                'title': 'Bedriftspresentasjon',
+                'description': 'Bedriftspresentasjon description',
+            }
+        )
+
+    def test_search_filters(self):
+        self.assertEqual(self.search('python', filters={'tags': ['bedpres']}), ['3'])
+        self.assertEqual(self.search('python', content_types=['events.event']), [])
+        self.assertEqual(self.search('python', content_types=['articles.article']), ['2', '3'])
+
+    def test_autocomplete(self):
+        results = list(self.backend.autocomplete('pyth'))
+
+        self.assertEqual([result['id'] for result in results], ['3'])
+        self.assertEqual(results[0]['text'], 'python bedpres')
+        self.assertEqual(results[0]['title'], 'Python bedpres')
+        self.assertEqual(
+            list(self.backend.autocomplete('pyth', content_types=['events.event'])), []
+        )
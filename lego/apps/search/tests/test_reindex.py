@@ -0,0 +1,126 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from lego.apps.articles.models import Article
+from lego.apps.search import reindex
+from lego.apps.users.models import AbakusGroup
+from lego.utils.test_utils import BaseTestCase
+
+CONTENT_TYPE = 'users.abakusgroup'
+
+
+class ChunkPksTestCase(BaseTestCase):
+    fixtures = ['test_abakus_groups.yaml']
+
+    def setUp(self):
+        # Leave gaps in the pk sequence.
+        AbakusGroup.objects.filter(pk__in=[3, 4, 7]).delete()
+        self.pks = sorted(AbakusGroup.objects.values_list('pk', flat=True))
+
+    def test_chunks_neither_overlap_nor_skip(self):
+        chunks = list(reindex.chunk_pks(AbakusGroup.objects.all(), chunk_size=3))
+
+        self.assertEqual([pk for chunk in chunks for pk in chunk], self.pks)
+        self.assertTrue(all(len(chunk) <= 3 for chunk in chunks))
+        self.assertTrue(all(len(chunk) == 3 for chunk in chunks[:-1]))
+
+    def test_start(self):
+        chunks = list(reindex.chunk_pks(AbakusGroup.objects.all(), chunk_size=3, start=self.pks[4]))
+
+        self.assertEqual([pk for chunk in chunks for pk in chunk], self.pks[5:])
+
+
+class ReindexTestCase(BaseTestCase):
+    """
+    Records the pks indexed through a mocked backend.
+    """
+
+    def setUp(self):
+        self.pks = sorted(AbakusGroup.objects.values_list('pk', flat=True))
+        self.indexed = []
+        self.backend = mock.Mock()
+        self.backend.update_stream.side_effect = self.update_stream
+        patcher = mock.patch('lego.apps.search.backend.current_backend', self.backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for content_type in [CONTENT_TYPE, 'articles.article']:
+            reindex.clear_high_water_mark(content_type)
+            cache.delete(f'{reindex.LAST_RUN_KEY}{content_type}')
+
+    def update_stream(self, tuples):
+        pks = [int(pk) for content_type, pk, data in tuples]
+        self.indexed += pks
+        return len(pks)
+
+
+class ReindexerTestCase(ReindexTestCase):
+    fixtures = ['test_abakus_groups.yaml']
+
+    def test_run(self):
+        stats = reindex.Reindexer(CONTENT_TYPE, chunk_size=3).run()
+
+        self.assertEqual(stats['documents'], len(self.pks))
+        self.assertEqual(sorted(self.indexed), self.pks)
+        self.assertIsNone(reindex.get_high_water_mark(CONTENT_TYPE))
+        self.assertIsNotNone(reindex.get_last_run(CONTENT_TYPE))
+
+    def test_resume_continues_from_the_high_water_mark(self):
+        def fail_on_third_chunk(tuples):
+            if len(self.indexed) == 6:
+                raise ConnectionError
+            return self.update_stream(tuples)
+
+        self.backend.update_stream.side_effect = fail_on_third_chunk
+        with self.assertRaises(ConnectionError):
+            reindex.Reindexer(CONTENT_TYPE, chunk_size=3).run()
+        mark = reindex.get_high_water_mark(CONTENT_TYPE)
+        self.assertEqual(mark, {'pk': self.pks[5], 'since': None})
+
+        self.indexed = []
+        self.backend.update_stream.side_effect = self.update_stream
+        reindex.Reindexer(CONTENT_TYPE, chunk_size=3, resume=True).run()
+
+        self.assertEqual(sorted(self.indexed), self.pks[6:])
+        self.assertIsNone(reindex.get_high_water_mark(CONTENT_TYPE))
+
+    def test_resume_ignores_mark_of_another_since(self):
+        reindex.set_high_water_mark(CONTENT_TYPE, self.pks[5], None)
+
+        reindex.Reindexer(
+            CONTENT_TYPE, chunk_size=3, resume=True, since=timezone.now() - timedelta(days=1)
+        ).run()
+
+        self.assertEqual(sorted(self.indexed), self.pks)
+
+    @mock.patch('lego.apps.search.tasks.reindex_chunk.delay')
+    def test_celery_leaves_the_mark_and_last_run(self, mock_delay):
+        reindex.set_high_water_mark(CONTENT_TYPE, self.pks[2], None)
+
+        stats = reindex.Reindexer(CONTENT_TYPE, chunk_size=3, resume=True, use_celery=True).run()
+
+        self.assertEqual(stats['queued'], len(self.pks) - 3)
+        self.assertEqual(
+            [pk for call in mock_delay.call_args_list for pk in call[0][1]], self.pks[3:]
+        )
+        mark = reindex.get_high_water_mark(CONTENT_TYPE)
+        self.assertEqual(mark, {'pk': self.pks[2], 'since': None})
+        self.assertIsNone(reindex.get_last_run(CONTENT_TYPE))
+
+    def test_since_without_updated_at(self):
+        reindex.Reindexer(CONTENT_TYPE, since=timezone.now()).run()
+
+        self.assertEqual(sorted(self.indexed), self.pks)
+
+
+class ReindexSinceTestCase(ReindexTestCase):
+    fixtures = ['test_abakus_groups.yaml', 'test_users.yaml', 'test_articles.yaml']
+
+    def test_since(self):
+        Article.objects.exclude(pk=1).update(updated_at=timezone.now() - timedelta(days=2))
+
+        reindex.Reindexer('articles.article', since=timezone.now() - timedelta(days=1)).run()
+
+        self.assertEqual(self.indexed, [1])
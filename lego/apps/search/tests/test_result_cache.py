@@ -0,0 +1,94 @@
+from unittest import mock
+
+from django.test import override_settings
+
+from lego.apps.search import result_cache, update_queue
+from lego.apps.search.registry import get_content_type_index
+from lego.apps.users.models import AbakusGroup
+from lego.utils.test_utils import BaseTestCase
+
+
+@override_settings(SEARCH_RESULT_CACHE=True)
+class ResultCacheTestCase(BaseTestCase):
+    def setUp(self):
+        result_cache.invalidate()
+        self.search_function = mock.Mock(return_value=[{'id': 1}])
+
+    def get_or_search(self, query, **kwargs):
+        return result_cache.get_or_search('search', self.search_function, query, **kwargs)
+
+    def test_hit(self):
+        self.assertEqual(self.get_or_search('webkom'), [{'id': 1}])
+        self.assertEqual(self.get_or_search('webkom'), [{'id': 1}])
+
+        self.search_function.assert_called_once_with()
+
+    def test_key_normalization(self):
+        self.get_or_search(
+            'Webkom  Abakus', content_types=['users.user', 'events.event'],
+            filters={'tags': ['b', 'a']}
+        )
+        self.get_or_search(
+            ' webkom abakus', content_types=['events.event', 'users.user'],
+            filters={'tags': ['a', 'b']}
+        )
+
+        self.search_function.assert_called_once_with()
+
+    def test_different_queries_are_cached_separately(self):
+        self.get_or_search('webkom')
+        self.get_or_search('webkom', content_types=['users.user'])
+        self.get_or_search('webkom', filters={'tags': ['a']})
+        result_cache.get_or_search('autocomplete', self.search_function, 'webkom')
+
+        self.assertEqual(self.search_function.call_count, 4)
+
+    def test_invalidate(self):
+        self.get_or_search('webkom')
+        result_cache.invalidate()
+        self.get_or_search('webkom')
+
+        self.assertEqual(self.search_function.call_count, 2)
+
+    @override_settings(SEARCH_RESULT_CACHE=False)
+    def test_disabled(self):
+        self.get_or_search('webkom')
+        self.get_or_search('webkom')
+
+        self.assertEqual(self.search_function.call_count, 2)
+
+
+@override_settings(SEARCH_RESULT_CACHE=True)
+@mock.patch('lego.apps.search.backend.current_backend')
+class ResultCacheInvalidationTestCase(BaseTestCase):
+    fixtures = ['test_abakus_groups.yaml']
+
+    def setUp(self):
+        update_queue._redis().delete(update_queue.DIRTY_SET_KEY)
+        result_cache.invalidate()
+        self.search_function = mock.Mock(return_value=[])
+        self.get_or_search()
+
+    def get_or_search(self):
+        return result_cache.get_or_search('search', self.search_function, 'webkom')
+
+    def test_index_update_invalidates(self, current_backend):
+        index = get_content_type_index('users.abakusgroup')
+        index.update_instance(AbakusGroup.objects.get(name='Webkom'))
+        self.get_or_search()
+
+        self.assertEqual(self.search_function.call_count, 2)
+
+    def test_index_removal_invalidates(self, current_backend):
+        get_content_type_index('users.abakusgroup').remove_instance(1)
+        self.get_or_search()
+
+        self.assertEqual(self.search_function.call_count, 2)
+
+    def test_update_queue_flush_invalidates(self, current_backend):
+        with mock.patch('lego.apps.search.tasks.flush_index_updates'):
+            update_queue.mark_dirty('users.abakusgroup-1')
+        update_queue.flush()
+        self.get_or_search()
+
+        self.assertEqual(self.search_function.call_count, 2)
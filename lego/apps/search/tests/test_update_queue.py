@@ -0,0 +1,75 @@
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import override_settings
+
+from lego.apps.search import update_queue
+from lego.utils.test_utils import BaseTestCase
+
+
+@mock.patch('lego.apps.search.tasks.flush_index_updates')
+class MarkDirtyTestCase(BaseTestCase):
+    def setUp(self):
+        update_queue._redis().delete(update_queue.DIRTY_SET_KEY)
+        cache.delete_many([update_queue.FLUSH_SCHEDULED_KEY, update_queue.FLUSH_QUEUED_KEY])
+
+    def test_saves_are_coalesced(self, flush_task):
+        for _ in range(3):
+            update_queue.mark_dirty('articles.article-1')
+
+        self.assertEqual(update_queue.pop_dirty(10), {'articles.article-1'})
+        flush_task.apply_async.assert_called_once_with(countdown=settings.SEARCH_UPDATE_QUEUE_DELAY)
+        flush_task.delay.assert_not_called()
+
+    @override_settings(SEARCH_UPDATE_QUEUE_THRESHOLD=2)
+    def test_immediate_flush_is_queued_once(self, flush_task):
+        for pk in range(5):
+            update_queue.mark_dirty(f'articles.article-{pk}')
+
+        flush_task.delay.assert_called_once_with()
+
+    def test_pop_dirty(self, flush_task):
+        for pk in range(3):
+            update_queue.mark_dirty(f'articles.article-{pk}')
+
+        first = update_queue.pop_dirty(2)
+        rest = update_queue.pop_dirty(2)
+
+        self.assertEqual(len(first), 2)
+        self.assertEqual(first | rest, {f'articles.article-{pk}' for pk in range(3)})
+        self.assertEqual(update_queue.pop_dirty(2), set())
+
+
+@mock.patch('lego.apps.search.tasks.flush_index_updates')
+class FlushTestCase(BaseTestCase):
+    fixtures = ['test_abakus_groups.yaml', 'test_users.yaml', 'test_articles.yaml']
+
+    def setUp(self):
+        update_queue._redis().delete(update_queue.DIRTY_SET_KEY)
+        self.backend = mock.Mock()
+        patcher = mock.patch('lego.apps.search.backend.current_backend', self.backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_updates_and_removals(self, flush_task):
+        update_queue.mark_dirty('articles.article-1')
+        update_queue.mark_dirty('articles.article-404')
+
+        self.assertEqual(update_queue.flush(), (1, 1))
+
+        updates = self.backend.update_many.call_args[0][0]
+        self.assertEqual(
+            [(content_type, pk) for content_type, pk, data in updates], [('articles.article', '1')]
+        )
+        self.backend.remove_many.assert_called_once_with([('articles.article', '404')])
+        self.assertEqual(update_queue.pop_dirty(10), set())
+
+    def test_failed_flush_is_requeued(self, flush_task):
+        self.backend.update_many.side_effect = ConnectionError
+        update_queue.mark_dirty('articles.article-1')
+
+        with self.assertRaises(ConnectionError):
+            update_queue.flush()
+
+        self.assertEqual(update_queue.pop_dirty(10), {'articles.article-1'})
@@ -0,0 +1,102 @@
+from django.conf import settings
+from django.core.cache import cache
+from django_redis import get_redis_connection
+from structlog import get_logger
+
+from lego.utils.content_types import split_string
+
+from . import backend, result_cache
+from .registry import get_content_type_index
+
+log = get_logger()
+
+DIRTY_SET_KEY = 'search_dirty_identifiers'
+FLUSH_SCHEDULED_KEY = 'search_flush_scheduled'
+FLUSH_QUEUED_KEY = 'search_flush_queued'
+
+
+def _redis():
+    return get_redis_connection('default')
+
+
+def mark_dirty(identifier):
+    """
+    Queue a `content_type-pk` identifier for reindexing. The identifiers are stored in a set, saving
+    the same instance many times results in one update when the queue is flushed.
+
+    The flush is scheduled right away when the queue reaches SEARCH_UPDATE_QUEUE_THRESHOLD items,
+    otherwise it's debounced by SEARCH_UPDATE_QUEUE_DELAY seconds. At most one immediate flush is
+    queued at a time, the task clears the key when it starts.
+    """
+    from .tasks import flush_index_updates
+
+    pipeline = _redis().pipeline()
+    pipeline.sadd(DIRTY_SET_KEY, identifier)
+    pipeline.scard(DIRTY_SET_KEY)
+    _, queued = pipeline.execute()
+
+    if queued >= settings.SEARCH_UPDATE_QUEUE_THRESHOLD:
+        if cache.add(FLUSH_QUEUED_KEY, True, timeout=settings.SEARCH_UPDATE_QUEUE_DELAY):
+            flush_index_updates.delay()
+    elif cache.add(FLUSH_SCHEDULED_KEY, True, timeout=settings.SEARCH_UPDATE_QUEUE_DELAY):
+        flush_index_updates.apply_async(countdown=settings.SEARCH_UPDATE_QUEUE_DELAY)
+
+
+def pop_dirty(count):
+    """
+    Remove and return up to `count` identifiers from the queue.
+    """
+    # redis-py 2.x doesn't expose the count argument of SPOP.
+    identifiers = _redis().execute_command('SPOP', DIRTY_SET_KEY, count) or []
+    return {identifier.decode() for identifier in identifiers}
+
+
+def flush(batch_size=None):
+    """
+    Index every queued identifier. Instances still available in the index queryset are updated,
+    the others are removed. Updates and removals are sent as one bulk request each, for each batch.
+
+    :return: A tuple with the number of updated and removed documents.
+    """
+    batch_size = batch_size or settings.SEARCH_UPDATE_QUEUE_BATCH_SIZE
+    updated = removed = 0
+
+    while True:
+        identifiers = pop_dirty(batch_size)
+        if not identifiers:
+            return updated, removed
+
+        pks_by_content_type = {}
+        for identifier in identifiers:
+            content_type, pk = split_string(identifier)
+            pks_by_content_type.setdefault(content_type, set()).add(pk)
+
+        updates = []
+        removals = []
+        for content_type, pks in pks_by_content_type.items():
+            index = get_content_type_index(content_type)
+            if not index:
+                continue
+
+            found = set()
+            for instance in index.get_queryset().filter(pk__in=pks):
+                found.add(str(instance.pk))
+                if index.should_update(instance):
+                    updates.append(index.prepare_tuple(instance))
+            removals += [(content_type, pk) for pk in pks if pk not in found]
+
+        search_backend = backend.current_backend
+        try:
+            if updates:
+                search_backend.update_many(updates)
+            if removals:
+                search_backend.remove_many(removals)
+        except Exception:
+            # Put the identifiers back, the next flush retries them.
+            _redis().sadd(DIRTY_SET_KEY, *identifiers)
+            raise
+        result_cache.invalidate()
+
+        updated += len(updates)
+        removed += len(removals)
+        log.info('search_update_queue_flushed', updated=len(updates), removed=len(removals))
@@ -0,0 +1 @@
+default_app_config = 'lego.apps.users.apps.UsersConfig'
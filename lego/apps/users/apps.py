@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class UsersConfig(AppConfig):
+    name = 'lego.apps.users'
+    verbose_name = 'Users'
+
+    def ready(self):
+        super().ready()
+        from .signals import membership_changed_callback, abakus_group_changed_callback  # noqa
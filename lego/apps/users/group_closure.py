@@ -0,0 +1,145 @@
+"""
+Materialized "user -> transitive group ids" closure.
+
+Resolving the groups of a user used to require a membership query and a tree walk per membership.
+The closure stores the ids of every group a user is a member of, including all ancestors, in the
+cache. Entries are invalidated per user on membership changes, and the whole closure is
+invalidated on changes to the group tree by bumping a version stored in the cache.
+"""
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+CLOSURE_CACHE_KEY = 'user_group_closure_'
+VERSION_CACHE_KEY = 'user_group_closure_version'
+PARENTS_CACHE_KEY = 'abakus_group_parents_'
+
+
+def _version():
+    return cache.get_or_set(VERSION_CACHE_KEY, uuid4().hex, timeout=None)
+
+
+def get_version():
+    """
+    Current version of the closure, changed whenever a group changes. None when the cache is
+    disabled.
+    """
+    if not settings.GROUP_CLOSURE_CACHE:
+        return None
+    return _version()
+
+
+def _user_key(version, user_id):
+    return f'{CLOSURE_CACHE_KEY}{version}_{user_id}'
+
+
+def _group_parents(version=None):
+    from lego.apps.users.models import AbakusGroup
+
+    if version is None:
+        return dict(AbakusGroup.all_objects.values_list('id', 'parent_id'))
+
+    key = f'{PARENTS_CACHE_KEY}{version}'
+    parents = cache.get(key)
+    if parents is None:
+        parents = dict(AbakusGroup.all_objects.values_list('id', 'parent_id'))
+        cache.set(key, parents, timeout=settings.GROUP_CLOSURE_CACHE_TIMEOUT)
+    return parents
+
+
+def _compute(user_ids, version=None):
+    from lego.apps.users.models import Membership
+
+    parents = _group_parents(version)
+    result = {user_id: set() for user_id in user_ids}
+    memberships = Membership.objects.filter(user_id__in=user_ids, deleted=False, is_active=True)
+
+    for user_id, group_id in memberships.values_list('user_id', 'abakus_group_id'):
+        groups = result[user_id]
+        while group_id is not None and group_id not in groups:
+            groups.add(group_id)
+            group_id = parents.get(group_id)
+
+    return result
+
+
+def get_group_ids_for_users(user_ids):
+    """
+    Resolve the transitive group ids for many users at once. Cached users are fetched with a
+    single cache lookup, and the remaining users are resolved using one membership query.
+
+    :return: A dict mapping every user id to a frozenset of group ids.
+    """
+    user_ids = set(user_ids)
+    if not user_ids:
+        return {}
+
+    if not settings.GROUP_CLOSURE_CACHE:
+        return {user_id: frozenset(group_ids) for user_id, group_ids in _compute(user_ids).items()}
+
+    version = _version()
+    keys = {_user_key(version, user_id): user_id for user_id in user_ids}
+    result = {
+        keys[key]: frozenset(group_ids)
+        for key, group_ids in cache.get_many(list(keys.keys())).items()
+    }
+
+    missing = user_ids - set(result.keys())
+    if missing:
+        computed = _compute(missing, version)
+        cache.set_many(
+            {
+                _user_key(version, user_id): list(group_ids)
+                for user_id, group_ids in computed.items()
+            }, timeout=settings.GROUP_CLOSURE_CACHE_TIMEOUT
+        )
+        result.update({user_id: frozenset(group_ids) for user_id, group_ids in computed.items()})
+
+    return result
+
+
+def get_group_ids(user_id):
+    return get_group_ids_for_users([user_id])[user_id]
+
+
+def prefetch_group_ids(users):
+    """
+    Populate `all_group_ids` on a list of user instances using the bulk API, so loops checking
+    group permissions for many users don't resolve the groups one user at a time.
+    """
+    users = [user for user in users if 'all_group_ids' not in user.__dict__]
+    group_ids = get_group_ids_for_users(user.id for user in users)
+    for user in users:
+        user.__dict__['all_group_ids'] = group_ids[user.id]
+    return users
+
+
+def invalidate_user(user_id):
+    """
+    Remove the closure of a user. The entry is removed right away and once more when the current
+    transaction commits, to avoid caching a value computed from uncommitted state.
+    """
+    if not settings.GROUP_CLOSURE_CACHE:
+        return
+
+    def delete():
+        cache.delete(_user_key(_version(), user_id))
+
+    delete()
+    transaction.on_commit(delete)
+
+
+def invalidate_all():
+    """
+    Invalidate the closure of every user. Called when the group tree changes.
+    """
+    if not settings.GROUP_CLOSURE_CACHE:
+        return
+
+    def bump():
+        cache.set(VERSION_CACHE_KEY, uuid4().hex, timeout=None)
+
+    bump()
+    transaction.on_commit(bump)
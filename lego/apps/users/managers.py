@@ -1,5 +1,5 @@
 from django.contrib.auth.models import UserManager
-from django.db.models import Q
+from django.db.models import Q, Sum
 from django.utils import timezone
 from mptt.managers import TreeManager
 
@@ -48,3 +48,16 @@ class UserPenaltyManager(PersistentModelManager):
         from lego.apps.users.models import Penalty
         offset = Penalty.penalty_offset(timezone.now(), False)
         return super().filter(created_at__gt=timezone.now() - offset)
+
+    def penalties_for_users(self, user_ids):
+        """
+        Sum the weight of the valid penalties of many users using a single query.
+
+        :return: A dict mapping every user id to the total penalty weight.
+        """
+        user_ids = set(user_ids)
+        weights = self.valid().filter(user_id__in=user_ids).order_by().values('user_id')\
+            .annotate(total_weight=Sum('weight')).values_list('user_id', 'total_weight')
+        penalties = {user_id: 0 for user_id in user_ids}
+        penalties.update(weights)
+        return penalties
@@ -1,4 +1,5 @@
 from datetime import timedelta
+from functools import lru_cache
 
 from django.conf import settings
 from django.contrib.auth.models import AbstractBaseUser
@@ -12,8 +13,10 @@ from mptt.models import MPTTModel
 
 from lego.apps.external_sync.models import GSuiteAddress, PasswordHashUser
 from lego.apps.files.models import FileField
+from lego.apps.permissions.keyword import KeywordPermissions, compile_permissions
 from lego.apps.permissions.validators import KeywordPermissionValidator
 from lego.apps.users import constants
+from lego.apps.users.group_closure import get_group_ids
 from lego.apps.users.managers import (
     AbakusGroupManager, AbakusGroupManagerWithoutText, AbakusUserManager, MembershipManager,
     UserPenaltyManager
@@ -21,6 +24,7 @@ from lego.apps.users.managers import (
 from lego.apps.users.permissions import (
     AbakusGroupPermissionHandler, MembershipPermissionHandler, UserPermissionHandler
 )
+from lego.apps.users.recipients import members_of, union
 from lego.utils.models import BasisModel, PersistentModel
 from lego.utils.validators import ReservedNameValidator
 
@@ -139,12 +143,10 @@ class AbakusGroup(MPTTModel, PersistentModel):
         """
         Restricted Mail
         """
-        memberships = self.memberships
-        return [membership.user for membership in memberships], []
+        return self.announcement_lookup(), []
 
     def announcement_lookup(self):
-        memberships = self.memberships
-        return [membership.user for membership in memberships]
+        return list(User.objects.filter(pk__in=union(members_of(self))))
 
 
 class PermissionsMixin(models.Model):
@@ -177,9 +179,17 @@ class PermissionsMixin(models.Model):
     get_group_permissions = DjangoPermissionMixin.get_group_permissions
     get_all_permissions = DjangoPermissionMixin.get_all_permissions
     has_module_perms = DjangoPermissionMixin.has_module_perms
-    has_perms = DjangoPermissionMixin.has_perms
     has_perm = DjangoPermissionMixin.has_perm
 
+    def has_perms(self, perm_list, obj=None):
+        """
+        Keyword permissions are checked in one batch, the backend is only used for object
+        permissions.
+        """
+        if obj is None:
+            return self.is_active and KeywordPermissions.has_perms(self, perm_list)
+        return DjangoPermissionMixin.has_perms(self, perm_list, obj)
+
     class Meta:
         abstract = True
 
@@ -192,20 +202,20 @@ class PermissionsMixin(models.Model):
         )
 
     @cached_property
-    def all_groups(self):
-        groups = set()
-
-        memberships = self.memberships.filter(
-            deleted=False,
-            is_active=True,
-        ).select_related('abakus_group')
+    def all_group_ids(self):
+        """
+        Ids of every group the user is a member of, including ancestors. Resolved through the
+        group closure cache.
+        """
+        return get_group_ids(self.id)
 
-        for membership in memberships:
-            if membership.abakus_group not in groups:
-                groups.add(membership.abakus_group)
-                groups.update(membership.abakus_group.get_ancestors())
+    @cached_property
+    def keyword_permissions(self):
+        return compile_permissions(self.all_group_ids)
 
-        return list(groups)
+    @cached_property
+    def all_groups(self):
+        return list(AbakusGroup.all_objects.filter(id__in=self.all_group_ids).defer('text'))
 
 
 class User(PasswordHashUser, GSuiteAddress, AbstractBaseUser, PersistentModel, PermissionsMixin):
@@ -308,9 +318,7 @@ class User(PasswordHashUser, GSuiteAddress, AbstractBaseUser, PersistentModel, P
 
     def number_of_penalties(self):
         # Returns the total penalty weight for this user
-        count = Penalty.objects.valid().filter(user=self)\
-            .aggregate(models.Sum('weight'))['weight__sum']
-        return count or 0
+        return Penalty.objects.penalties_for_users([self.id])[self.id]
 
     def restricted_lookup(self):
         """
@@ -322,6 +330,25 @@ class User(PasswordHashUser, GSuiteAddress, AbstractBaseUser, PersistentModel, P
         return [self]
 
 
+@lru_cache(maxsize=1024)
+def _penalty_offset_days(start_date, forwards, duration, ignore_summer, ignore_winter):
+    # The settings are part of the arguments so overridden settings aren't served from the cache.
+    remaining_days = duration
+    offset_days = 0
+    multiplier = 1 if forwards else -1
+
+    while remaining_days > 0:
+
+        date_to_check = start_date + (multiplier * timedelta(days=offset_days))
+
+        if not Penalty.ignore_date(date_to_check):
+            remaining_days -= 1
+
+        offset_days += 1
+
+    return offset_days
+
+
 class Penalty(BasisModel):
 
     user = models.ForeignKey(User, related_name='penalties', on_delete=models.CASCADE)
@@ -345,21 +372,16 @@ class Penalty(BasisModel):
 
     @staticmethod
     def penalty_offset(start_date, forwards=True):
-
-        remaining_days = settings.PENALTY_DURATION.days
-        offset_days = 0
-        multiplier = 1 if forwards else -1
-
-        while remaining_days > 0:
-
-            date_to_check = start_date + (multiplier * timedelta(days=offset_days))
-
-            if not Penalty.ignore_date(date_to_check):
-                remaining_days -= 1
-
-            offset_days += 1
-
-        return timedelta(days=offset_days)
+        """
+        The offset only depends on the calendar day and the penalty settings, and is memoized
+        by _penalty_offset_days.
+        """
+        return timedelta(
+            days=_penalty_offset_days(
+                start_date.date(), forwards, settings.PENALTY_DURATION.days,
+                settings.PENALTY_IGNORE_SUMMER, settings.PENALTY_IGNORE_WINTER
+            )
+        )
 
     @staticmethod
     def ignore_date(date):
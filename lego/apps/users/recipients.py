@@ -0,0 +1,169 @@
+"""
+Cached recipient sets.
+
+Feed handlers and message lookups resolve the same follower and group member ids over and over.
+The ids of a source, the followers of a user, event or company, or the members of a group
+including its descendants, are stored in Redis as a set of integers. Redis stores small integer
+sets using the compact intset encoding, and the union of sources is computed by Redis without
+fetching every set.
+
+Follower sets are removed when a follow is created or deleted, group sets are removed when a
+membership in the group or one of its descendants changes. Changes to the group tree invalidate
+every group set by bumping a version stored in the cache.
+"""
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django_redis import get_redis_connection
+
+RECIPIENTS_KEY = 'recipients_'
+GROUP_VERSION_CACHE_KEY = 'recipients_group_version'
+
+# Redis doesn't store empty sets, every set contains this id to tell empty sets from missing ones.
+EMPTY = 0
+
+FOLLOWER_MODELS = {
+    'users.user': 'followers.FollowUser',
+    'events.event': 'followers.FollowEvent',
+    'companies.company': 'followers.FollowCompany',
+}
+
+
+def _redis():
+    return get_redis_connection('default')
+
+
+def _group_version():
+    return cache.get_or_set(GROUP_VERSION_CACHE_KEY, uuid4().hex, timeout=None)
+
+
+class Source:
+    """
+    A set of recipient ids, loaded from the database when the set isn't cached.
+    """
+
+    def key(self):
+        raise NotImplementedError
+
+    def load(self):
+        raise NotImplementedError
+
+
+class Followers(Source):
+    def __init__(self, target):
+        self.label = target._meta.label_lower
+        self.target_id = target.pk
+
+    def key(self):
+        return f'{RECIPIENTS_KEY}followers_{self.label}_{self.target_id}'
+
+    def load(self):
+        from django.apps import apps
+        model = apps.get_model(FOLLOWER_MODELS[self.label])
+        return model.objects.filter(target_id=self.target_id).values_list('follower_id', flat=True)
+
+
+class GroupMembers(Source):
+    def __init__(self, group):
+        self.group_id = group if isinstance(group, int) else group.pk
+
+    def key(self):
+        return f'{RECIPIENTS_KEY}group_{_group_version()}_{self.group_id}'
+
+    def load(self):
+        from lego.apps.users.models import AbakusGroup, Membership
+        descendants = AbakusGroup.objects.get(pk=self.group_id).get_descendants(include_self=True)
+        return Membership.objects.filter(
+            deleted=False, is_active=True, abakus_group__in=descendants
+        ).values_list('user_id', flat=True)
+
+
+def followers_of(target):
+    return Followers(target)
+
+
+def members_of(group):
+    return GroupMembers(group)
+
+
+def _keys(sources):
+    """
+    Return the keys of the sources, and store the sources missing in Redis.
+    """
+    keys = [source.key() for source in sources]
+    redis = _redis()
+
+    pipeline = redis.pipeline(transaction=False)
+    for key in keys:
+        pipeline.exists(key)
+    missing = [
+        (source, key) for source, key, exists in zip(sources, keys, pipeline.execute())
+        if not exists
+    ]
+
+    if missing:
+        pipeline = redis.pipeline()
+        for source, key in missing:
+            pipeline.delete(key)
+            pipeline.sadd(key, EMPTY, *source.load())
+            pipeline.expire(key, settings.RECIPIENT_CACHE_TIMEOUT)
+        pipeline.execute()
+
+    return keys
+
+
+def _decode(members):
+    return {int(member) for member in members} - {EMPTY}
+
+
+def union(*sources):
+    """
+    Return the ids in any of the sources.
+    """
+    if not sources:
+        return set()
+    if not settings.RECIPIENT_CACHE:
+        return set().union(*(source.load() for source in sources))
+    return _decode(_redis().sunion(_keys(sources)))
+
+
+def _delete(keys):
+    if not settings.RECIPIENT_CACHE:
+        return
+
+    def delete():
+        _redis().delete(*keys)
+
+    # Delete right away and once more when the transaction commits, to avoid caching a set loaded
+    # from uncommitted state.
+    delete()
+    transaction.on_commit(delete)
+
+
+def invalidate_followers(target):
+    _delete([followers_of(target).key()])
+
+
+def invalidate_group(group):
+    """
+    Remove the member sets of a group and its ancestors.
+    """
+    if not settings.RECIPIENT_CACHE:
+        return
+    _delete([members_of(ancestor).key() for ancestor in group.get_ancestors(include_self=True)])
+
+
+def invalidate_groups():
+    """
+    Invalidate the member sets of every group. Called when the group tree changes.
+    """
+    if not settings.RECIPIENT_CACHE:
+        return
+
+    def bump():
+        cache.set(GROUP_VERSION_CACHE_KEY, uuid4().hex, timeout=None)
+
+    bump()
+    transaction.on_commit(bump)
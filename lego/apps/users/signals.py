@@ -0,0 +1,20 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from lego.apps.users import recipients
+from lego.apps.users.group_closure import invalidate_all, invalidate_user
+from lego.apps.users.models import AbakusGroup, Membership
+
+
+@receiver(post_save, sender=Membership)
+@receiver(post_delete, sender=Membership)
+def membership_changed_callback(instance, **kwargs):
+    invalidate_user(instance.user_id)
+    recipients.invalidate_group(instance.abakus_group)
+
+
+@receiver(post_save, sender=AbakusGroup)
+@receiver(post_delete, sender=AbakusGroup)
+def abakus_group_changed_callback(**kwargs):
+    invalidate_all()
+    recipients.invalidate_groups()
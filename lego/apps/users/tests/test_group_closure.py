@@ -0,0 +1,65 @@
+from django.test import override_settings
+
+from lego.apps.users.group_closure import (
+    get_group_ids, get_group_ids_for_users, invalidate_all, prefetch_group_ids
+)
+from lego.apps.users.models import AbakusGroup, User
+from lego.utils.test_utils import BaseTestCase
+
+
+@override_settings(GROUP_CLOSURE_CACHE=True)
+class GroupClosureTestCase(BaseTestCase):
+    fixtures = ['test_abakus_groups.yaml', 'test_users.yaml']
+
+    def setUp(self):
+        invalidate_all()
+        self.user = User.objects.get(pk=1)
+        self.abakus = AbakusGroup.objects.get(name='Abakus')
+        self.abakom = AbakusGroup.objects.get(name='Abakom')
+        self.webkom = AbakusGroup.objects.get(name='Webkom')
+
+    def test_closure_contains_ancestors(self):
+        self.webkom.add_user(self.user)
+        self.assertEqual(
+            get_group_ids(self.user.id),
+            {self.webkom.id, self.abakom.id, self.abakus.id}
+        )
+
+    def test_closure_is_invalidated_on_membership_changes(self):
+        self.assertEqual(get_group_ids(self.user.id), set())
+
+        self.webkom.add_user(self.user)
+        self.assertIn(self.webkom.id, get_group_ids(self.user.id))
+
+        self.webkom.remove_user(self.user)
+        self.assertEqual(get_group_ids(self.user.id), set())
+
+    def test_closure_is_invalidated_on_tree_changes(self):
+        group = AbakusGroup.objects.create(name='closure', parent=self.webkom)
+        group.add_user(self.user)
+        self.assertIn(self.abakus.id, get_group_ids(self.user.id))
+
+        group.parent = None
+        group.save()
+        self.assertEqual(get_group_ids(self.user.id), {group.id})
+
+    def test_bulk_resolve(self):
+        other = User.objects.get(pk=2)
+        self.webkom.add_user(self.user)
+        self.abakus.add_user(other)
+        get_group_ids(self.user.id)
+
+        group_ids = get_group_ids_for_users([self.user.id, other.id])
+
+        self.assertEqual(group_ids[self.user.id], {self.webkom.id, self.abakom.id, self.abakus.id})
+        self.assertEqual(group_ids[other.id], {self.abakus.id})
+
+    def test_prefetch_group_ids(self):
+        self.webkom.add_user(self.user)
+        users = {user.id: user for user in User.objects.filter(pk__in=[1, 2])}
+
+        prefetch_group_ids(users.values())
+
+        with self.assertNumQueries(0):
+            self.assertIn(self.webkom.id, users[1].all_group_ids)
+            self.assertEqual(users[2].all_group_ids, set())
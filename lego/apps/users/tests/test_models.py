@@ -6,7 +6,7 @@ from django.test import override_settings
 from lego.apps.events.models import Event
 from lego.apps.files.models import File
 from lego.apps.users import constants
-from lego.apps.users.models import AbakusGroup, Membership, Penalty, User
+from lego.apps.users.models import AbakusGroup, Membership, Penalty, User, _penalty_offset_days
 from lego.apps.users.registrations import Registrations
 from lego.utils.test_utils import BaseTestCase, fake_time
 
@@ -292,3 +292,29 @@ class PenaltyTestCase(BaseTestCase):
 
         self.assertEqual(self.test_user.number_of_penalties(), 1)
         self.assertEqual(self.test_user.penalties.valid().first().reason, 'active')
+
+    def test_penalties_for_users(self):
+        other_user = User.objects.get(pk=2)
+        for weight in [1, 2]:
+            Penalty.objects.create(
+                user=self.test_user, reason='test', weight=weight, source_event=self.source
+            )
+
+        with self.assertNumQueries(1):
+            penalties = Penalty.objects.penalties_for_users([self.test_user.id, other_user.id])
+        self.assertEqual(penalties, {self.test_user.id: 3, other_user.id: 0})
+
+    @mock.patch('lego.apps.users.models.Penalty.ignore_date', return_value=False)
+    def test_penalty_offset_is_memoized_per_day(self, mock_ignore_date):
+        _penalty_offset_days.cache_clear()
+        self.addCleanup(_penalty_offset_days.cache_clear)
+        start = fake_time(2017, 3, 1)
+        offset = Penalty.penalty_offset(start)
+        self.assertEqual(offset, timedelta(days=20))
+        calls = mock_ignore_date.call_count
+
+        self.assertEqual(Penalty.penalty_offset(start + timedelta(hours=5)), offset)
+        self.assertEqual(mock_ignore_date.call_count, calls)
+
+        with override_settings(PENALTY_DURATION=timedelta(days=10)):
+            self.assertEqual(Penalty.penalty_offset(start), timedelta(days=10))
@@ -0,0 +1,62 @@
+from django.test import override_settings
+from django_redis import get_redis_connection
+
+from lego.apps.followers.models import FollowUser
+from lego.apps.users.models import AbakusGroup, User
+from lego.apps.users.recipients import (
+    RECIPIENTS_KEY, followers_of, invalidate_groups, members_of, union
+)
+from lego.utils.test_utils import BaseTestCase
+
+
+@override_settings(RECIPIENT_CACHE=True)
+class RecipientsTestCase(BaseTestCase):
+    fixtures = ['test_abakus_groups.yaml', 'test_users.yaml']
+
+    def setUp(self):
+        redis = get_redis_connection('default')
+        keys = list(redis.scan_iter(f'{RECIPIENTS_KEY}*'))
+        if keys:
+            redis.delete(*keys)
+        invalidate_groups()
+
+        self.user = User.objects.get(pk=1)
+        self.other = User.objects.get(pk=2)
+        self.abakus = AbakusGroup.objects.get(name='Abakus')
+        self.abakom = AbakusGroup.objects.get(name='Abakom')
+        self.webkom = AbakusGroup.objects.get(name='Webkom')
+
+    def test_group_members_include_descendants(self):
+        self.webkom.add_user(self.user)
+        self.abakus.add_user(self.other)
+
+        self.assertEqual(union(members_of(self.webkom)), {self.user.id})
+        self.assertEqual(union(members_of(self.abakus)), {self.user.id, self.other.id})
+
+    def test_group_members_are_invalidated_on_membership_changes(self):
+        self.assertEqual(union(members_of(self.abakom)), set())
+
+        self.webkom.add_user(self.user)
+        self.assertEqual(union(members_of(self.abakom)), {self.user.id})
+
+        self.webkom.remove_user(self.user)
+        self.assertEqual(union(members_of(self.abakom)), set())
+
+    def test_followers_are_invalidated_on_follow_changes(self):
+        self.assertEqual(union(followers_of(self.other)), set())
+
+        follow = FollowUser.objects.create(follower=self.user, target=self.other)
+        self.assertEqual(union(followers_of(self.other)), {self.user.id})
+
+        follow.delete()
+        self.assertEqual(union(followers_of(self.other)), set())
+
+    @override_settings(RECIPIENT_CACHE=False)
+    def test_without_cache(self):
+        self.webkom.add_user(self.user)
+        self.abakus.add_user(self.other)
+
+        self.assertEqual(
+            union(members_of(self.webkom), members_of(self.abakus)),
+            {self.user.id, self.other.id}
+        )
@@ -1,9 +1,22 @@
+import time
+from collections import OrderedDict
+from functools import partial
 from urllib.parse import parse_qs
 
+import jwt
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.utils.translation import ugettext as _
 from rest_framework import exceptions
+from rest_framework_jwt.settings import api_settings
+from structlog import get_logger
 
 from lego.apps.jwt.authentication import Authentication
 
+jwt_decode_handler = api_settings.JWT_DECODE_HANDLER
+
+log = get_logger()
+
 
 class JWTQSAuthentication(Authentication):
     def get_jwt_value(self, scope):
@@ -17,14 +30,73 @@ class JWTQSAuthentication(Authentication):
             raise exceptions.AuthenticationFailed('Invalid JWT query param')
         return jwt_param[0]
 
+    def decode(self, jwt_value):
+        """
+        Validate the token and return the payload, without touching the database.
+        """
+        try:
+            return jwt_decode_handler(jwt_value)
+        except jwt.ExpiredSignature:
+            raise exceptions.AuthenticationFailed(_('Signature has expired.'))
+        except jwt.DecodeError:
+            raise exceptions.AuthenticationFailed(_('Error decoding signature.'))
+        except jwt.InvalidTokenError:
+            raise exceptions.AuthenticationFailed()
+
 
 class JWTAuthenticationMiddleware:
+    """
+    Populates scope['user'] and scope['token'] from the JWT in the query string.
+
+    The application instance is created in the event loop of the server, so the user is resolved
+    when the instance starts and only the user lookup runs in a thread. Users are cached in the
+    process by token for WEBSOCKET_JWT_CACHE_TIMEOUT seconds, and never after the token expires,
+    so reconnecting clients skip both the decoding and the lookup.
+    """
+
+    max_cached_users = 10000
+
     def __init__(self, inner):
         self.inner = inner
         self.authentication = JWTQSAuthentication()
+        self.users = OrderedDict()
 
     def __call__(self, scope):
-        user, token = self.authentication.authenticate(scope)
-        scope['user'] = user
-        scope['token'] = token
-        return self.inner(scope)
+        return partial(self.resolve, scope)
+
+    def get_cached_user(self, jwt_value):
+        cached = self.users.get(jwt_value)
+        if cached is None:
+            return None
+        user, expires = cached
+        if expires < time.time():
+            del self.users[jwt_value]
+            return None
+        self.users.move_to_end(jwt_value)
+        return user
+
+    def cache_user(self, jwt_value, user, payload):
+        if settings.WEBSOCKET_JWT_CACHE_TIMEOUT <= 0:
+            return
+        expires = time.time() + settings.WEBSOCKET_JWT_CACHE_TIMEOUT
+        if 'exp' in payload:
+            expires = min(expires, payload['exp'])
+        self.users[jwt_value] = (user, expires)
+        while len(self.users) > self.max_cached_users:
+            self.users.popitem(last=False)
+
+    async def authenticate(self, scope):
+        jwt_value = self.authentication.get_jwt_value(scope)
+        user = self.get_cached_user(jwt_value)
+        if user is None:
+            payload = self.authentication.decode(jwt_value)
+            authenticate_credentials = self.authentication.authenticate_credentials
+            user = await database_sync_to_async(authenticate_credentials)(payload)
+            self.cache_user(jwt_value, user, payload)
+        # Authentication.authenticate is bypassed, attach the user to the log context here.
+        log.bind(current_user=user.id)
+        return user, jwt_value
+
+    async def resolve(self, scope, receive, send):
+        scope['user'], scope['token'] = await self.authenticate(scope)
+        return await self.inner(scope)(receive, send)
@@ -1,23 +1,72 @@
-from asgiref.sync import AsyncToSync
-from channels.generic.websocket import WebsocketConsumer
+import json
 
-from lego.apps.events.websockets import find_event_groups
-from lego.apps.websockets.groups import group_for_user
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+
+from lego.apps.events import constants as event_constants
+from lego.apps.events.websockets import find_event_group, find_event_groups
+from lego.apps.websockets.groups import (
+    group_add_many, group_discard_many, group_for_event_id, group_for_user
+)
 
 
 def find_groups(user):
     return ['global', group_for_user(user)] + find_event_groups(user)
 
 
-class GroupConsumer(WebsocketConsumer):
-    def connect(self):
-        self.accept()
-        for group in find_groups(self.scope['user']):
-            AsyncToSync(self.channel_layer.group_add)(group, self.channel_name)
+class GroupConsumer(AsyncWebsocketConsumer):
+    """
+    Subscribes the socket to the global group, the group of the user and the groups of the
+    events relevant to the user when it connects. The client subscribes to other events on
+    demand by sending a SOCKET_SUBSCRIBE message with the event id, and SOCKET_UNSUBSCRIBE when
+    the event is no longer displayed.
+
+    The consumer runs in the event loop, only the lookups of the groups run in a thread. The
+    groups joined are kept on the consumer, so disconnecting doesn't look them up again.
+    """
+
+    max_subscriptions = 50
+
+    async def connect(self):
+        await self.accept()
+        self.subscriptions = set(await database_sync_to_async(find_groups)(self.scope['user']))
+        self.on_demand = set()
+        await group_add_many(self.channel_layer, self.subscriptions, self.channel_name)
+
+    async def disconnect(self, code):
+        groups = getattr(self, 'subscriptions', set()) | getattr(self, 'on_demand', set())
+        await group_discard_many(self.channel_layer, groups, self.channel_name)
+
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            content = json.loads(text_data)
+            action_type = content['type']
+            event_id = int(content['payload']['eventId'])
+        except (TypeError, ValueError, KeyError):
+            return
+
+        if action_type == event_constants.SOCKET_SUBSCRIBE:
+            await self.subscribe_event(event_id)
+        elif action_type == event_constants.SOCKET_UNSUBSCRIBE:
+            await self.unsubscribe_event(event_id)
+
+    async def subscribe_event(self, event_id):
+        if len(self.on_demand) >= self.max_subscriptions:
+            return
+        group = await database_sync_to_async(find_event_group)(self.scope['user'], event_id)
+        if group is None or group in self.subscriptions or group in self.on_demand:
+            return
+        self.on_demand.add(group)
+        await self.channel_layer.group_add(group, self.channel_name)
 
-    def disconnect(self, message):
-        for group in find_groups(self.scope['user']):
-            AsyncToSync(self.channel_layer.group_discard)(group, self.channel_name)
+    async def unsubscribe_event(self, event_id):
+        """
+        Only groups subscribed to on demand are left, the relevant events stay subscribed.
+        """
+        group = group_for_event_id(event_id)
+        if group in self.on_demand:
+            self.on_demand.discard(group)
+            await self.channel_layer.group_discard(group, self.channel_name)
 
-    def notification_message(self, event):
-        self.send(text_data=event['text'])
+    async def notification_message(self, event):
+        await self.send(text_data=event['text'])
@@ -1,6 +1,63 @@
+import time
+
+from channels_redis.core import RedisChannelLayer
+
+
 def group_for_user(user):
     return f'user-{user.pk}'
 
 
 def group_for_event(event):
-    return f'event-{event.pk}'
+    return group_for_event_id(event.pk)
+
+
+def group_for_event_id(event_id):
+    return f'event-{event_id}'
+
+
+def _shards(channel_layer, groups):
+    shards = {}
+    for group in groups:
+        assert channel_layer.valid_group_name(group), 'Group name not valid'
+        shards.setdefault(channel_layer.consistent_hash(group), []).append(group)
+    return shards.items()
+
+
+async def group_add_many(channel_layer, groups, channel):
+    """
+    Add a channel to many groups. The Redis channel layer opens a connection for every group_add,
+    the groups are added using one pipeline per Redis shard instead.
+    """
+    if not isinstance(channel_layer, RedisChannelLayer):
+        for group in groups:
+            await channel_layer.group_add(group, channel)
+        return
+
+    assert channel_layer.valid_channel_name(channel), 'Channel name not valid'
+    now = time.time()
+    for index, shard_groups in _shards(channel_layer, groups):
+        async with channel_layer.connection(index) as connection:
+            pipeline = connection.pipeline()
+            for group in shard_groups:
+                group_key = channel_layer._group_key(group)
+                pipeline.zadd(group_key, now, channel)
+                pipeline.expire(group_key, channel_layer.group_expiry)
+            await pipeline.execute()
+
+
+async def group_discard_many(channel_layer, groups, channel):
+    """
+    Remove a channel from many groups, using one pipeline per Redis shard.
+    """
+    if not isinstance(channel_layer, RedisChannelLayer):
+        for group in groups:
+            await channel_layer.group_discard(group, channel)
+        return
+
+    assert channel_layer.valid_channel_name(channel), 'Channel name not valid'
+    for index, shard_groups in _shards(channel_layer, groups):
+        async with channel_layer.connection(index) as connection:
+            pipeline = connection.pipeline()
+            for group in shard_groups:
+                pipeline.zrem(channel_layer._group_key(group), channel)
+            await pipeline.execute()
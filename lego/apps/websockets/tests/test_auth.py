@@ -0,0 +1,96 @@
+import time
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import AsyncToSync
+from django.test import override_settings
+from rest_framework.exceptions import AuthenticationFailed
+
+from lego.apps.jwt.handlers import jwt_encode_handler, jwt_payload_handler
+from lego.apps.users.models import User
+from lego.apps.websockets.auth import JWTAuthenticationMiddleware
+from lego.utils.test_utils import BaseTestCase
+
+
+def scope_for(token):
+    return {'type': 'websocket', 'path': '/', 'query_string': f'jwt={token}'.encode()}
+
+
+@override_settings(WEBSOCKET_JWT_CACHE_TIMEOUT=30)
+class JWTAuthenticationMiddlewareTestCase(BaseTestCase):
+    fixtures = ['test_abakus_groups.yaml', 'test_users.yaml']
+
+    def setUp(self):
+        self.user = User.objects.get(username='test1')
+        self.token = jwt_encode_handler(jwt_payload_handler(self.user))
+        self.middleware = JWTAuthenticationMiddleware(inner=None)
+        # The user is looked up in a thread, outside the transaction of the test.
+        patcher = mock.patch.object(
+            self.middleware.authentication, 'authenticate_credentials', return_value=self.user
+        )
+        self.authenticate_credentials = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def authenticate(self, token):
+        return AsyncToSync(self.middleware.authenticate)(scope_for(token))
+
+    def test_authenticate(self):
+        self.assertEqual(self.authenticate(self.token), (self.user, self.token))
+        self.assertEqual(self.authenticate(self.token), (self.user, self.token))
+
+        self.assertEqual(self.authenticate_credentials.call_count, 1)
+        self.assertEqual(self.authenticate_credentials.call_args[0][0]['user_id'], self.user.id)
+
+    @mock.patch('lego.apps.websockets.auth.log')
+    def test_user_is_bound_to_the_log(self, mock_log):
+        self.authenticate(self.token)
+        self.authenticate(self.token)
+
+        self.assertEqual(mock_log.bind.call_args_list, [mock.call(current_user=self.user.id)] * 2)
+
+    @override_settings(WEBSOCKET_JWT_CACHE_TIMEOUT=0)
+    def test_cache_disabled(self):
+        self.authenticate(self.token)
+        self.authenticate(self.token)
+
+        self.assertEqual(self.authenticate_credentials.call_count, 2)
+        self.assertEqual(len(self.middleware.users), 0)
+
+    def test_invalid_token(self):
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate('invalid')
+        with self.assertRaises(AuthenticationFailed):
+            AsyncToSync(self.middleware.authenticate)({'type': 'websocket', 'path': '/'})
+
+        self.authenticate_credentials.assert_not_called()
+        self.assertEqual(len(self.middleware.users), 0)
+
+    def test_expired_token(self):
+        payload = jwt_payload_handler(self.user)
+        payload['exp'] -= timedelta(days=365)
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(jwt_encode_handler(payload))
+
+    def test_expiry_is_capped_at_the_token_expiry(self):
+        self.middleware.cache_user('expires', self.user, {'exp': time.time() + 5})
+        self.middleware.cache_user('expired', self.user, {'exp': time.time() - 1})
+
+        self.assertLessEqual(self.middleware.users['expires'][1], time.time() + 5)
+        self.assertEqual(self.middleware.get_cached_user('expires'), self.user)
+        self.assertIsNone(self.middleware.get_cached_user('expired'))
+        self.assertNotIn('expired', self.middleware.users)
+
+    def test_expiry_without_token_expiry(self):
+        self.middleware.cache_user('token', self.user, {})
+
+        self.assertGreater(self.middleware.users['token'][1], time.time() + 25)
+
+    def test_least_recently_used_users_are_evicted(self):
+        self.middleware.max_cached_users = 2
+        self.middleware.cache_user('first', self.user, {})
+        self.middleware.cache_user('second', self.user, {})
+        self.middleware.get_cached_user('first')
+        self.middleware.cache_user('third', self.user, {})
+
+        self.assertEqual(list(self.middleware.users.keys()), ['first', 'third'])
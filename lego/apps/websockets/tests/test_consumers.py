@@ -0,0 +1,213 @@
+import asyncio
+import json
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import AsyncToSync
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.conf.urls import url
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+
+from lego.apps.events import constants
+from lego.apps.events.models import Event
+from lego.apps.events.tests.utils import get_dummy_users
+from lego.apps.jwt.handlers import jwt_encode_handler, jwt_payload_handler
+from lego.apps.websockets.auth import JWTAuthenticationMiddleware
+from lego.apps.websockets.consumers import GroupConsumer
+from lego.apps.websockets.groups import group_for_event_id, group_for_user
+from lego.utils.test_utils import BaseAPITransactionTestCase
+
+
+class ConsumerTestCase(BaseAPITransactionTestCase):
+    """
+    Runs the consumer against the channel layer of the tests. The consumer looks up the user
+    and the groups in threads, so the fixtures have to be committed.
+    """
+
+    fixtures = [
+        'test_abakus_groups.yaml', 'test_users.yaml', 'test_companies.yaml', 'test_events.yaml'
+    ]
+
+    def setUp(self):
+        # Only the groups subscribed to on demand contain the events.
+        Event.objects.all().update(start_time=timezone.now() - timedelta(hours=3))
+        self.user = get_dummy_users(1)[0]
+        self.token = jwt_encode_handler(jwt_payload_handler(self.user))
+        self.channel_layer = get_channel_layer()
+        self.application = JWTAuthenticationMiddleware(URLRouter([url('^$', GroupConsumer)]))
+        AsyncToSync(self.channel_layer.flush)()
+
+    def run_async(self, test):
+        AsyncToSync(test)()
+
+    def communicator(self, token):
+        def application(scope):
+            scope['query_string'] = f'jwt={token}'.encode()
+            return self.application(scope)
+
+        return WebsocketCommunicator(application, '/')
+
+    async def group_size(self, group):
+        index = self.channel_layer.consistent_hash(group)
+        async with self.channel_layer.connection(index) as connection:
+            return await connection.zcard(self.channel_layer._group_key(group))
+
+    async def send_to_group(self, group, text):
+        message = {'type': 'notification.message', 'text': text}
+        await self.channel_layer.group_send(group, message)
+
+
+class GroupConsumerTestCase(ConsumerTestCase):
+    def test_connect_and_disconnect(self):
+        async def test():
+            communicator = self.communicator(self.token)
+            connected, subprotocol = await communicator.connect()
+            self.assertTrue(connected)
+            for group in ['global', group_for_user(self.user)]:
+                self.assertEqual(await self.group_size(group), 1)
+
+            await self.send_to_group(group_for_user(self.user), json.dumps({'type': 'TEST'}))
+            self.assertEqual(await communicator.receive_json_from(), {'type': 'TEST'})
+
+            await communicator.disconnect()
+            for group in ['global', group_for_user(self.user)]:
+                self.assertEqual(await self.group_size(group), 0)
+
+        self.run_async(test)
+
+    def test_broadcast(self):
+        async def test():
+            communicators = [self.communicator(self.token) for _ in range(3)]
+            for communicator in communicators:
+                await communicator.connect()
+
+            await self.send_to_group('global', '{}')
+            for communicator in communicators:
+                self.assertEqual(await communicator.receive_from(), '{}')
+                await communicator.disconnect()
+
+        self.run_async(test)
+
+    def test_invalid_token(self):
+        async def test():
+            communicator = self.communicator('invalid')
+            with self.assertRaises(AuthenticationFailed):
+                await communicator.connect()
+            self.assertEqual(await self.group_size('global'), 0)
+
+        self.run_async(test)
+
+    def test_nothing_is_sent_to_other_users(self):
+        async def test():
+            communicator = self.communicator(self.token)
+            await communicator.connect()
+
+            await self.send_to_group('user-0', '{}')
+            with self.assertRaises(asyncio.TimeoutError):
+                await communicator.receive_from(timeout=0.5)
+            await communicator.disconnect()
+
+        self.run_async(test)
+
+
+class SubscriptionTestCase(ConsumerTestCase):
+    """
+    Messages from the socket are handled in order, so once the group of a later message is
+    joined or left the earlier messages have been handled.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.allowed = Event.objects.get(title='POOLS_NO_REGISTRATIONS').id
+        self.other = Event.objects.get(title='POOLS_AND_PRICED').id
+        self.denied = Event.objects.get(title='ABAKOM_ONLY').id
+
+    async def send_action(self, communicator, action_type, event_id):
+        await communicator.send_json_to({'type': action_type, 'payload': {'eventId': event_id}})
+
+    async def wait_for_group_size(self, group, size):
+        for _ in range(100):
+            if await self.group_size(group) == size:
+                return
+            await asyncio.sleep(0.01)
+        self.fail(f'{group} never had {size} channels')
+
+    def test_subscribe(self):
+        async def test():
+            communicator = self.communicator(self.token)
+            await communicator.connect()
+            await self.send_action(communicator, constants.SOCKET_SUBSCRIBE, self.allowed)
+            await self.wait_for_group_size(group_for_event_id(self.allowed), 1)
+
+            await self.send_to_group(group_for_event_id(self.allowed), '{}')
+            self.assertEqual(await communicator.receive_from(), '{}')
+
+            await communicator.disconnect()
+            self.assertEqual(await self.group_size(group_for_event_id(self.allowed)), 0)
+
+        self.run_async(test)
+
+    def test_subscribe_denied(self):
+        async def test():
+            communicator = self.communicator(self.token)
+            await communicator.connect()
+            await self.send_action(communicator, constants.SOCKET_SUBSCRIBE, self.denied)
+            await self.send_action(communicator, constants.SOCKET_SUBSCRIBE, 0)
+            await self.send_action(communicator, constants.SOCKET_SUBSCRIBE, self.allowed)
+            await self.wait_for_group_size(group_for_event_id(self.allowed), 1)
+
+            self.assertEqual(await self.group_size(group_for_event_id(self.denied)), 0)
+            await communicator.disconnect()
+
+        self.run_async(test)
+
+    def test_subscribe_over_the_limit(self):
+        async def test():
+            communicator = self.communicator(self.token)
+            await communicator.connect()
+            await self.send_action(communicator, constants.SOCKET_SUBSCRIBE, self.allowed)
+            await self.wait_for_group_size(group_for_event_id(self.allowed), 1)
+            await self.send_action(communicator, constants.SOCKET_SUBSCRIBE, self.other)
+            await self.send_action(communicator, constants.SOCKET_UNSUBSCRIBE, self.allowed)
+            await self.wait_for_group_size(group_for_event_id(self.allowed), 0)
+
+            self.assertEqual(await self.group_size(group_for_event_id(self.other)), 0)
+            await communicator.disconnect()
+
+        with mock.patch.object(GroupConsumer, 'max_subscriptions', 1):
+            self.run_async(test)
+
+    def test_unsubscribe(self):
+        async def test():
+            communicator = self.communicator(self.token)
+            await communicator.connect()
+            await self.send_action(communicator, constants.SOCKET_SUBSCRIBE, self.allowed)
+            await self.wait_for_group_size(group_for_event_id(self.allowed), 1)
+            await self.send_action(communicator, constants.SOCKET_UNSUBSCRIBE, self.allowed)
+            await self.wait_for_group_size(group_for_event_id(self.allowed), 0)
+
+            await self.send_to_group(group_for_event_id(self.allowed), '{}')
+            with self.assertRaises(asyncio.TimeoutError):
+                await communicator.receive_from(timeout=0.5)
+            await communicator.disconnect()
+
+        self.run_async(test)
+
+    def test_relevant_events_are_not_unsubscribed(self):
+        Event.objects.filter(id=self.other).update(start_time=timezone.now() + timedelta(hours=3))
+
+        async def test():
+            communicator = self.communicator(self.token)
+            await communicator.connect()
+            self.assertEqual(await self.group_size(group_for_event_id(self.other)), 1)
+            await self.send_action(communicator, constants.SOCKET_UNSUBSCRIBE, self.other)
+            await self.send_action(communicator, constants.SOCKET_SUBSCRIBE, self.allowed)
+            await self.wait_for_group_size(group_for_event_id(self.allowed), 1)
+
+            self.assertEqual(await self.group_size(group_for_event_id(self.other)), 1)
+            await communicator.disconnect()
+
+        self.run_async(test)
@@ -10,6 +10,7 @@ from cassandra.cqlengine.connection import session as cql_session
 from celery.schedules import crontab
 from celery.signals import beat_init, eventlet_pool_started, setup_logging, worker_process_init
 from django.conf import settings
+from kombu import Queue
 from structlog import get_logger
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'lego.settings')
@@ -23,18 +24,22 @@ logger = get_logger()
 @beat_init.connect()
 def celery_init(*args, **kwargs):
     """
-    Initialize a clean Cassandra connection.
+    Initialize a clean Cassandra connection, when the feeds are stored in Cassandra.
     """
+    from lego.apps.feed.timeline_storage import uses_cassandra
+
     try:
-        if cql_cluster is not None:
-            cql_cluster.shutdown()
-        if cql_session is not None:
-            cql_session.shutdown()
-        connection.setup(
-            hosts=settings.STREAM_CASSANDRA_HOSTS,
-            consistency=settings.STREAM_CASSANDRA_CONSISTENCY_LEVEL,
-            default_keyspace=settings.STREAM_DEFAULT_KEYSPACE, **settings.CASSANDRA_DRIVER_KWARGS
-        )
+        if uses_cassandra():
+            if cql_cluster is not None:
+                cql_cluster.shutdown()
+            if cql_session is not None:
+                cql_session.shutdown()
+            connection.setup(
+                hosts=settings.STREAM_CASSANDRA_HOSTS,
+                consistency=settings.STREAM_CASSANDRA_CONSISTENCY_LEVEL,
+                default_keyspace=settings.STREAM_DEFAULT_KEYSPACE,
+                **settings.CASSANDRA_DRIVER_KWARGS
+            )
     except Exception:  # noqa
         logger.exception('celery_cassandra_signal_failure')
         sys.exit(1)
@@ -78,6 +83,10 @@ schedule = {
         'task': 'lego.apps.events.tasks.bump_waiting_users_to_new_pool',
         'schedule': crontab(minute='*/30')
     },
+    'schedule-pool-activations': {
+        'task': 'lego.apps.events.tasks.schedule_pool_activations',
+        'schedule': crontab(minute='*')
+    },
     'notify_user_when_payment_soon_overdue': {
         'task': 'lego.apps.events.tasks.notify_user_when_payment_soon_overdue',
         'schedule': crontab(hour=9, minute=0)
@@ -97,12 +106,27 @@ schedule = {
     'notify_user_about_new_survey': {
         'task': 'lego.apps.surveys.tasks.send_survey_mail',
         'schedule': crontab(minute='*/10')
+    },
+    'repair-notification-counters': {
+        'task': 'lego.apps.feed.tasks.repair_notification_counters',
+        'schedule': crontab(hour=4, minute=0)
+    },
+    'compact-feeds': {
+        'task': 'lego.apps.feed.tasks.compact_feeds',
+        'schedule': crontab(hour=3, minute=0)
+    },
+    'flush-search-index-updates': {
+        'task': 'lego.apps.search.tasks.flush_index_updates',
+        'schedule': crontab(minute='*')
     }
 }
 
+# Workers consume the default queue and the fanout queues, see FeedManager.get_fanout_queue.
+queues = [Queue('celery')] + [Queue(queue) for queue in settings.FEED_FANOUT_QUEUES.values()]
+
 app.conf.update(
     beat_schedule=schedule, result_backend=None, task_track_started=True, task_serializer='pickle',
     worker_disable_rate_limits=True, task_ignore_result=True, task_acks_late=False,
     worker_hijack_root_logger=False, worker_redirect_stdouts=False,
-    accept_content=['pickle', 'json']
+    accept_content=['pickle', 'json'], task_default_queue='celery', task_queues=queues
 )
@@ -22,6 +22,49 @@ PENALTY_DURATION = timedelta(days=20)
 PENALTY_IGNORE_SUMMER = ((6, 1), (8, 15))
 PENALTY_IGNORE_WINTER = ((12, 1), (1, 10))
 
+# Drain pending registrations per event in one locked pass instead of one task per registration.
+REGISTRATION_BATCH_MODE = False
+# Prepare the allocation state of an event before a pool opens, see lego.apps.events.activation.
+POOL_ACTIVATION_PREWARM = True
+POOL_ACTIVATION_PREWARM_SECONDS = 60
+POOL_ACTIVATION_STATE_TIMEOUT = 60 * 5
+# Registration updates to an event are broadcast to its sockets at most once per interval.
+EVENT_BROADCAST_INTERVAL = 0.25
+# Websocket users are cached in the process by token for this many seconds.
+WEBSOCKET_JWT_CACHE_TIMEOUT = 30
+
+# Cache the transitive group ids of each user, see lego.apps.users.group_closure.
+GROUP_CLOSURE_CACHE = True
+GROUP_CLOSURE_CACHE_TIMEOUT = 60 * 60 * 24
+# Cache follower and group member ids in Redis, see lego.apps.users.recipients.
+RECIPIENT_CACHE = True
+RECIPIENT_CACHE_TIMEOUT = 60 * 60 * 24
+# Compiled keyword permissions are cached in-process, per set of groups.
+KEYWORD_PERMISSIONS_CACHE_TIMEOUT = 60
+KEYWORD_PERMISSIONS_CACHE_SIZE = 1000
+
+# Rendered feed pages are cached until the feed, or an object rendered in the pages, changes.
+# See lego.apps.feed.render_cache.
+FEED_RENDER_CACHE = True
+FEED_RENDER_CACHE_TIMEOUT = 60 * 5
+# Rendered feed context is refreshed when the instance is saved.
+FEED_ATTR_CACHE_TIMEOUT = 60 * 60 * 24
+# Number of concurrent Cassandra writes used when adding a fanout chunk to the feeds.
+FEED_FANOUT_WRITE_CONCURRENCY = 50
+# Fanout chunks are sized to take about FEED_FANOUT_CHUNK_SECONDS, see FeedManager.get_chunk_size.
+FEED_FANOUT_CHUNK_SECONDS = 2
+FEED_FANOUT_MIN_CHUNK_SIZE = 25
+FEED_FANOUT_MAX_CHUNK_SIZE = 1000
+FEED_FANOUT_MAX_CHUNKS = 100
+# Celery queues used by the fanout priorities. Fanouts above the threshold use the bulk queue.
+FEED_FANOUT_QUEUES = {'HIGH': 'feed_priority', 'LOW': 'feed_bulk'}
+FEED_FANOUT_BULK_THRESHOLD = 500
+STREAM_METRIC_CLASS = 'lego.apps.feed.metrics.FeedMetrics'
+# Timeline storage used by the feeds, see lego.apps.feed.timeline_storage.
+FEED_TIMELINE_STORAGE = (
+    'stream_framework.storage.cassandra.timeline_storage.CassandraTimelineStorage'
+)
+
 REGISTRATION_CONFIRMATION_TIMEOUT = 60 * 60 * 24
 STUDENT_CONFIRMATION_TIMEOUT = 60 * 60 * 24
 
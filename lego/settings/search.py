@@ -2,3 +2,21 @@ SEARCH_ID_FIELD = 'id'
 SEARCH_DJANGO_CT_FIELD = 'django_ct'
 SEARCH_DJANGO_ID_FIELD = 'django_id'
 SEARCH_TEMPLATE_NAME = 'lego-search'
+
+# Available backends:
+# * lego.apps.search.backends.elasticsearch.ElasticsearchBackend
+# * lego.apps.search.backends.postgres.PostgresBackend
+SEARCH_BACKEND = 'lego.apps.search.backends.elasticsearch.ElasticsearchBackend'
+
+# Concurrency used when streaming documents to Elasticsearch during a reindex.
+SEARCH_BULK_THREADS = 4
+SEARCH_BULK_CHUNK_SIZE = 500
+
+# Changed instances are queued and indexed in batches, see lego.apps.search.update_queue.
+SEARCH_UPDATE_QUEUE_DELAY = 5
+SEARCH_UPDATE_QUEUE_THRESHOLD = 500
+SEARCH_UPDATE_QUEUE_BATCH_SIZE = 1000
+
+# Search and autocomplete results are cached for a short time, see lego.apps.search.result_cache.
+SEARCH_RESULT_CACHE = True
+SEARCH_RESULT_CACHE_TIMEOUT = 30
@@ -75,6 +75,13 @@ ELASTICSEARCH = [
     },
 ]
 
+# The test database is rolled back between tests, which would leave stale closures in Redis.
+GROUP_CLOSURE_CACHE = False
+POOL_ACTIVATION_PREWARM = False
+RECIPIENT_CACHE = False
+SEARCH_RESULT_CACHE = False
+FEED_RENDER_CACHE = False
+
 CELERY_TASK_ALWAYS_EAGER = True
 CELERY_EAGER_PROPAGATES_EXCEPTIONS = True
 
@@ -29,7 +29,7 @@ def string_to_model_cls(content_type_string):
     Convert a string like app_label.model_name to a model cls
     """
     app_label, model_name = content_type_string.split('.')
-    content_type = ContentType.objects.get(app_label=app_label, model=model_name)
+    content_type = ContentType.objects.get_by_natural_key(app_label, model_name)
     return content_type.model_class()
 
 
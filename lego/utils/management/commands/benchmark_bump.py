@@ -0,0 +1,167 @@
+import json
+import logging
+import time
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from lego.apps.events import constants
+from lego.apps.events.models import Event, Pool, Registration
+from lego.apps.users.models import AbakusGroup, User
+from lego.utils.management_command import BaseCommand
+
+log = logging.getLogger(__name__)
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def legacy_check_for_bump_or_rebalance(event, open_pool):
+    """
+    The per-registration bump path used before the bump planner.
+    """
+    if not event.is_full:
+        if event.is_merged:
+            event.bump()
+        elif not open_pool.is_full:
+            for registration in event.waiting_registrations:
+                if open_pool in event.get_possible_pools(registration.user):
+                    return event.bump(to_pool=open_pool)
+            event.try_to_rebalance(open_pool=open_pool)
+
+
+def planner_check_for_bump_or_rebalance(event, open_pool):
+    event.check_for_bump_or_rebalance(open_pool)
+
+
+STRATEGIES = {
+    'legacy': legacy_check_for_bump_or_rebalance,
+    'planner': planner_check_for_bump_or_rebalance,
+}
+
+
+class Command(BaseCommand):
+
+    help = 'Measure the cost of bumping and rebalancing an event with a long waiting list.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--waiting',
+            type=int,
+            default=300,
+            help='Number of registrations on the waiting list',
+        )
+        parser.add_argument(
+            '--rounds',
+            type=int,
+            default=20,
+            help='Number of unregistrations measured for each strategy',
+        )
+        parser.add_argument(
+            '--strategy',
+            choices=STRATEGIES.keys(),
+            nargs='+',
+            default=['legacy', 'planner'],
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            default=False,
+            help='Print the results as JSON',
+        )
+
+    def create_users(self, prefix, count, group):
+        users = []
+        for number in range(count):
+            username = f'{prefix}{number}'
+            user = User.objects.get_or_create(
+                username=username, first_name=username, last_name=username,
+                email=f'{username}@example.com'
+            )[0]
+            group.add_user(user)
+            users.append(user)
+        return users
+
+    def create_event(self, waiting, rounds):
+        """
+        Create an event where the freed spots are in a pool nobody on the waiting list can join,
+        every spot requires a rebalance before the waiting list can be bumped.
+        """
+        users_group = AbakusGroup.objects.get_or_create(name='Users')[0]
+        abakus_group = AbakusGroup.objects.get_or_create(name='Abakus')[0]
+        members = self.create_users('bump-member-', rounds * 2, abakus_group)
+        users = self.create_users('bump-user-', 100 - rounds + waiting, users_group)
+
+        now = timezone.now()
+        event = Event.objects.create(
+            title='Bump benchmark', start_time=now + timedelta(days=1),
+            end_time=now + timedelta(days=1), location='-',
+            event_type=constants.COMPANY_PRESENTATION, heed_penalties=True
+        )
+        users_pool = Pool.objects.create(
+            event=event, name='Users', capacity=100, activation_date=now - timedelta(days=1)
+        )
+        users_pool.permission_groups.set([users_group.id])
+        abakus_pool = Pool.objects.create(
+            event=event, name='Abakus', capacity=rounds, activation_date=now - timedelta(days=1)
+        )
+        abakus_pool.permission_groups.set([abakus_group.id])
+
+        # Abakus members fill the abakus pool, and take spots in the users pool that can be
+        # moved to the abakus pool.
+        for user in members[:rounds]:
+            event.admin_register(user, pool=abakus_pool, admin_registration_reason='benchmark')
+        for user in members[rounds:] + users[:100 - rounds]:
+            event.admin_register(user, pool=users_pool, admin_registration_reason='benchmark')
+        for user in users[100 - rounds:]:
+            Registration.objects.create(
+                event=event, user=user, status=constants.SUCCESS_REGISTER,
+                registration_date=timezone.now()
+            )
+        return event, abakus_pool, members[:rounds]
+
+    def measure(self, strategy, waiting, rounds):
+        event, open_pool, leaving = self.create_event(waiting, rounds)
+        latencies = []
+        queries = []
+        for user in leaving:
+            registration = event.registrations.get(user=user)
+            registration.unregister()
+            with CaptureQueriesContext(connection) as captured:
+                start_time = time.time()
+                with transaction.atomic():
+                    locked_event = Event.objects.select_for_update().get(pk=event.id)
+                    locked_pool = locked_event.pools.get(id=open_pool.id)
+                    STRATEGIES[strategy](locked_event, locked_pool)
+                latencies.append((time.time() - start_time) * 1000)
+            queries.append(len(captured))
+
+        result = {
+            'strategy': strategy,
+            'waiting': waiting,
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'queries_p50': percentile(queries, 50),
+            'queries_max': max(queries),
+        }
+        event.delete(force=True)
+        return result
+
+    def run(self, *args, **options):
+        results = []
+        for strategy in options['strategy']:
+            result = self.measure(strategy, options['waiting'], options['rounds'])
+            log.info(
+                f'{strategy}: p50 {result["p50_ms"]} ms, p95 {result["p95_ms"]} ms, '
+                f'{result["queries_p50"]} queries'
+            )
+            results.append(result)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results))
+
+        log.info('Done!')
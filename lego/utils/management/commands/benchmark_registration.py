@@ -1,14 +1,77 @@
 import cProfile
+import json
+import logging
+import random
+import threading
+import time
 from datetime import timedelta
+from queue import Queue
 
+from django.core.management import CommandError
+from django.db import connection, transaction
 from django.utils import timezone
 
 from lego.apps.events import constants
 from lego.apps.events.models import Event, Pool, Registration
-from lego.apps.events.tasks import async_register
-from lego.apps.users.models import AbakusGroup, User
+from lego.apps.events.registration_engine import RegistrationEngine
+from lego.apps.events.tasks import async_register, async_register_batch, async_unregister
+from lego.apps.users.models import AbakusGroup, Penalty, User
 from lego.utils.management_command import BaseCommand
 
+log = logging.getLogger(__name__)
+
+# Pools are given as (name, share of the users the pool has room for, permission group).
+SCENARIOS = {
+    # Room for 70% of the users in two pools, the rest ends up on the waiting list.
+    'pools': {
+        'merged': False,
+        'pools': [('Users', 0.6, 'Users'), ('Abakus', 0.1, 'Abakus')],
+    },
+    'merged': {
+        'merged': True,
+        'pools': [('Users', 0.6, 'Users'), ('Abakus', 0.1, 'Abakus')],
+    },
+    # A single pool with room for a quarter of the users, unregistrations bump the waiting list.
+    'waiting': {
+        'merged': False,
+        'pools': [('Users', 0.25, 'Users')],
+    },
+}
+
+
+def percentile(values, percent):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def summarize(values):
+    return {
+        'p50': round(percentile(values, 50), 2),
+        'p95': round(percentile(values, 95), 2),
+        'p99': round(percentile(values, 99), 2),
+    }
+
+
+class LockTimer:
+    """
+    Execute wrapper measuring the time spent in SELECT ... FOR UPDATE statements, which is
+    dominated by waiting for the row locks held by other workers.
+    """
+
+    def __init__(self):
+        self.seconds = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        if 'FOR UPDATE' not in sql:
+            return execute(sql, params, many, context)
+        start_time = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start_time
+
 
 class Command(BaseCommand):
     help = 'Benchmark registration methods'
@@ -31,10 +94,261 @@ class Command(BaseCommand):
             '--multi',
             action='store_true',
             default=False,
-            help='200 registration benchmark',
+            help='Load test using concurrent in-process workers',
+        )
+        parser.add_argument(
+            '--engine',
+            action='store_true',
+            default=False,
+            help='200 registration benchmark using the in-memory registration engine',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=8,
+            help='Number of in-process workers used by --multi, 1 runs the tasks eagerly',
+        )
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=200,
+            help='Number of users registering for each scenario',
+        )
+        parser.add_argument(
+            '--scenario',
+            choices=SCENARIOS.keys(),
+            nargs='+',
+            default=list(SCENARIOS.keys()),
+        )
+        parser.add_argument(
+            '--batch',
+            action='store_true',
+            default=False,
+            help='Register using async_register_batch instead of async_register',
+        )
+        parser.add_argument(
+            '--unregister-ratio',
+            type=float,
+            default=0.1,
+            help='Share of the registrations that are unregistered again',
+        )
+        parser.add_argument(
+            '--penalty-ratio',
+            type=float,
+            default=0.1,
+            help='Share of the users given 1, 2 or 3 penalties',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            default=False,
+            help='Keep the events created by --multi',
         )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            default=False,
+            help='Print the results of --multi as JSON',
+        )
+
+    def create_load_users(self, count):
+        users_group = AbakusGroup.objects.get_or_create(name='Users')[0]
+        abakus_group = AbakusGroup.objects.get_or_create(name='Abakus')[0]
+        users = []
+        for number in range(count):
+            username = f'load-{number}'
+            user = User.objects.get_or_create(
+                username=username, first_name=username, last_name=username,
+                email=f'{username}@example.com'
+            )[0]
+            users_group.add_user(user)
+            if number % 2:
+                abakus_group.add_user(user)
+            users.append(user)
+        return users
+
+    def create_load_event(self, name, scenario, users, penalty_ratio, rng):
+        now = timezone.now()
+        event = Event.objects.create(
+            title=f'Load test {name}', start_time=now + timedelta(days=1),
+            end_time=now + timedelta(days=1), location='-',
+            event_type=constants.COMPANY_PRESENTATION, heed_penalties=True,
+            merge_time=now - timedelta(hours=1) if scenario['merged'] else None
+        )
+        for pool_name, share, group_name in scenario['pools']:
+            pool = Pool.objects.create(
+                event=event, name=pool_name, capacity=max(1, int(len(users) * share)),
+                activation_date=now - timedelta(days=1)
+            )
+            pool.permission_groups.set([AbakusGroup.objects.get(name=group_name).id])
+
+        # Penalties given after the activation only delay the registration of users with one or
+        # two penalties, users with three penalties end up on the waiting list.
+        penalized = rng.sample(users, int(len(users) * penalty_ratio))
+        for number, user in enumerate(penalized):
+            Penalty.objects.create(
+                user=user, reason='Load test', weight=number % 3 + 1, source_event=event
+            )
+        return event
+
+    def execute(self, operation, batch):
+        kind, registration_id, event_id, unregister = operation
+        if kind == 'unregister':
+            return async_unregister.apply((registration_id, ))
+        elif batch:
+            return async_register_batch.apply((event_id, ))
+        return async_register.apply((registration_id, ))
+
+    def worker(self, operations, samples, batch):
+        """
+        Run operations from the queue until a None is received. The tasks run in the worker
+        thread, like an eager celery worker, using a database connection per thread.
+        """
+        timer = LockTimer()
+        with connection.execute_wrapper(timer):
+            while True:
+                operation = operations.get()
+                if operation is None:
+                    break
+                kind, registration_id, event_id, unregister = operation
+                lock_seconds = timer.seconds
+                start_time = time.perf_counter()
+                try:
+                    failed = self.execute(operation, batch).failed()
+                except Exception:
+                    log.exception(f'Failed to {kind} registration {registration_id}')
+                    failed = True
+                samples.append(
+                    {
+                        'kind': kind,
+                        'latency_ms': (time.perf_counter() - start_time) * 1000,
+                        'lock_wait_ms': (timer.seconds - lock_seconds) * 1000,
+                        'failed': failed,
+                    }
+                )
+
+                if unregister and not failed and Registration.objects.filter(
+                    id=registration_id, status=constants.SUCCESS_REGISTER
+                ).exists():
+                    operations.put(('unregister', registration_id, event_id, False))
+                operations.task_done()
+        connection.close()
+
+    def replay(self, event, users, options, rng):
+        """
+        Register every user through the workers, and unregister a share of them once their
+        registration has completed. Returns the samples and the wall time in seconds.
+        """
+        registrations = [
+            Registration.objects.get_or_create(event=event, user=user)[0] for user in users
+        ]
+        unregister = set(
+            registration.id for registration in
+            rng.sample(registrations, int(len(registrations) * options['unregister_ratio']))
+        )
+        operations = Queue()
+        for registration in registrations:
+            operations.put(('register', registration.id, event.id, registration.id in unregister))
+
+        samples = []
+        workers = [
+            threading.Thread(target=self.worker, args=(operations, samples, options['batch']))
+            for _ in range(max(1, options['workers']))
+        ]
+        start_time = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        operations.join()
+        seconds = time.perf_counter() - start_time
+
+        for worker in workers:
+            operations.put(None)
+        for worker in workers:
+            worker.join()
+        return samples, seconds
+
+    def check(self, event):
+        """
+        Verify the pool counters, capacities and the occupancy snapshot after the load test.
+        """
+        event.refresh_from_db()
+        errors = []
+        pools = list(event.pools.all())
+        registered = {pool.id: pool.registrations.count() for pool in pools}
+        for pool in pools:
+            if event.is_merged:
+                continue
+            if pool.counter != registered[pool.id]:
+                errors.append(
+                    f'{pool.name}: counter {pool.counter} != {registered[pool.id]} registrations'
+                )
+            if pool.capacity and registered[pool.id] > pool.capacity:
+                errors.append(f'{pool.name}: {registered[pool.id]} registrations > capacity')
+        if event.is_merged and sum(registered.values()) > sum(pool.capacity for pool in pools):
+            errors.append('More registrations than the capacity of the merged event')
+        if event.occupancy != event.compute_occupancy():
+            errors.append('The occupancy snapshot does not match the registrations')
+        return errors
+
+    def load_test(self, options):
+        rng = random.Random(options['seed'])
+        users = self.create_load_users(options['users'])
+
+        results = []
+        for name in options['scenario']:
+            event = self.create_load_event(
+                name, SCENARIOS[name], users, options['penalty_ratio'], rng
+            )
+            samples, seconds = self.replay(event, users, options, rng)
+            errors = self.check(event)
+
+            latency = {}
+            for kind in ['register', 'unregister']:
+                latency[kind] = summarize(
+                    [sample['latency_ms'] for sample in samples if sample['kind'] == kind]
+                )
+            lock_wait = [sample['lock_wait_ms'] for sample in samples]
+            result = {
+                'scenario': name,
+                'workers': options['workers'],
+                'batch': options['batch'],
+                'operations': len(samples),
+                'failed': len([sample for sample in samples if sample['failed']]),
+                'seconds': round(seconds, 2),
+                'throughput': round(len(samples) / seconds, 2),
+                'latency_ms': latency,
+                'lock_wait_ms': dict(total=round(sum(lock_wait), 2), **summarize(lock_wait)),
+                'registered': event.registrations.exclude(pool=None).count(),
+                'waiting': event.waiting_registrations.count(),
+                'errors': errors,
+            }
+            results.append(result)
+
+            log.info(
+                f'{name}: {result["throughput"]} operations/sec, register p50 '
+                f'{latency["register"]["p50"]} ms, p99 {latency["register"]["p99"]} ms, '
+                f'lock wait {result["lock_wait_ms"]["total"]} ms'
+            )
+            for error in errors:
+                log.error(f'{name}: {error}')
+            if not options['keep']:
+                event.delete(force=True)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results))
+
+        if any(result['errors'] for result in results):
+            raise CommandError('The pool counters are inconsistent after the load test')
+        log.info('Done!')
 
     def run(self, *args, **options):
+        if options['multi']:
+            return self.load_test(options)
 
         user_group = AbakusGroup.objects.get_or_create(name='Users')[0]
         abakus_group = AbakusGroup.objects.get_or_create(name='Abakus')[0]
@@ -91,33 +405,34 @@ class Command(BaseCommand):
             pr.disable()
             pr.dump_stats(f'single_avg{event.id}.pstat')
 
-        def benchmark(event, users):
+        def engine_benchmark(event, users):
 
             regs = []
             for user in users:
                 reg = Registration.objects.get_or_create(event=event, user=user)[0]
                 regs.append(reg)
-            time = timezone.now() + timedelta(seconds=5)
-            for reg in regs:
-                async_register.apply_async((reg.id, ), eta=time)
-
-            input('Start the celery workers: DONE?')
 
-            registrations = Registration.objects.filter(event=event).order_by('registration_date')
-
-            first = registrations.first()
-            last = registrations.last()
+            pr = cProfile.Profile()
+            pr.enable()
+            start = timezone.now()
+            with transaction.atomic():
+                engine = RegistrationEngine(event)
+                engine.load_users([reg.user_id for reg in regs])
+                for reg in regs:
+                    engine.register(reg)
+                engine.flush()
+            diff = timezone.now() - start
+            pr.disable()
+            pr.dump_stats(f'engine{event.id}.pstat')
 
-            diff = last.registration_date - first.registration_date
-            print(f'Number of registrations: {registrations.count()}')
             print(f'Number pool1 {pool1.registrations.count()} / 100')
             print(f'Number pool2 {pool2.registrations.count()} / 10')
-            print(f'Time per registration {diff.total_seconds() * 1000 / registrations.count()}')
+            print(f'Time per registration {diff.total_seconds() * 1000 / len(regs)}')
             print(f'Total time: {diff.total_seconds() * 1000}')
 
         if options['single']:
             single_benchmark(event, users[0])
         elif options['singleavg']:
             single_benchmark_avg(event, users)
-        elif options['multi']:
-            benchmark(event, users)
+        elif options['engine']:
+            engine_benchmark(event, users)
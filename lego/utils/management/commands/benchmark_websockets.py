@@ -0,0 +1,238 @@
+import asyncio
+import json
+import logging
+import time
+
+from asgiref.sync import AsyncToSync
+from asgiref.testing import ApplicationCommunicator
+from channels.generic.websocket import WebsocketConsumer
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from django.conf.urls import url
+from django.utils import timezone
+
+from lego.apps.events.models import Event
+from lego.apps.jwt.handlers import jwt_encode_handler, jwt_payload_handler
+from lego.apps.permissions.constants import LIST
+from lego.apps.permissions.utils import get_permission_handler
+from lego.apps.users.models import AbakusGroup, User
+from lego.apps.websockets.auth import JWTAuthenticationMiddleware, JWTQSAuthentication
+from lego.apps.websockets.consumers import GroupConsumer
+from lego.apps.websockets.groups import group_for_event, group_for_user
+from lego.utils.management_command import BaseCommand
+
+log = logging.getLogger(__name__)
+
+
+def percentile(values, percent):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def summarize(values):
+    return {
+        'p50': round(percentile(values, 50), 2),
+        'p95': round(percentile(values, 95), 2),
+        'p99': round(percentile(values, 99), 2),
+    }
+
+
+class BlockingJWTAuthenticationMiddleware:
+    """
+    The previous middleware, looking up the user in the event loop when the socket connects.
+    """
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.authentication = JWTQSAuthentication()
+
+    def __call__(self, scope):
+        user, token = self.authentication.authenticate(scope)
+        scope['user'] = user
+        scope['token'] = token
+        return self.inner(scope)
+
+
+def legacy_find_groups(user):
+    """
+    The previous group lookup, every future event the user can list.
+    """
+    queryset = Event.objects.filter(start_time__gt=timezone.now())
+    if not user.has_perm(LIST, queryset):
+        permission_handler = get_permission_handler(queryset.model)
+        queryset = permission_handler.filter_queryset(user, queryset)
+    return ['global', group_for_user(user)] + [group_for_event(event) for event in queryset]
+
+
+class SyncGroupConsumer(WebsocketConsumer):
+    """
+    The previous consumer, every message is handled in the thread pool. The groups are looked up
+    again when the socket disconnects, and joined and left one group_add at a time.
+    """
+
+    def connect(self):
+        self.accept()
+        for group in legacy_find_groups(self.scope['user']):
+            AsyncToSync(self.channel_layer.group_add)(group, self.channel_name)
+
+    def disconnect(self, message):
+        for group in legacy_find_groups(self.scope['user']):
+            AsyncToSync(self.channel_layer.group_discard)(group, self.channel_name)
+
+    def notification_message(self, event):
+        self.send(text_data=event['text'])
+
+
+def sync_application():
+    return BlockingJWTAuthenticationMiddleware(URLRouter([url('^$', SyncGroupConsumer)]))
+
+
+def async_application():
+    return JWTAuthenticationMiddleware(URLRouter([url('^$', GroupConsumer)]))
+
+
+APPLICATIONS = {
+    'sync': sync_application,
+    'async': async_application,
+}
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the number of concurrent websockets handled by one process'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--consumer',
+            choices=APPLICATIONS.keys(),
+            nargs='+',
+            default=list(APPLICATIONS.keys()),
+        )
+        parser.add_argument(
+            '--sockets',
+            type=int,
+            default=500,
+            help='Number of sockets opened at once',
+        )
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=100,
+            help='Number of users the sockets are shared between',
+        )
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=5,
+            help='Seconds a socket may wait to be accepted, or for a broadcast',
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            default=False,
+            help='Print the results as JSON',
+        )
+
+    def create_tokens(self, count):
+        users_group = AbakusGroup.objects.get_or_create(name='Users')[0]
+        tokens = []
+        for number in range(count):
+            username = f'socket-{number}'
+            user = User.objects.get_or_create(
+                username=username, first_name=username, last_name=username,
+                email=f'{username}@example.com'
+            )[0]
+            users_group.add_user(user)
+            tokens.append(jwt_encode_handler(jwt_payload_handler(user)))
+        return tokens
+
+    async def open_socket(self, application, token, timeout):
+        scope = {
+            'type': 'websocket',
+            'path': '/',
+            'query_string': f'jwt={token}'.encode(),
+            'headers': [],
+            'subprotocols': [],
+        }
+        start_time = time.perf_counter()
+        communicator = ApplicationCommunicator(application, scope)
+        await communicator.send_input({'type': 'websocket.connect'})
+        try:
+            response = await communicator.receive_output(timeout)
+        except asyncio.TimeoutError:
+            return communicator, None
+        if response['type'] != 'websocket.accept':
+            return communicator, None
+        return communicator, (time.perf_counter() - start_time) * 1000
+
+    async def receive_broadcast(self, communicator, timeout):
+        try:
+            await communicator.receive_output(timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def close_socket(self, communicator, timeout):
+        await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        try:
+            await communicator.wait(timeout)
+        except asyncio.TimeoutError:
+            communicator.stop(exceptions=False)
+
+    async def connection_test(self, name, tokens, options):
+        application = APPLICATIONS[name]()
+        timeout = options['timeout']
+
+        start_time = time.perf_counter()
+        sockets = await asyncio.gather(
+            *[
+                self.open_socket(application, tokens[number % len(tokens)], timeout)
+                for number in range(options['sockets'])
+            ]
+        )
+        connect_seconds = time.perf_counter() - start_time
+        accepted = [communicator for communicator, latency in sockets if latency is not None]
+        latencies = [latency for communicator, latency in sockets if latency is not None]
+
+        # Every socket is in the global group, a single message reaches all of them.
+        start_time = time.perf_counter()
+        message = {'type': 'notification.message', 'text': '{}'}
+        await get_channel_layer().group_send('global', message)
+        received = await asyncio.gather(
+            *[self.receive_broadcast(communicator, timeout) for communicator in accepted]
+        )
+        broadcast_seconds = time.perf_counter() - start_time
+
+        await asyncio.gather(
+            *[self.close_socket(communicator, timeout) for communicator, latency in sockets]
+        )
+
+        return {
+            'consumer': name,
+            'sockets': options['sockets'],
+            'accepted': len(accepted),
+            'connect_seconds': round(connect_seconds, 2),
+            'connect_ms': summarize(latencies),
+            'broadcast_received': len([result for result in received if result]),
+            'broadcast_seconds': round(broadcast_seconds, 2),
+        }
+
+    def run(self, *args, **options):
+        tokens = self.create_tokens(options['users'])
+        loop = asyncio.get_event_loop()
+
+        results = []
+        for name in options['consumer']:
+            result = loop.run_until_complete(self.connection_test(name, tokens, options))
+            results.append(result)
+            log.info(
+                f'{name}: {result["accepted"]}/{result["sockets"]} sockets accepted in '
+                f'{result["connect_seconds"]} s, connect p50 {result["connect_ms"]["p50"]} ms, '
+                f'p99 {result["connect_ms"]["p99"]} ms, broadcast reached '
+                f'{result["broadcast_received"]} sockets in {result["broadcast_seconds"]} s'
+            )
+
+        if options['json']:
+            self.stdout.write(json.dumps(results))
+        log.info('Done!')